@@ -0,0 +1,240 @@
+"""
+This module implements the emission factor catalog.
+The catalog (config/emission_factors.yml) lists, for every version, the operations of each role with
+their reference tons of CO2 per unit. Every version is indexed once into a (role, operation) factor
+matrix, so the threshold, the credit delta and the balance check of a whole batch of operations are
+computed with a few NumPy expressions. The same code recalculates recorded operations under another
+version of the factors.
+"""
+
+import datetime
+import os
+import numpy as np
+import yaml
+from analytics.emissions import ROLES
+
+
+ROLE_INDEX = {role: code for code, role in enumerate(ROLES)}
+
+
+class FactorVersion:
+    """
+    One version of the catalog.
+
+    Attributes:
+        version (int): The version number.
+        effective_from (str): The YYYY-MM-DD date the version takes effect.
+        roles (dict): role -> {'unit', 'units_prompt', 'operations': {number: (name, factor)}}.
+        table (np.ndarray): float64 factor matrix indexed by [role code, operation number], NaN where
+                            the role has no such operation.
+    """
+    __slots__ = ('version', 'effective_from', 'roles', 'table')
+
+    def __init__(self, version, effective_from, roles):
+        self.version = version
+        self.effective_from = effective_from
+        self.roles = roles
+        width = max((number for role in roles.values() for number in role['operations']), default=0) + 1
+        self.table = np.full((len(ROLES), width), np.nan)
+        for role, entry in roles.items():
+            for number, (_, factor) in entry['operations'].items():
+                self.table[ROLE_INDEX[role], number] = factor
+
+
+class BatchResult:
+    """
+    Outcome of a batch of operations, one element per row.
+
+    Attributes:
+        valid (np.ndarray): bool, False when the operation does not exist for the role or the units are not positive.
+        threshold (np.ndarray): float64 reference emission (factor * units), 0 for invalid rows.
+        delta (np.ndarray): int64 credit delta (threshold - actual CO2, truncated), 0 for invalid rows.
+        balance_after (np.ndarray): int64 balance after each row, or None when no balance was given.
+        sufficient (np.ndarray): bool, whether the balance before each row covers its delta, or None.
+        required_balance (int): The smallest starting balance that lets every row of the batch through.
+    """
+    __slots__ = ('valid', 'threshold', 'delta', 'balance_after', 'sufficient', 'required_balance')
+
+    def __init__(self, valid, threshold, delta, balance_after, sufficient, required_balance):
+        self.valid = valid
+        self.threshold = threshold
+        self.delta = delta
+        self.balance_after = balance_after
+        self.sufficient = sufficient
+        self.required_balance = required_balance
+
+    def __len__(self):
+        return len(self.delta)
+
+
+class EmissionFactorCatalog:
+    """
+    Versioned emission factors, indexed by role and operation number.
+    """
+
+    def __init__(self, versions):
+        """
+        Args:
+            versions (list): Dicts with 'version', 'effective_from' and 'roles', as in the catalog file.
+
+        Raises:
+            ValueError: If a role is unknown or two versions share a number.
+        """
+        self.versions = {}
+        for entry in sorted(versions, key=lambda entry: str(entry['effective_from'])):
+            roles = {}
+            for role, spec in entry['roles'].items():
+                if role not in ROLE_INDEX:
+                    raise ValueError(f"Unknown role '{role}' in emission factor version {entry['version']}")
+                roles[role] = {
+                    'unit': spec.get('unit', 'unit'),
+                    'units_prompt': spec.get('units_prompt', 'number of units'),
+                    'operations': {int(number): (operation['name'], operation['factor'])
+                                   for number, operation in spec['operations'].items()},
+                }
+            version = int(entry['version'])
+            if version in self.versions:
+                raise ValueError(f"Emission factor version {version} is defined twice")
+            self.versions[version] = FactorVersion(version, str(entry['effective_from']), roles)
+        if not self.versions:
+            raise ValueError("The emission factor catalog has no versions")
+        self.latest = list(self.versions)[-1]
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Loads the catalog from a YAML file.
+        """
+        with open(path, 'r') as file:
+            return cls(yaml.safe_load(file)['versions'])
+
+    def get_version(self, version=None):
+        """
+        Returns the FactorVersion with the given number or, if omitted, the one in effect today:
+        a version published ahead of its effective_from date is not used before that date.
+
+        Raises:
+            KeyError: If the version does not exist.
+        """
+        return self.versions[self.version_at(datetime.date.today()) if version is None else version]
+
+    def version_at(self, date):
+        """
+        Returns the number of the version in effect at the given date (YYYY-MM-DD string or date).
+        """
+        date = date.strftime('%Y-%m-%d') if isinstance(date, datetime.date) else str(date)[:10]
+        current = None
+        for number, version in self.versions.items():
+            if version.effective_from > date:
+                break
+            current = number
+        return current if current is not None else next(iter(self.versions))
+
+    def operations(self, role, version=None):
+        """
+        Returns the operations of a role: {operation number: (name, factor)}, empty for an unknown role.
+        """
+        entry = self.get_version(version).roles.get(role)
+        return dict(entry['operations']) if entry else {}
+
+    def unit(self, role, version=None):
+        """
+        Returns the name of the unit the factors of a role refer to (e.g. 'hectare').
+        """
+        return self.get_version(version).roles[role]['unit']
+
+    def units_prompt(self, role, version=None):
+        """
+        Returns the description of the units asked to a user of the role (e.g. 'number of hectares (or units)').
+        """
+        return self.get_version(version).roles[role]['units_prompt']
+
+    def resolve(self, role, operation, version=None):
+        """
+        Returns the number of an operation given as its number or as its name (case-insensitive),
+        or None if the role has no such operation.
+        """
+        operations = self.operations(role, version)
+        if operation in operations:
+            return operation
+        return next((number for number, (name, _) in operations.items() if name.lower() == str(operation).lower()), None)
+
+    def delta(self, role, operation, units, co2, version=None):
+        """
+        Computes the credit delta of one operation: the reference emission (factor * units) minus the
+        actual emission, truncated to an integer.
+
+        Returns:
+            int|None: The delta, or None if the operation does not exist for the role.
+        """
+        number = self.resolve(role, operation, version)
+        if number is None:
+            return None
+        return int(self.operations(role, version)[number][1] * units - co2)
+
+    def compute_batch(self, roles, operations, units, actual_co2, balance=None, version=None):
+        """
+        Computes threshold and delta for a batch of operations and, when a starting balance is given,
+        checks it against the deltas. The balance check treats the rows as consecutive operations of
+        one wallet: the balance before a row is the starting balance plus the deltas of the previous rows.
+
+        Args:
+            roles (str|sequence): The role of every row, or one role for the whole batch.
+            operations (sequence): Operation numbers; names must be turned into numbers with resolve first.
+            units (sequence): Units of every operation.
+            actual_co2 (sequence): Actual CO2 emission of every operation, in tons.
+            balance (int, optional): Starting balance of the wallet.
+            version (int, optional): The catalog version; the one in effect today if omitted.
+
+        Returns:
+            BatchResult: The per-row results.
+        """
+        table = self.get_version(version).table
+        operations = np.asarray(operations, np.int64)
+        units = np.asarray(units, np.float64)
+        actual_co2 = np.asarray(actual_co2, np.float64)
+        if isinstance(roles, str):
+            role_codes = np.full(operations.shape, ROLE_INDEX.get(roles, -1), np.int64)
+        else:
+            roles = np.asarray(roles, dtype=str)
+            role_codes = np.full(operations.shape, -1, np.int64)
+            for role, code in ROLE_INDEX.items():
+                role_codes[roles == role] = code
+
+        known = (role_codes >= 0) & (operations >= 0) & (operations < table.shape[1])
+        factors = np.full(operations.shape, np.nan)
+        factors[known] = table[role_codes[known], operations[known]]
+        valid = ~np.isnan(factors) & (units > 0)
+
+        threshold = np.where(valid, factors * units, 0.0)
+        delta = np.where(valid, np.trunc(threshold - actual_co2), 0).astype(np.int64)
+        running = np.cumsum(delta)
+        required_balance = max(0, -int(running.min())) if running.size else 0
+
+        balance_after = sufficient = None
+        if balance is not None:
+            balance_after = balance + running
+            sufficient = (delta >= 0) | (balance_after >= 0)
+        return BatchResult(valid, threshold, delta, balance_after, sufficient, required_balance)
+
+    def recalculate(self, roles, operations, units, actual_co2, from_version, to_version=None):
+        """
+        Recalculates recorded operations under another version of the factors.
+
+        Returns:
+            np.ndarray: int64 change of the delta of every row (new delta minus recorded delta).
+        """
+        before = self.compute_batch(roles, operations, units, actual_co2, version=from_version)
+        after = self.compute_batch(roles, operations, units, actual_co2, version=to_version)
+        return after.delta - before.delta
+
+
+def load_catalog(path=None):
+    """
+    Loads the catalog configured by the 'emission_factors' setting (relative to the config directory).
+    """
+    if path is None:
+        from config import config
+        path = os.path.join(os.path.dirname(os.path.abspath(config.__file__)),
+                            config.config.get('emission_factors', 'emission_factors.yml'))
+    return EmissionFactorCatalog.from_file(path)
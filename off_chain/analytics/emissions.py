@@ -0,0 +1,228 @@
+"""
+This module implements the network-wide emissions analytics.
+The operations and green actions of every user are loaded once into columnar NumPy arrays
+(one element per action), and every statistic is computed with vectorized group-bys over those
+arrays instead of per-user Python loops, so millions of actions are processed in seconds.
+Days are UTC calendar days (timestamp // 86400).
+"""
+
+import numpy as np
+
+
+ROLES = ('FARMER', 'PRODUCER', 'CARRIER', 'SELLER')
+
+SECONDS_PER_DAY = 86400
+
+
+class ActionArrays:
+    """
+    Columnar view of all the on-chain actions: element i of every array describes action i.
+
+    Attributes:
+        timestamp (np.ndarray): int64 unix timestamps.
+        address_index (np.ndarray): int32 index into `addresses` / `usernames`.
+        role_code (np.ndarray): int8 index into ROLES.
+        co2 (np.ndarray): int64 CO2 amount of the action (always positive).
+        sign (np.ndarray): int8 +1 for an operation (CO2 emitted), -1 for a green action (CO2 saved).
+        delta (np.ndarray): int64 credits minted (positive) or burned (negative) by the action.
+        addresses (list): The address of every user, by address index.
+        usernames (list): The username of every user, by address index.
+    """
+    __slots__ = ('timestamp', 'address_index', 'role_code', 'co2', 'sign', 'delta', 'addresses', 'usernames')
+
+    def __init__(self, timestamp, address_index, role_code, co2, sign, delta, addresses, usernames):
+        self.timestamp = timestamp
+        self.address_index = address_index
+        self.role_code = role_code
+        self.co2 = co2
+        self.sign = sign
+        self.delta = delta
+        self.addresses = addresses
+        self.usernames = usernames
+
+    def __len__(self):
+        return len(self.timestamp)
+
+    def day(self):
+        """
+        Returns the UTC day number (days since 1970-01-01) of every action.
+        """
+        return self.timestamp // SECONDS_PER_DAY
+
+    def signed_co2(self):
+        """
+        Returns the CO2 of every action with its sign: positive when emitted, negative when saved.
+        """
+        return self.co2 * self.sign
+
+
+def load_actions(conn, chain, page_size=200):
+    """
+    Reads the operations and green actions of every registered user from the chain and packs them
+    into columnar arrays. Users are walked with keyset pagination and each user's history is
+    converted to arrays right away, so only the compact arrays are kept in memory.
+    The credit delta of the operations comes from the token events (see
+    ActionController.get_operation_deltas); a green action always mints its co2Saved. Operations
+    whose events the node no longer serves get a delta of zero.
+
+    Args:
+        conn (sqlite3.Connection): The database connection, used to list the users and their roles.
+        chain (ActionController): The chain client the histories are read from.
+        page_size (int): Number of users listed per query.
+
+    Returns:
+        ActionArrays: All the actions of the network.
+    """
+    role_codes = {role: code for code, role in enumerate(ROLES)}
+    columns = {name: [] for name in ('timestamp', 'address_index', 'role_code', 'co2', 'sign', 'delta')}
+    addresses, usernames = [], []
+    operation_deltas = chain.get_operation_deltas()
+    last_username = ""
+
+    while True:
+        users = conn.execute("""
+            SELECT username, public_key, role
+            FROM Credentials
+            WHERE username > ?
+            ORDER BY username
+            LIMIT ?
+        """, (last_username, page_size)).fetchall()
+        for username, address, role in users:
+            index = len(addresses)
+            addresses.append(address)
+            usernames.append(username)
+            ops = chain.contract.functions.getOperations(address).call()
+            green = chain.contract.functions.getGreenActions(address).call()
+            count = len(ops) + len(green)
+            if not count:
+                continue
+            columns['timestamp'].append(np.fromiter((op[2] for op in ops), np.int64, len(ops)))
+            columns['timestamp'].append(np.fromiter((action[1] for action in green), np.int64, len(green)))
+            columns['co2'].append(np.fromiter((op[3] for op in ops), np.int64, len(ops)))
+            saved = np.fromiter((action[2] for action in green), np.int64, len(green))
+            columns['co2'].append(saved)
+            columns['sign'].append(np.repeat(np.array([1, -1], np.int8), [len(ops), len(green)]))
+            deltas = operation_deltas.get(address, [])[:len(ops)]
+            columns['delta'].append(np.array(deltas + [0] * (len(ops) - len(deltas)), np.int64))
+            columns['delta'].append(saved)
+            columns['address_index'].append(np.full(count, index, np.int32))
+            columns['role_code'].append(np.full(count, role_codes[role], np.int8))
+        if len(users) < page_size:
+            break
+        last_username = users[-1][0]
+
+    dtypes = {'timestamp': np.int64, 'address_index': np.int32, 'role_code': np.int8, 'co2': np.int64, 'sign': np.int8,
+              'delta': np.int64}
+    arrays = {name: np.concatenate(parts) if parts else np.empty(0, dtypes[name]) for name, parts in columns.items()}
+    return ActionArrays(addresses=addresses, usernames=usernames, **arrays)
+
+
+def _day_index(data):
+    """
+    Returns the sorted distinct days of the actions and, for every action, the position of its day.
+    """
+    return np.unique(data.day(), return_inverse=True)
+
+
+def co2_per_role_per_day(data):
+    """
+    Sums the CO2 emitted and saved by each role on each day.
+
+    Args:
+        data (ActionArrays): The actions.
+
+    Returns:
+        tuple: (days, emitted, saved) where days holds the datetime64[D] days in order and emitted/saved
+               are int64 matrices of shape (len(ROLES), len(days)).
+    """
+    days, day_pos = _day_index(data)
+    shape = (len(ROLES), len(days))
+    cell = data.role_code.astype(np.int64) * len(days) + day_pos
+    size = shape[0] * shape[1]
+    emitted = np.bincount(cell, weights=np.where(data.sign > 0, data.co2, 0), minlength=size)
+    saved = np.bincount(cell, weights=np.where(data.sign < 0, data.co2, 0), minlength=size)
+    return (days.astype('datetime64[D]'),
+            emitted.astype(np.int64).reshape(shape),
+            saved.astype(np.int64).reshape(shape))
+
+
+def net_delta_distribution(data, percentiles=(5, 25, 50, 75, 95)):
+    """
+    Describes the distribution of the daily net credit delta of the users: for every (user, day) with
+    at least one action, the credits minted minus the credits burned by that day's actions.
+
+    Args:
+        data (ActionArrays): The actions.
+        percentiles (tuple): The percentiles to compute.
+
+    Returns:
+        dict: count, mean, std, min, max and one 'p<N>' entry per requested percentile.
+    """
+    if not len(data):
+        return {'count': 0}
+    key = data.address_index.astype(np.int64) * (int(data.day().max()) + 1) + data.day()
+    _, group = np.unique(key, return_inverse=True)
+    net_delta = np.bincount(group, weights=data.delta)
+    stats = {
+        'count': int(net_delta.size),
+        'mean': float(net_delta.mean()),
+        'std': float(net_delta.std()),
+        'min': float(net_delta.min()),
+        'max': float(net_delta.max()),
+    }
+    for percentile, value in zip(percentiles, np.percentile(net_delta, percentiles)):
+        stats[f'p{percentile}'] = float(value)
+    return stats
+
+
+def top_emitters(data, k=10, role=None):
+    """
+    Returns the k users who emitted the most CO2 in total, optionally within one role.
+
+    Args:
+        data (ActionArrays): The actions.
+        k (int): Number of users to return.
+        role (str, optional): Restricts the ranking to one role.
+
+    Returns:
+        list: Tuples (username, address, co2 emitted, co2 saved), highest emitter first.
+    """
+    mask = data.sign > 0
+    if role is not None:
+        mask &= data.role_code == ROLES.index(role)
+    users = len(data.addresses)
+    emitted = np.bincount(data.address_index[mask], weights=data.co2[mask], minlength=users)
+    saved = np.bincount(data.address_index[data.sign < 0], weights=data.co2[data.sign < 0], minlength=users)
+    k = min(k, int(np.count_nonzero(emitted)))
+    if k <= 0:
+        return []
+    top = np.argpartition(-emitted, k - 1)[:k]
+    top = top[np.argsort(-emitted[top], kind='stable')]
+    return [(data.usernames[i], data.addresses[i], int(emitted[i]), int(saved[i])) for i in top]
+
+
+def rolling_net_co2(data, window_days=7, role=None):
+    """
+    Computes the daily net CO2 (emitted minus saved) of the network, or of one role, and its rolling
+    sum over the given window. Days without actions count as zero.
+
+    Args:
+        data (ActionArrays): The actions.
+        window_days (int): Length of the rolling window in days.
+        role (str, optional): Restricts the series to one role.
+
+    Returns:
+        tuple: (days, daily, rolling) where days holds every datetime64[D] day from the first to the last
+               action and daily/rolling are int64 arrays of the same length.
+    """
+    mask = np.ones(len(data), bool) if role is None else data.role_code == ROLES.index(role)
+    if not mask.any():
+        empty = np.empty(0, np.int64)
+        return empty.astype('datetime64[D]'), empty, empty
+    day = data.day()[mask]
+    first = int(day.min())
+    daily = np.bincount(day - first, weights=data.signed_co2()[mask]).astype(np.int64)
+    cumulative = np.concatenate(([0], np.cumsum(daily)))
+    rolling = cumulative[1:] - cumulative[np.maximum(np.arange(1, daily.size + 1) - window_days, 0)]
+    days = np.arange(first, first + daily.size).astype('datetime64[D]')
+    return days, daily, rolling
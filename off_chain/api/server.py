@@ -0,0 +1,538 @@
+"""
+This module implements the HTTP/JSON API of the system, served by aiohttp on one asyncio event loop.
+Users log in with username and password and get a bearer token; their wallet is unlocked in a
+per-token Session, so transactions are signed without prompts. Tokens, their expiry and the failed
+login attempts live in the configured session store (see session/session_store.py); a token known to
+the store but not unlocked in this process (another worker, a restart) can read but not transact. Database reads are awaited on the
+AsyncDatabaseOperations pool, while chain calls and controller actions run on a separate thread pool,
+so a slow RPC never blocks the loop or the database workers. A semaphore bounds the requests handled
+at once, transactions of the same user are serialized (one nonce sequence per wallet), and the latency
+of every endpoint is recorded and served at /metrics; the RPC, SQL and crypto metrics of the process are
+served as Prometheus text at /metrics/prometheus.
+"""
+
+import asyncio
+import contextlib
+import functools
+import json
+import math
+import secrets
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from aiohttp import web
+from web3.exceptions import ContractLogicError, Web3Exception
+from config import config
+from controllers.controller import Controller
+from cli.headless import HeadlessRunner, RESULT_MESSAGES
+from database.async_operations import AsyncDatabaseOperations
+from session.session import Session
+from session.session_store import open_session_store
+from singleton.services import services as default_services
+from monitoring.metrics import metrics as registry
+
+
+class LatencyMetrics:
+    """
+    Per-endpoint request counts and latencies. Percentiles are computed over the most recent requests.
+    """
+
+    def __init__(self, window=2048):
+        self.window = window
+        self.endpoints = {}
+
+    def observe(self, endpoint, seconds, status):
+        """
+        Records one request of an endpoint.
+        """
+        stats = self.endpoints.get(endpoint)
+        if stats is None:
+            stats = self.endpoints[endpoint] = {'count': 0, 'errors': 0, 'total': 0.0, 'max': 0.0,
+                                                'recent': deque(maxlen=self.window)}
+        stats['count'] += 1
+        stats['errors'] += status >= 500
+        stats['total'] += seconds
+        stats['max'] = max(stats['max'], seconds)
+        stats['recent'].append(seconds)
+
+    def snapshot(self):
+        """
+        Returns, for every endpoint, the request and server error counts and the mean, p50, p95, p99
+        and max latency in milliseconds.
+        """
+        result = {}
+        for endpoint, stats in sorted(self.endpoints.items()):
+            recent = sorted(stats['recent'])
+            percentile = lambda p: round(recent[max(math.ceil(len(recent) * p) - 1, 0)] * 1000, 2)
+            result[endpoint] = {
+                'count': stats['count'],
+                'errors': stats['errors'],
+                'mean_ms': round(stats['total'] / stats['count'] * 1000, 2),
+                'p50_ms': percentile(0.50),
+                'p95_ms': percentile(0.95),
+                'p99_ms': percentile(0.99),
+                'max_ms': round(stats['max'] * 1000, 2),
+            }
+        return result
+
+
+class ApiSession:
+    """
+    The state of one logged in API client.
+    """
+    __slots__ = ('token', 'username', 'role', 'controller', 'lock')
+
+    def __init__(self, token, username, role, controller):
+        self.token = token
+        self.username = username
+        self.role = role
+        self.controller = controller
+        self.lock = asyncio.Lock()
+
+
+def _error(status, message):
+    return web.json_response({'error': message}, status=status)
+
+
+class _ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class ApiServer:
+    """
+    The HTTP/JSON API. Build the aiohttp application with make_app() or serve it with run().
+    """
+
+    # Paths served without a concurrency slot, so the server can be observed while saturated.
+    UNLIMITED_PATHS = ('/health', '/metrics', '/metrics/prometheus')
+
+    def __init__(self, services=None, max_concurrency=None, queue_timeout=None, chain_workers=None, db_pool_size=None,
+                 store=None):
+        """
+        Args:
+            services (ServiceContainer, optional): The shared services; the application-wide container if omitted.
+            max_concurrency (int, optional): Requests handled at once; defaults to api.max_concurrency.
+            queue_timeout (float, optional): Seconds a request waits for a slot before a 503; defaults to api.queue_timeout.
+            chain_workers (int, optional): Threads for chain calls and controller actions; defaults to api.chain_workers.
+            db_pool_size (int, optional): Database worker threads; defaults to storage.pool_size.
+            store (SessionStore, optional): The session store; the one configured in 'sessions' if omitted.
+        """
+        settings = config.config.get('api') or {}
+        self.services = services or default_services
+        self.max_concurrency = int(max_concurrency or settings.get('max_concurrency', 64))
+        self.register_concurrency = int(settings.get('register_concurrency', 4))
+        self.queue_timeout = float(queue_timeout or settings.get('queue_timeout', 5))
+        self.executor = ThreadPoolExecutor(max_workers=int(chain_workers or settings.get('chain_workers', 16)),
+                                           thread_name_prefix='sfs-api')
+        self.db = AsyncDatabaseOperations(db_pool_size)
+        self.metrics = LatencyMetrics()
+        session_settings = config.config.get('sessions') or {}
+        self.store = store if store is not None else open_session_store(session_settings)
+        self.store.on_evict = self._forget
+        # Sessions unlocked in this process, least recently used first.
+        self.live = OrderedDict()
+        self.max_live = int(session_settings.get('max_sessions', 10000))
+        self.sweep_interval = float(session_settings.get('sweep_interval', 60))
+        self.in_flight = 0
+        self.signer_ttl = (config.config.get('signer') or {}).get('idle_ttl', 900)
+        self._slots = None
+        self._register_slots = None
+        # login name -> [asyncio.Lock, number of requests holding or waiting for it]
+        self._login_locks = {}
+        self._sweeper = None
+
+    # Plumbing
+
+    async def _blocking(self, func, *args, **kwargs):
+        """
+        Runs a blocking call (chain RPC, controller action) on the API thread pool.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    @web.middleware
+    async def _metrics_middleware(self, request, handler):
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await handler(request)
+            status = response.status
+            return response
+        except web.HTTPException as e:
+            status = e.status
+            raise
+        finally:
+            resource = request.match_info.route.resource
+            endpoint = f"{request.method} {resource.canonical if resource else 'unmatched'}"
+            self.metrics.observe(endpoint, time.perf_counter() - start, status)
+
+    @web.middleware
+    async def _limit_middleware(self, request, handler):
+        if request.path in self.UNLIMITED_PATHS:
+            return await handler(request)
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            return _error(503, 'The server is busy, try again later.')
+        self.in_flight += 1
+        try:
+            return await handler(request)
+        except _ApiError as e:
+            return _error(e.status, e.message)
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+    async def _body(self, request, *fields):
+        """
+        Returns the JSON body of a request, checking that it has the given fields.
+        """
+        try:
+            body = await request.json()
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            raise _ApiError(400, 'The request body must be a JSON object.')
+        if not isinstance(body, dict):
+            raise _ApiError(400, 'The request body must be a JSON object.')
+        missing = [field for field in fields if body.get(field) in (None, '')]
+        if missing:
+            raise _ApiError(400, f"Missing fields: {', '.join(missing)}.")
+        return body
+
+    async def _store(self, func, *args):
+        """
+        Runs a session store call. Calls of a store doing I/O (SQLite) run on the database worker pool,
+        so the event loop never waits on the disk; calls of the memory store run inline.
+        """
+        if self.store.blocking:
+            return await self.db.call(func, *args)
+        return func(*args)
+
+    async def _session(self, request, signer=True):
+        """
+        Returns the session of the bearer token of a request and restarts its TTL and its wallet idle timer.
+        A session whose wallet has been idle for longer than signer.idle_ttl is closed. A session known to the
+        store but not unlocked in this process is served, without a wallet, only when signer is False.
+        """
+        header = request.headers.get('Authorization', '')
+        token = header[7:] if header.startswith('Bearer ') else None
+        record = await self._store(self.store.get, token) if token else None
+        if record is None:
+            raise _ApiError(401, 'Missing, unknown or expired token.')
+        session = self.live.get(token)
+        if session is None:
+            if signer:
+                raise _ApiError(401, 'The wallet of this session is locked, please log in again.')
+            return ApiSession(token, record.username, record.role, Controller(Session(), self.services))
+        wallet = session.controller.session.get_signer()
+        if wallet is None or not wallet.touch():
+            await self._close_session(session)
+            raise _ApiError(401, 'The session has expired, please log in again.')
+        self.live.move_to_end(token)
+        return session
+
+    def _remember(self, session):
+        """
+        Keeps an unlocked session in this process, locking the least recently used ones beyond sessions.max_sessions.
+        """
+        self.live[session.token] = session
+        while len(self.live) > self.max_live:
+            _, oldest = self.live.popitem(last=False)
+            oldest.controller.session.reset_session()
+
+    def _forget(self, token):
+        """
+        Drops the unlocked state of a token and wipes its wallet; called (on the event loop) when the store
+        evicts the token.
+        """
+        session = self.live.pop(token, None)
+        if session is not None:
+            session.controller.session.reset_session()
+
+    @contextlib.asynccontextmanager
+    async def _login_lock(self, login):
+        """
+        Serializes the logins of one login name, so concurrent attempts are checked against and
+        counted in the stored attempt state one by one.
+        """
+        entry = self._login_locks.get(login)
+        if entry is None:
+            entry = self._login_locks[login] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._login_locks[login]
+
+    async def _close_session(self, session):
+        await self._store(self.store.delete, session.token)
+        self._forget(session.token)
+
+    async def _close_user_sessions(self, username):
+        await self._store(self.store.delete_user, username)
+        for token in [token for token, session in self.live.items() if session.username == username]:
+            self._forget(token)
+
+    async def sweep(self):
+        """
+        Evicts the expired sessions from the store and locks the sessions of this process whose wallet
+        has been idle for too long.
+
+        Returns:
+            int: The number of sessions evicted from the store.
+        """
+        evicted = await self._store(self.store.evict_expired)
+        for token in [token for token, session in self.live.items() if session.controller.session.get_signer() is None]:
+            self._forget(token)
+        return evicted
+
+    async def _sweep_periodically(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            await self.sweep()
+
+    @staticmethod
+    def _int(value, name):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            raise _ApiError(400, f"'{name}' must be an integer.")
+
+    @staticmethod
+    def _result(code, **payload):
+        if code != 0:
+            return _error(402 if code == -2 else 400 if code == -3 else 502, RESULT_MESSAGES.get(code, 'The action failed.'))
+        return web.json_response(payload)
+
+    # Service endpoints
+
+    async def health(self, request):
+        return web.json_response({'status': 'ok'})
+
+    async def get_metrics(self, request):
+        return web.json_response({'in_flight': self.in_flight, 'max_concurrency': self.max_concurrency,
+                                  'sessions': await self._store(len, self.store), 'unlocked_sessions': len(self.live),
+                                  'endpoints': self.metrics.snapshot()})
+
+    async def get_prometheus_metrics(self, request):
+        return web.Response(text=registry.to_prometheus(), content_type='text/plain', charset='utf-8',
+                            headers={'X-Content-Type-Options': 'nosniff'})
+
+    # Auth
+
+    async def register(self, request):
+        body = await self._body(request, 'username', 'name', 'lastname', 'role', 'birthday', 'email', 'phone',
+                                'password', 'public_key', 'private_key')
+        # Registration needs no login and sends an admin transaction: only a few run at once.
+        if self._register_slots.locked():
+            return web.json_response({'error': 'Too many registrations in progress, try again later.'},
+                                     status=429, headers={'Retry-After': '1'})
+        runner = HeadlessRunner(Session(), self.services)
+        async with self._register_slots:
+            try:
+                ok, message = await self._blocking(runner.register, body['username'], body['name'], body['lastname'],
+                                                   body['role'], body['birthday'], body['email'], body['phone'],
+                                                   body.get('company_name', ''), body['password'], body['public_key'],
+                                                   body['private_key'])
+            except ContractLogicError as e:
+                return _error(409, f"The on-chain registration was rejected: {e.message or e}")
+            except Web3Exception:
+                return _error(502, 'The on-chain registration failed, try again later.')
+        if not ok:
+            return _error(400, message)
+        return web.json_response({'message': message}, status=201)
+
+    async def login(self, request):
+        body = await self._body(request, 'username', 'password')
+        controller = Controller(Session(), self.services)
+        async with self._login_lock(body['username']):
+            await self._store(self.store.load_attempts, body['username'], controller.session)
+            if not controller.check_attempts() and controller.session.get_timeout_left() <= 0:
+                controller.session.reset_attempts()
+            # open_session returns -2 without verifying the password when the attempts are used up.
+            code, role = await self._blocking(controller.open_session, body['username'], body['password'])
+            await self._store(self.store.save_attempts, body['username'], controller.session)
+        if code == -2:
+            retry_after = int(controller.session.get_timeout_left()) + 1
+            return web.json_response({'error': 'Too many failed login attempts, try again later.'},
+                                     status=429, headers={'Retry-After': str(retry_after)})
+        if code != 0:
+            return _error(401, 'Wrong credentials.')
+        token = secrets.token_urlsafe(32)
+        await self._store(self.store.create, token, body['username'], role)
+        self._remember(ApiSession(token, body['username'], role, controller))
+        return web.json_response({'token': token, 'username': body['username'], 'role': role,
+                                  'idle_timeout': self.signer_ttl})
+
+    async def logout(self, request):
+        await self._close_session(await self._session(request, signer=False))
+        return web.json_response({'message': 'Logged out.'})
+
+    # Profile
+
+    async def get_profile(self, request):
+        session = await self._session(request, signer=False)
+        user = await self.db.get_user_by_username(session.username)
+        return web.json_response({'username': user.get_username(), 'name': user.get_name(),
+                                  'lastname': user.get_lastname(), 'role': user.get_user_role(),
+                                  'birthday': user.get_birthday(), 'email': user.get_email(),
+                                  'phone': user.get_phone(), 'company_name': user.get_company_name()})
+
+    async def update_profile(self, request):
+        session = await self._session(request)
+        body = await self._body(request)
+        current = await self.db.get_user_by_username(session.username)
+        name = body.get('name') or current.get_name()
+        lastname = body.get('lastname') or current.get_lastname()
+        birthday = body.get('birthday') or current.get_birthday()
+        phone = body.get('phone') or current.get_phone()
+        controller = session.controller
+        if not controller.check_birthdate_format(birthday) or not controller.check_phone_number_format(phone):
+            return _error(400, 'Invalid birthdate or phone number format.')
+
+        def update():
+            address = controller.get_public_key_by_username(session.username)
+            receipt = controller.chain.update_user(name, lastname, session.role, from_address=address,
+                                                   signer=controller.session.get_signer())
+            if receipt.status != 1:
+                return -1
+            return controller.update_user_profile(session.username, name, lastname, birthday, phone)
+
+        async with session.lock:
+            code = await self._blocking(update)
+        return self._result(code, message='Profile updated.')
+
+    async def change_password(self, request):
+        session = await self._session(request, signer=False)
+        body = await self._body(request, 'old_password', 'new_password')
+        if not session.controller.check_password_format(body['new_password']):
+            return _error(400, 'The new password does not satisfy the password policy.')
+        code = await self._blocking(session.controller.change_passwd, session.username,
+                                    body['old_password'], body['new_password'])
+        if code != 0:
+            return _error(403, 'Wrong password.')
+        await self._close_user_sessions(session.username)
+        return web.json_response({'message': 'Password changed, please log in again.'})
+
+    # Credits and actions
+
+    async def balance(self, request):
+        session = await self._session(request, signer=False)
+        address = await self.db.get_public_key_by_username(session.username)
+        balance = await self._blocking(session.controller.chain.check_balance, address)
+        return web.json_response({'username': session.username, 'address': address, 'balance': balance})
+
+    async def operation(self, request):
+        session = await self._session(request)
+        body = await self._body(request, 'operation', 'units', 'co2')
+        units, co2 = self._int(body['units'], 'units'), self._int(body['co2'], 'co2')
+        async with session.lock:
+            code, delta = await self._blocking(session.controller.record_operation, session.username,
+                                               session.role, body['operation'], units, co2)
+        return self._result(code, message='Operation recorded.', delta=delta)
+
+    async def green_action(self, request):
+        session = await self._session(request)
+        body = await self._body(request, 'description', 'co2_saved')
+        co2_saved = self._int(body['co2_saved'], 'co2_saved')
+        async with session.lock:
+            code = await self._blocking(session.controller.record_green_action, session.username,
+                                        body['description'], co2_saved)
+        return self._result(code, message='Green action recorded.', credits=co2_saved)
+
+    async def transfer(self, request):
+        session = await self._session(request)
+        body = await self._body(request, 'recipient', 'amount')
+        amount = self._int(body['amount'], 'amount')
+        async with session.lock:
+            code = await self._blocking(session.controller.give_credit, session.username, body['recipient'], amount)
+        return self._result(code, message='Credits transferred.', recipient=body['recipient'], amount=amount)
+
+    # Reports
+
+    async def list_reports(self, request):
+        session = await self._session(request, signer=False)
+        page_size = min(self._int(request.query.get('page_size', 20), 'page_size'), 200)
+        dates = await self.db.run('get_report_date_page', session.username, request.query.get('after', ''), page_size)
+        return web.json_response({'dates': dates, 'next': dates[-1] if len(dates) == page_size else None})
+
+    async def get_report(self, request):
+        session = await self._session(request, signer=False)
+        page = max(self._int(request.query.get('page', 1), 'page'), 1)
+        page_size = min(self._int(request.query.get('page_size', 50), 'page_size'), 500)
+        rows = await self.db.run('get_report_line_page', session.username, request.match_info['creation_date'],
+                                 (page - 1) * page_size, page_size + 1)
+        lines = [{'id_report': id_report, 'operation_date': operation_date, 'report_co2': co2,
+                  'action_type': action_type, 'description': description}
+                 for id_report, operation_date, co2, action_type, description, _ in rows[:page_size]]
+        if not lines and page == 1:
+            return _error(404, 'Report not found.')
+        return web.json_response({'lines': lines, 'page': page, 'has_next': len(rows) > page_size})
+
+    async def create_report(self, request):
+        session = await self._session(request, signer=False)
+        body = await self._body(request, 'start_date', 'end_date')
+        creation_date = datetime.today().strftime('%Y-%m-%d %H:%M:%S')
+        code = await self._blocking(session.controller.insert_report_info, creation_date, str(body['start_date']),
+                                    str(body['end_date']), session.username)
+        if code != 1:
+            return _error(400, 'No report created.')
+        return web.json_response({'creation_date': creation_date}, status=201)
+
+    # Application
+
+    async def _on_startup(self, app):
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._register_slots = asyncio.Semaphore(self.register_concurrency)
+        # The SQLite store evicts from the database worker threads: the live state is dropped on the loop.
+        loop = asyncio.get_running_loop()
+        self.store.on_evict = lambda token: loop.call_soon_threadsafe(self._forget, token)
+        self._sweeper = asyncio.create_task(self._sweep_periodically())
+
+    async def _on_cleanup(self, app):
+        self._sweeper.cancel()
+        # The tokens stay in the store; only the wallets unlocked in this process are wiped.
+        for token in list(self.live):
+            self._forget(token)
+        self.executor.shutdown(wait=True)
+        await self.db.close()
+
+    def make_app(self):
+        """
+        Builds the aiohttp application with the routes and middlewares of the API.
+        """
+        app = web.Application(middlewares=[self._metrics_middleware, self._limit_middleware])
+        app.on_startup.append(self._on_startup)
+        app.on_cleanup.append(self._on_cleanup)
+        app.add_routes([
+            web.get('/health', self.health),
+            web.get('/metrics', self.get_metrics),
+            web.get('/metrics/prometheus', self.get_prometheus_metrics),
+            web.post('/auth/register', self.register),
+            web.post('/auth/login', self.login),
+            web.post('/auth/logout', self.logout),
+            web.get('/profile', self.get_profile),
+            web.put('/profile', self.update_profile),
+            web.post('/profile/password', self.change_password),
+            web.get('/balance', self.balance),
+            web.post('/operations', self.operation),
+            web.post('/green-actions', self.green_action),
+            web.post('/transfers', self.transfer),
+            web.get('/reports', self.list_reports),
+            web.post('/reports', self.create_report),
+            web.get('/reports/{creation_date}', self.get_report),
+        ])
+        return app
+
+    def run(self, host=None, port=None):
+        """
+        Serves the API until interrupted.
+        """
+        settings = config.config.get('api') or {}
+        web.run_app(self.make_app(), host=host or settings.get('host', '127.0.0.1'),
+                    port=int(port or settings.get('port', 8080)))
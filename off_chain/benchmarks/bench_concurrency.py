@@ -0,0 +1,130 @@
+"""
+Benchmark of read/write throughput when several CLI processes share the same SQLite database.
+
+Each worker is a separate process, like a CLI container: writers insert report rows in small
+transactions (as insert_report does) while readers run the per-user report lookups used by the
+report screens. The run is repeated with the default rollback journal and with the 'storage'
+settings from configuration.yml, so the effect of WAL and the other pragmas can be compared.
+
+Usage (from the off_chain directory):
+    python benchmarks/bench_concurrency.py --readers 4 --writers 2 --seconds 5
+    python benchmarks/bench_concurrency.py --db copy_of_SFS.db
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import config
+from database.connection import apply_pragmas
+from database.migrations import run_migrations
+
+USERNAMES = [f"bench_user_{i}" for i in range(50)]
+
+
+def _connect(db_path, storage):
+    conn = sqlite3.connect(db_path, timeout=30)
+    apply_pragmas(conn, storage)
+    return conn
+
+
+def _writer(db_path, storage, deadline, result_queue):
+    conn = _connect(db_path, storage)
+    done, errors = 0, 0
+    while time.time() < deadline:
+        username = random.choice(USERNAMES)
+        try:
+            conn.execute("BEGIN")
+            for day in range(3):
+                conn.execute("""
+                    INSERT INTO Reports (creation_date, operation_date, username, role, operations, co2)
+                    VALUES (?, ?, ?, 'FARMER', ?, ?)
+                """, (time.strftime('%Y-%m-%d %H:%M:%S'), f"2025-01-0{day + 1}", username, "[Sowing] Sowing (1 hectares)", 3))
+            conn.commit()
+            done += 1
+        except sqlite3.OperationalError:
+            conn.rollback()
+            errors += 1
+    conn.close()
+    result_queue.put(("write", done, errors))
+
+
+def _reader(db_path, storage, deadline, result_queue):
+    conn = _connect(db_path, storage)
+    done, errors = 0, 0
+    while time.time() < deadline:
+        try:
+            conn.execute("""
+                SELECT id_report, creation_date, operation_date, username, role, operations, co2
+                FROM Reports
+                WHERE username = ?
+            """, (random.choice(USERNAMES),)).fetchall()
+            done += 1
+        except sqlite3.OperationalError:
+            errors += 1
+    conn.close()
+    result_queue.put(("read", done, errors))
+
+
+def run_scenario(db_path, storage, readers, writers, seconds):
+    """
+    Runs one scenario and returns (reads/s, writes/s, failed operations).
+    """
+    conn = _connect(db_path, storage)
+    run_migrations(conn)
+    conn.close()
+
+    result_queue = multiprocessing.Queue()
+    deadline = time.time() + 0.5 + seconds
+    processes = [multiprocessing.Process(target=_writer, args=(db_path, storage, deadline, result_queue)) for _ in range(writers)]
+    processes += [multiprocessing.Process(target=_reader, args=(db_path, storage, deadline, result_queue)) for _ in range(readers)]
+    for process in processes:
+        process.start()
+
+    totals = {"read": 0, "write": 0}
+    errors = 0
+    for _ in processes:
+        kind, done, failed = result_queue.get()
+        totals[kind] += done
+        errors += failed
+    for process in processes:
+        process.join()
+
+    return totals["read"] / seconds, totals["write"] / seconds, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", help="Existing database to copy for the benchmark (the original is never modified).")
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    configured = config.config.get("storage") or {}
+    scenarios = [
+        ("rollback journal", {"journal_mode": "DELETE", "busy_timeout": configured.get("busy_timeout", 5000)}),
+        ("configured storage", configured),
+    ]
+
+    print(f"{args.readers} reader and {args.writers} writer processes, {args.seconds:g}s per scenario\n")
+    print(f"{'scenario':<22}{'reads/s':>12}{'writes/s':>12}{'failed':>10}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, storage in scenarios:
+            db_path = os.path.join(tmp_dir, f"{name.replace(' ', '_')}.db")
+            if args.db:
+                shutil.copyfile(args.db, db_path)
+            reads, writes, errors = run_scenario(db_path, storage, args.readers, args.writers, args.seconds)
+            print(f"{name:<22}{reads:>12.0f}{writes:>12.0f}{errors:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Measurement of the interactive CLI start-up time.
+
+The command line interface, its Utils and its Controller share one service container, which builds
+the database layer and the chain client on first use. This script times the module imports, the
+construction of the interface, the first database access and, with --chain, the chain connection,
+and compares them with the previous wiring, where every component built its own DatabaseOperations
+(three instances and three schema migration passes before the menu was shown).
+
+Usage (from the off_chain directory):
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --chain --repeat 5
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _ms(start):
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chain", action="store_true", help="Also time the connection to the chain.")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of interfaces built after the first one.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    from cli.cli import CommandLineInterface
+    from database.connection import close_connection
+    from database.database_operation import DatabaseOperations
+    from session.session import Session
+    from singleton.services import ServiceContainer
+    imports = _ms(start)
+
+    services = ServiceContainer()
+    start = time.perf_counter()
+    cli = CommandLineInterface(Session(), services)
+    construction = _ms(start)
+
+    start = time.perf_counter()
+    cli.controller.db_ops
+    cli.util.controller.db_ops
+    first_db = _ms(start)
+
+    timings = [("imports", imports), ("interface construction", construction), ("first database access", first_db)]
+
+    if args.chain:
+        start = time.perf_counter()
+        cli.util.chain
+        timings.append(("chain connection", _ms(start)))
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        CommandLineInterface(Session(), services).util.controller.db_ops
+    timings.append((f"{args.repeat} more interfaces", _ms(start)))
+
+    close_connection()
+    start = time.perf_counter()
+    for _ in range(3):
+        DatabaseOperations()
+    timings.append(("previous wiring (3 DatabaseOperations)", _ms(start)))
+
+    print(f"{'step':<42}{'ms':>10}")
+    for name, ms in timings:
+        print(f"{name:<42}{ms:>10.2f}")
+    print(f"\ncontainer build times (ms): {services.startup_report()}")
+
+
+if __name__ == "__main__":
+    main()
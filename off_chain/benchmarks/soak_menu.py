@@ -0,0 +1,112 @@
+"""
+Soak test of the interactive menus: thousands of login/logout cycles with scripted input.
+
+Every cycle logs in, opens the profile, operation and report menus, goes back from each one with
+Enter and logs out, with input() and getpass() fed from a script. The controller is replaced by a
+scripted one, so neither the database nor the chain is touched and only the menu code is measured.
+The run fails (exit code 1) if the traced memory grows by more than --max-growth-kb between the end
+of the warm-up and the end of the run, or if the call stack is deeper in the last login than in the
+first one after the warm-up.
+
+Usage (from the off_chain directory):
+    python benchmarks/soak_menu.py
+    python benchmarks/soak_menu.py --cycles 20000 --max-growth-kb 64
+"""
+
+import argparse
+import builtins
+import contextlib
+import getpass
+import inspect
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cli.cli import CommandLineInterface
+from session.session import Session
+
+# One login/logout cycle: log in from the main menu, visit the three submenus, log out.
+CYCLE = [
+    '2', '0xPUBLIC', '0xPRIVATE', 'soak_user', 'Passw0rd#', 'n',
+    '1', '',
+    '2', '',
+    '3', '',
+    '5', 'Y',
+]
+
+
+class ScriptedController:
+    """
+    Stands in for the Controller: every login succeeds and records the depth of the call stack
+    at the first and at the last login.
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self.logins = 0
+        self.first_depth = self.last_depth = None
+
+    def check_attempts(self):
+        return True
+
+    def login(self, username, password, public_key, private_key, unlock_signer=False):
+        self.logins += 1
+        self.last_depth = len(inspect.stack(0))
+        if self.first_depth is None:
+            self.first_depth = self.last_depth
+        self.session.set_user(username)
+        return 0, 'FARMER'
+
+
+def _script(cycles):
+    for _ in range(cycles):
+        yield from CYCLE
+    yield '3'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cycles", type=int, default=5000)
+    parser.add_argument("--warmup", type=int, default=200, help="Cycles run before the memory baseline is taken.")
+    parser.add_argument("--max-growth-kb", type=float, default=64)
+    args = parser.parse_args()
+
+    session = Session()
+    controller = ScriptedController(session)
+    cli = CommandLineInterface(session, controller=controller)
+    script = _script(args.warmup + args.cycles)
+    builtins.input = getpass.getpass = lambda prompt='': next(script)
+
+    tracemalloc.start()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        state = cli.step('main')
+        while controller.logins < args.warmup or state != 'main':
+            state = cli.step(state)
+        controller.logins, controller.first_depth = 0, None
+        baseline, _ = tracemalloc.get_traced_memory()
+        cli.run()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    growth_kb = (current - baseline) / 1024
+    print(f"{controller.logins} logins after the warm-up, stack depth at login "
+          f"{controller.first_depth} -> {controller.last_depth}")
+    print(f"traced memory after warm-up {baseline / 1024:.1f} KB, at the end {current / 1024:.1f} KB "
+          f"(growth {growth_kb:+.1f} KB, peak {peak / 1024:.1f} KB)")
+
+    failures = []
+    if controller.last_depth > controller.first_depth:
+        failures.append("the call stack grows with every login/logout cycle")
+    if growth_kb > args.max_growth_kb:
+        failures.append(f"memory grew by {growth_kb:.1f} KB (limit {args.max_growth_kb:g} KB)")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("OK: flat stack and memory")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,27 @@
 import getpass
-import re
 from session.session import Session
 from eth_utils import *
 from eth_keys import *
 from controllers.controller import Controller
-from singleton.action_controller_instance import action_controller_instance as act_controller
+from singleton.services import ServiceContainer, services as default_services
 # from controllers.deploy_controller import DeployController
-from database.database_operation import DatabaseOperations
 from cli.utils import Utils
+from cli.report_pager import ReportPager
 from colorama import init, Fore, Style
+from web3.exceptions import Web3Exception
 init(strip=False, convert=False)
 from tabulate import tabulate
 
 
+# Menu states of the command line interface.
+MAIN_MENU = 'main'
+USER_MENU = 'user'
+PROFILE_MENU = 'profile'
+OPERATION_MENU = 'operation'
+REPORT_MENU = 'report'
+EXIT = 'exit'
+
+
 class CommandLineInterface:
     """
     This class implements the command line interface for the Carbon Credit Management System.
@@ -22,13 +31,15 @@ class CommandLineInterface:
     It also handles user input validation and provides a menu-driven interface for easy navigation.
     """
 
-    def __init__(self, session: Session):
+    def __init__(self, session: Session, services: ServiceContainer = None, controller: Controller = None):
 
         self.session = session
-        self.controller = Controller(session)
+        self.services = services or default_services
+        self.controller = controller or Controller(session, self.services)
        # self.deploy_controller = DeployController()
-        self.ops = DatabaseOperations()
-        self.util = Utils(session)
+        self.util = Utils(session, self.controller)
+        self.username = None
+        self.user_role = None
 
         
         self.menu = {
@@ -36,16 +47,43 @@ class CommandLineInterface:
             2: 'Log In',
             3: 'Exit',
         }
+        self.menus = self._build_menus()
 
     #PAGE_SIZE = 3 
     #current_page = 0
 
+    def run(self):
+        """
+        Runs the menus until the user exits. Every screen handles one choice and returns the state
+        to show next, so moving between menus never nests calls and the stack stays flat however
+        long the session lasts.
+        """
+        state = MAIN_MENU
+        while state != EXIT:
+            state = self.step(state)
+        print('Bye Bye!')
+
+    def step(self, state):
+        """
+        Shows one screen of the given state and handles one choice.
+
+        Returns:
+            str: The next state.
+        """
+        if state == MAIN_MENU:
+            return self.print_menu()
+        return self.menu_screen(state)
+
     def print_menu(self):
         """
         This method prints the main menu options available to the user and prompts for 
         their choice. It then directs the user to the corresponding functionality based 
         on their selection. The method handles user input validation to ensure a valid 
         choice is made.
+
+        Returns:
+            str: The next state: the user menu after a successful registration or login,
+                 EXIT when the user exits, the main menu otherwise.
         """
 
         print(Fore.CYAN + r""" 
@@ -66,29 +104,98 @@ class CommandLineInterface:
 
             if choice == 1:
                     print('Proceed with the registration...')
-                    self.registration_menu()
+                    if self.registration_menu() == 0:
+                        return USER_MENU
             elif choice == 2:
                     print('Proceed with the log in...')
                     res_code = self.login_menu()
                     if res_code == 0:
-                        self.print_menu()
+                        return USER_MENU
                     elif res_code == -3:
                         print(Fore.CYAN + "Login cancelled. Returning to previous menu..." + Style.RESET_ALL)
             elif choice == 3:
-                    print('Bye Bye!')
-                    exit()
+                    return EXIT
             else:
                     print(Fore.RED + 'Wrong option. Please enter one of the options listed in the menu!' + Style.RESET_ALL)
 
         except ValueError:
             print(Fore.RED + 'Wrong input. Please enter a number!\n'+ Style.RESET_ALL)
-            return
-    
-    
+        return MAIN_MENU
+
+    def menu_screen(self, state):
+        """
+        Shows the menu of the given state from the menu table, reads one choice and runs it.
+        Pressing Enter without typing anything goes back, in the menus that have a previous menu.
+
+        Returns:
+            str: The state returned by the chosen action, or the target state of the choice,
+                 or the same state if the choice only runs an action or is invalid.
+        """
+        title, back, options = self.menus[state]
+        print(Fore.CYAN + f"\n{title}" + Style.RESET_ALL)
+        for key, (label, _, _) in options.items():
+            print(f"{key} -- {label}")
+
+        choice = input("Choose an option: ").strip()
+        if choice == "" and back is not None:
+            return back
+        try:
+            choice = int(choice)
+        except ValueError:
+            print(Fore.RED + "Invalid Input! Please enter a valid number." + Style.RESET_ALL)
+            return state
+        if choice not in options:
+            print(Fore.RED + "Invalid choice! Please try again." + Style.RESET_ALL)
+            return state
+
+        _, action, target = options[choice]
+        next_state = action() if action else None
+        return next_state or target or state
+
+    def _build_menus(self):
+        """
+        Builds the menu table: state -> (title, state reached by pressing Enter or None,
+        {choice: (label, action, target state)}). The action runs with the logged in user; a choice
+        without action just moves to its target state.
+        """
+        return {
+            USER_MENU: ("MENU", None, {
+                1: ("Profile", None, PROFILE_MENU),
+                2: ("Operation", None, OPERATION_MENU),
+                3: ("Report", None, REPORT_MENU),
+                4: ("Ask for credit", lambda: self.ask_for_credit(self.username), None),
+                5: ("Log out", self.logout, None),
+            }),
+            PROFILE_MENU: ("PROFILE MENU (press Enter to go back)", USER_MENU, {
+                1: ("View Profile", lambda: self.view_userview(self.username), None),
+                2: ("Update Profile", lambda: self.util.update_profile(self.username, self.user_role), None),
+                3: ("Change Password", lambda: self.util.change_passwd(self.username), None),
+            }),
+            OPERATION_MENU: ("OPERATION MENU (press Enter to go back)", USER_MENU, {
+                1: ("Check Balance", lambda: self.view_balance(self.username), None),
+                2: ("Give Credit", lambda: self.give_credit(self.username), None),
+                3: ("Make Operation", lambda: self.util.make_operation(self.username, self.user_role), None),
+                4: ("Make Green Action", lambda: self.util.make_green_action(self.username), None),
+            }),
+            REPORT_MENU: ("REPORT MENU (press Enter to go back)", USER_MENU, {
+                1: ("Generate New Report", lambda: self.util.create_report(self.username), None),
+                2: ("View Report", lambda: self.view_user_report(self.username), None),
+                3: ("CO2 Summary", lambda: self.view_co2_summary(self.username), None),
+                4: ("Search Operations", lambda: self.search_operations(self.username), None),
+                5: ("View Archived Reports", lambda: self.view_archived_report(self.username), None),
+            }),
+        }
+
+    def _set_user(self, username, user_role):
+        self.username, self.user_role = username, user_role
+
     def registration_menu(self):
         """
         Prompts user for wallet credentials, personal info, and role selection for registration.
         Allows exiting at any input step by typing 'exit'.
+
+        Returns:
+            int: 0 if the user was registered (and is now logged in), -1 if the user exited or the keys do not match.
         """
 
         print(Fore.YELLOW + "Type 'exit' at any prompt to cancel and go back.\n" + Style.RESET_ALL)
@@ -156,8 +263,7 @@ class CommandLineInterface:
                     password = getpass.getpass('Password: ')
                     if password.lower() == 'exit': return -1
 
-                    passwd_regex = r'^(?=.*\d)(?=.*[a-z])(?=.*[A-Z])(?=.*[@#$%^&+=])(?!.*\s).{8,100}$'
-                    if not re.fullmatch(passwd_regex, password):
+                    if not self.controller.check_password_format(password):
                         print(Fore.RED + 'Password must be at least 8 characters long and include digits, upper and lower case letters, and a special character.\n' + Style.RESET_ALL)
                     else:
                         break
@@ -197,15 +303,27 @@ class CommandLineInterface:
                     if self.controller.check_unique_phone_number(phone) == 0: break
                     else: print(Fore.RED + "This phone number has already been inserted. \n" + Style.RESET_ALL)
                 else: print(Fore.RED + "Invalid phone number format.\n" + Style.RESET_ALL)
-            act_controller.add_user(name, lastname, user_role, public_key)
-            registration_code = self.controller.registration(username, name, lastname, user_role, birthday, email, phone, company_name, password, public_key, private_key)
+            try:
+                registration_code = self.controller.registration(username, name, lastname, user_role, birthday, email, phone, company_name, password, public_key, private_key)
+            except Web3Exception as e:
+                print(Fore.RED + f"The on-chain registration failed: {getattr(e, 'message', None) or e}\n" + Style.RESET_ALL)
+                return -1
             if registration_code == 0:
                 print(Fore.GREEN + 'Information saved correctly!' + Style.RESET_ALL)
-                self.user_menu(username,user_role)
+                self._set_user(username, user_role)
+                return 0
             elif registration_code == -1:
                 print(Fore.RED + 'Internal error!' + Style.RESET_ALL)
             elif registration_code == -2:
                     print(Fore.RED + 'Your username has been taken.\n' + Style.RESET_ALL)
+            elif registration_code == -3:
+                    print(Fore.RED + 'This e-mail has already been inserted.\n' + Style.RESET_ALL)
+            elif registration_code == -4:
+                    print(Fore.RED + 'This phone number has already been inserted.\n' + Style.RESET_ALL)
+            elif registration_code == -5:
+                    print(Fore.RED + 'A wallet with these keys already exists.\n' + Style.RESET_ALL)
+            elif registration_code == -6:
+                    print(Fore.RED + 'The on-chain registration was reverted.\n' + Style.RESET_ALL)
         else:
             print(Fore.RED + 'Sorry, but the provided public and private key do not match.\n' + Style.RESET_ALL)
             return -1
@@ -241,11 +359,15 @@ class CommandLineInterface:
                 passwd = getpass.getpass('Insert password: ')
                 if passwd.lower() == 'exit': return -3
 
-                login_code, user_role = self.controller.login(username, passwd, public_key, private_key)
+                unlock = input('Keep your wallet unlocked for this session, so transactions do not ask for the private key? (Y/n): ').strip().upper()
+                if unlock.lower() == 'exit': return -3
+
+                login_code, user_role = self.controller.login(username, passwd, public_key, private_key, unlock_signer=(unlock == 'Y'))
 
                 if login_code == 0:
                     print(Fore.GREEN + '\nYou have successfully logged in!\n' + Style.RESET_ALL)
-                    self.user_menu(username, user_role)
+                    self._set_user(username, user_role)
+                    return 0
                 elif login_code == -1:
                     print(Fore.RED + '\nThe credentials you entered are wrong\n' + Style.RESET_ALL)
                 elif login_code == -2:
@@ -257,165 +379,31 @@ class CommandLineInterface:
                 return -2
 
     
-    def user_menu(self, username, user_role):
-        """
-        This method presents users with a menu of options tailored to their role.
-
+    def logout(self):
         """
-        user_options = {
-            1: "Profile",
-            2: "Operation",
-            3: "Report",
-            4: "Ask for credit", 
-            5: "Log out"
-        }
-
-        while True:
-            print(Fore.CYAN + "\nMENU" + Style.RESET_ALL)
-            for key, value in user_options.items():
-                print(f"{key} -- {value}")
-
-            try:
-                choice = int(input("Choose an option: "))
-                if choice in user_options:
-                    if choice == 1:
-                        self.profile_submenu(username, user_role)
-                    elif choice == 2:
-                        self.credit_submenu(username, user_role)
-                    elif choice == 3:
-                        self.report_submenu(username)
-                    elif choice == 4:
-                        self.ask_for_credit()
-                    elif choice == 5:
-                        confirm = input("\nDo you really want to leave? (Y/n): ").strip().upper()
-                        if confirm == 'Y':
-                            print(Fore.CYAN + "\nThank you for using the service!\n" + Style.RESET_ALL)
-                            self.session.reset_session()
-                            self.print_menu()
-                            return
-                        else:
-                            print(Fore.RED + "Invalid choice! Please try again." + Style.RESET_ALL)
-
-            except ValueError:
-                print(Fore.RED + "Invalid Input! Please enter a valid number." + Style.RESET_ALL)
+        Asks for confirmation and closes the session of the user.
 
-
-    def profile_submenu(self, username, user_role):
-        """
-        This method presents a sub-menu for profile-related actions.
-        Press Enter without typing anything to go back.
+        Returns:
+            str: MAIN_MENU if the user logged out, None to stay in the user menu.
         """
-        report_options = {
-            1: "View Profile",
-            2: "Update Profile",
-            3: "Change Password"
-        }
-
-        while True:
-            print(Fore.CYAN + "\nPROFILE MENU (press Enter to go back)" + Style.RESET_ALL)
-            for key, value in report_options.items():
-                print(f"{key} -- {value}")
-
-            choice = input("Choose an option: ").strip()
-            if choice == "":
-                break  
-
-            try:
-                choice = int(choice)
-                if choice in report_options:
-                    if choice == 1:
-                        self.view_userview(username)
-                    elif choice == 2:
-                        self.util.update_profile(username, user_role)
-                    elif choice == 3:
-                        self.util.change_passwd(username)
-                else:
-                    print(Fore.RED + "Invalid choice! Please try again." + Style.RESET_ALL)
-            except ValueError:
-                print(Fore.RED + "Invalid Input! Please enter a valid number." + Style.RESET_ALL)
-
-
-    def credit_submenu(self, username, user_role):
+        confirm = input("\nDo you really want to leave? (Y/n): ").strip().upper()
+        if confirm != 'Y':
+            return None
+        print(Fore.CYAN + "\nThank you for using the service!\n" + Style.RESET_ALL)
+        self.session.reset_session()
+        self._set_user(None, None)
+        return MAIN_MENU
+
+    def give_credit(self, username):
         """
-        This method presents a sub-menu for credit-related actions.
-        Press Enter without typing anything to go back.
+        Lets the user give credits to another user, if the user has any.
         """
-        report_options = {
-            1: "Check Balance",
-            2: "Give Credit",
-            3: "Make Operation",
-            4: "Make Green Action"
-        }
-
-        while True:
-            print(Fore.CYAN + "\nOPERATION MENU (press Enter to go back)" + Style.RESET_ALL)
-            for key, value in report_options.items():
-                print(f"{key} -- {value}")
-
-            choice = input("Choose an option: ").strip()
-            if choice == "":
-                break
-
-            try:
-                choice = int(choice)
-                if choice in report_options:
-                    if choice == 1:
-                        self.view_balance(username)
-                    elif choice == 2:
-                        address = self.controller.get_public_key_by_username(username)
-                        balance = act_controller.check_balance(address)    
-                        if balance > 0:
-                            self.util.give_credit(username)
-                        else:
-                            print(Fore.RED + "You have no credits to give." + Style.RESET_ALL)
-                    elif choice == 3:
-                        if user_role == 'FARMER':
-                            self.util.make_operation_farmer(username, user_role)   
-                        elif user_role == 'PRODUCER':
-                            self.util.make_operation_producer(username, user_role)
-                        elif user_role == 'CARRIER':
-                            self.util.make_operation_carrier(username, user_role)
-                        elif user_role == 'SELLER':
-                            self.util.make_operation_seller(username, user_role)
-                    elif choice == 4:
-                        self.util.make_green_action(username)
-                else:
-                    print(Fore.RED + "Invalid choice! Please try again." + Style.RESET_ALL)
-            except ValueError:
-                print(Fore.RED + "Invalid Input! Please enter a valid number." + Style.RESET_ALL)
-
-
-    def report_submenu(self, username):
-        """
-        This method presents a sub-menu for report-related actions.
-        Press Enter without typing anything to go back.
-        """
-        report_options = {
-            1: "Generate New Report",
-            2: "View Report"
-        }
-
-        while True:
-            print(Fore.CYAN + "\nREPORT MENU (press Enter to go back)" + Style.RESET_ALL)
-            for key, value in report_options.items():
-                print(f"{key} -- {value}")
-
-            choice = input("Choose an option: ").strip()
-            if choice == "":
-                break
-
-            try:
-                choice = int(choice)
-                if choice in report_options:
-                    if choice == 1:                        
-                        self.util.create_report(username)
-                    elif choice == 2:
-                        self.view_user_report(username)
-                else:
-                    print(Fore.RED + "Invalid choice! Please try again." + Style.RESET_ALL)
-            except ValueError:
-                print(Fore.RED + "Invalid Input! Please enter a valid number." + Style.RESET_ALL)
-
+        address = self.controller.get_public_key_by_username(username)
+        balance = self.controller.chain.check_balance(address)
+        if balance > 0:
+            self.util.give_credit(username)
+        else:
+            print(Fore.RED + "You have no credits to give." + Style.RESET_ALL)
 
     def view_userview(self, username):
         """
@@ -441,7 +429,7 @@ class CommandLineInterface:
         It fetches the user's public key and checks the balance using the action controller.
         """
         address = self.controller.get_public_key_by_username(username)
-        balance = act_controller.check_balance(address)
+        balance = self.controller.chain.check_balance(address)
         print(Fore.CYAN + "\nBalance:\n" + Style.RESET_ALL)
         if balance == 1:
             print(f"Your balance is: {balance} credit")
@@ -452,29 +440,40 @@ class CommandLineInterface:
     def view_user_report(self, username):
         """
         Visualize the user report and allow the user to select a specific report by number.
+        Report dates are listed one page at a time, so only the current page is kept in memory,
+        and the selected report is shown one screen of line items at a time.
         """
-        reportview = self.controller.get_report_by_username(username)
-        if not reportview:
+        date_pages = self.controller.iter_report_date_pages(username)
+        available_dates = next(date_pages, None)
+        if not available_dates:
             print("No reports found for this user.")
             return
 
-        available_dates = sorted({report.get_creation_date() for report in reportview})
-
+        offset = 0
+        next_dates = next(date_pages, None)
         print("\nAvailable reports (sorted by creation date and time):")
         for idx, date in enumerate(available_dates, start=1):
             print(f"{idx}. {date}")
 
         while True:
-            user_input = input("Enter the number of the report you want to see (or press Enter to go back): ").strip()
+            more = "'n' for more reports, " if next_dates else ""
+            user_input = input(f"Enter the number of the report you want to see ({more}or press Enter to go back): ").strip()
             if user_input == "":
                 print("Returning to previous menu.")
                 return
 
+            if user_input.lower() == "n" and next_dates:
+                offset += len(available_dates)
+                available_dates, next_dates = next_dates, next(date_pages, None)
+                for idx, date in enumerate(available_dates, start=offset + 1):
+                    print(f"{idx}. {date}")
+                continue
+
             if not user_input.isdigit():
                 print(Fore.RED + "\nPlease enter a valid number." + Style.RESET_ALL)
                 continue
 
-            selection = int(user_input)
+            selection = int(user_input) - offset
             if 1 <= selection <= len(available_dates):
                 selected_date = available_dates[selection - 1]
                 print(f"\nDisplaying the report for {selected_date}...\n")
@@ -482,39 +481,120 @@ class CommandLineInterface:
             else:
                 print(Fore.RED + "\nInvalid selection. Please choose a number from the list." + Style.RESET_ALL)
 
-        reportdateview = self.controller.get_report_by_date(username, selected_date)
-        if reportdateview:
-            if len(reportdateview) > 1:
-                print("There is more than one report for this date:\n")
+        ReportPager(self.controller, username, selected_date).show()
 
-            table_data = []
-            for report in reportdateview:
-                operations_raw = report.get_operations()
-                operations = operations_raw.split(" | ") if isinstance(operations_raw, str) else [str(operations_raw)]
+    def view_archived_report(self, username):
+        """
+        Lists the dates of the user's archived reports and shows the selected one, read back from the archive.
+        """
+        archived_dates = self.controller.get_archived_report_dates(username)
+        if not archived_dates:
+            print("No archived reports found for this user.")
+            return
+
+        print("\nArchived reports (sorted by creation date and time):")
+        for idx, date in enumerate(archived_dates, start=1):
+            print(f"{idx}. {date}")
+
+        while True:
+            user_input = input("Enter the number of the report you want to see (or press Enter to go back): ").strip()
+            if user_input == "":
+                return
+            if user_input.isdigit() and 1 <= int(user_input) <= len(archived_dates):
+                selected_date = archived_dates[int(user_input) - 1]
+                break
+            print(Fore.RED + "\nInvalid selection. Please choose a number from the list." + Style.RESET_ALL)
+
+        table_data = []
+        for report in self.controller.get_archived_reports(username, selected_date):
+            for i, line in enumerate(report['lines'] or [{'action_type': '', 'description': ''}]):
+                table_data.append([
+                    report['operation_date'] if i == 0 else "",
+                    f"[{line['action_type']}] {line['description']}",
+                    report['co2'] if i == 0 else ""
+                ])
+        print(tabulate(table_data, headers=["Date", "Operation", "Total CO₂ Emissions"], tablefmt="fancy_grid"))
+        input("\nPress Enter to return to the menu...\n")
 
-                for i, op in enumerate(operations):
-                    row = [
-                        report.get_operation_date() if i == 0 else "",
-                        op.strip(),
-                        report.get_co2() if i == 0 else ""
-                    ]
-                    table_data.append(row)
+    def view_co2_summary(self, username):
+        """
+        Shows the user's CO2 totals, and those of the user's role, per day, week or month.
+        The totals are read from the precomputed aggregates, which are first brought up to date.
+        """
+        granularities = {'D': 'DAY', 'W': 'WEEK', 'M': 'MONTH'}
+        choice = input("Group by (D) Day, (W) Week or (M) Month [M]: ").strip().upper() or 'M'
+        if choice not in granularities:
+            print(Fore.RED + "Invalid choice! Please try again." + Style.RESET_ALL)
+            return
+        granularity = granularities[choice]
 
-            headers = ["Date", "Operation", "Total CO₂ Emissions"]
-            print(tabulate(table_data, headers=headers, tablefmt="fancy_grid"))
+        user_role = self.controller.get_role_by_username(username)
+        # Folds the new actions of every user of the role, the user included, so the role totals are complete.
+        self.controller.refresh_role_co2_aggregates(user_role)
+        headers = ["Period", "CO₂ Emitted", "CO₂ Saved", "Net CO₂", "Operations", "Green Actions"]
 
+        user_rows = self.controller.get_co2_aggregates('USER', username, granularity)
+        print(Fore.CYAN + f"\nYour CO₂ summary by {granularity.lower()}\n" + Style.RESET_ALL)
+        if user_rows:
+            print(tabulate(user_rows, headers=headers, tablefmt="fancy_grid"))
         else:
-            print("Report not found.")
+            print("No operations recorded yet.")
+
+        role_rows = self.controller.get_co2_aggregates('ROLE', user_role, granularity)
+        if role_rows:
+            print(Fore.CYAN + f"\nAll {user_role.title()}s by {granularity.lower()}\n" + Style.RESET_ALL)
+            print(tabulate(role_rows, headers=headers, tablefmt="fancy_grid"))
 
         input("\nPress Enter to return to the menu...\n")
 
-    def ask_for_credit(self):
+    def search_operations(self, username, page_size=10):
         """
-        This method retrieves and displays a list of users who have carbon credits available.
+        Searches the user's reported operations by words of their description and shows the matches
+        one page at a time, best match first. 'n' shows the next page, 'p' the previous one.
         """
-        informationview = self.controller.get_information_for_credit()
-        print("You can see a list of user and their email. Try to contact them and ask for credit")
-        if informationview:
-            for users in informationview:
-                print("Username: ", users.get_username())
-                print("Email: ", users.get_email())
\ No newline at end of file
+        text = input("Words to search (use word* for a prefix): ").strip()
+        if not text:
+            return
+
+        page = 0
+        while True:
+            results = self.controller.search_operations(text, username, page, page_size)
+            if not results and page == 0:
+                print(Fore.YELLOW + "\nNo operations match your search." + Style.RESET_ALL)
+                return
+            if results:
+                table = [(creation_date, operation_date, action_type, description, co2)
+                         for _, creation_date, operation_date, _, action_type, description, co2, _ in results]
+                print(Fore.CYAN + f"\nResults {page * page_size + 1}-{page * page_size + len(results)}" + Style.RESET_ALL)
+                print(tabulate(table, headers=['Report', 'Operation date', 'Type', 'Description', 'CO2'], tablefmt='fancy_grid'))
+            else:
+                print(Fore.YELLOW + "\nNo more results." + Style.RESET_ALL)
+
+            choice = input("(n) next page, (p) previous page, Enter to go back: ").strip().lower()
+            if choice == 'n' and len(results) == page_size:
+                page += 1
+            elif choice == 'p' and page > 0:
+                page -= 1
+            elif choice == '':
+                return
+
+    def ask_for_credit(self, username):
+        """
+        This method retrieves and displays the users holding the most carbon credits,
+        optionally filtered by role or company, so the user knows whom to ask for credit.
+        """
+        roles = {'F': 'FARMER', 'P': 'PRODUCER', 'C': 'CARRIER', 'S': 'SELLER'}
+        role = input("Filter by role: (F) Farmer, (P) Producer, (C) Carrier, (S) Seller, or press Enter for all: ").strip().upper()
+        if role and role not in roles:
+            print(Fore.RED + "Invalid choice! Please try again." + Style.RESET_ALL)
+            return
+        company_name = input("Filter by company name, or press Enter for all: ").strip() or None
+
+        holders = self.controller.get_top_credit_holders(10, roles.get(role), company_name, exclude_username=username)
+        if not holders:
+            print("No users with available credits found.")
+            return
+
+        print("You can see the users with the most credits and their email. Try to contact them and ask for credit")
+        headers = ["Username", "Email", "Role", "Company", "Credits"]
+        print(tabulate(holders, headers=headers, tablefmt="fancy_grid"))
@@ -0,0 +1,419 @@
+"""
+This module implements the non-interactive commands of the application.
+They are run as `python main.py <command> [options]`; without a command the interactive menu starts.
+"""
+
+import click
+from colorama import init, Fore, Style
+init(strip=False, convert=False)
+
+
+@click.group()
+def commands():
+    """
+    SFSChain command line tools.
+    """
+
+
+@commands.command('import-users')
+@click.argument('csv_path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--workers', type=int, default=None, help='Number of hashing processes (default: one per CPU).')
+@click.option('--chunk-size', type=int, default=500, show_default=True, help='Rows hashed, inserted and sent on chain together.')
+@click.option('--chain/--no-chain', default=True, show_default=True, help='Also register the users on chain.')
+def import_users(csv_path, workers, chunk_size, chain):
+    """
+    Registers every user of CSV_PATH. The CSV needs a header with the columns
+    username, name, lastname, role, birthday, email, phone, company_name, password, public_key, private_key.
+    """
+    from controllers.onboarding_controller import OnboardingController
+
+    def on_row(line, username, ok, message):
+        color = Fore.GREEN if ok else Fore.RED
+        click.echo(color + f"Row {line} ({username}): {message}" + Style.RESET_ALL)
+
+    try:
+        results = OnboardingController().import_users(csv_path, workers=workers, chunk_size=chunk_size,
+                                                      register_on_chain=chain, on_row=on_row)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    registered = sum(1 for result in results if result[2])
+    click.echo(f"\n{registered} of {len(results)} users registered, {len(results) - registered} failed.")
+    if registered < len(results):
+        raise SystemExit(1)
+
+
+@commands.command('calibrate-kdf')
+@click.option('--target-ms', type=float, default=100, show_default=True, help='Latency budget of one password verification.')
+@click.option('--concurrency', type=int, default=1, show_default=True, help='Verifications running at once during the measurement.')
+@click.option('--r', 'r_param', type=int, default=8, show_default=True, help='scrypt block size.')
+@click.option('--p', 'p_param', type=int, default=1, show_default=True, help='scrypt parallelization factor.')
+@click.option('--max-memory-mb', type=int, default=256, show_default=True, help='Memory limit of one verification.')
+def calibrate_kdf(target_ms, concurrency, r_param, p_param, max_memory_mb):
+    """
+    Measures scrypt on this machine and prints the kdf section for configuration.yml.
+    """
+    from database import crypto
+
+    def on_step(n, median_ms, worst_ms):
+        click.echo(f"n = {n:>8}: median {median_ms:8.1f} ms, worst {worst_ms:8.1f} ms")
+
+    chosen = crypto.calibrate(target_ms, r=r_param, p=p_param, concurrency=concurrency,
+                              max_memory=max_memory_mb * 1024 * 1024, on_step=on_step)
+    if chosen is None:
+        raise click.ClickException("No parameters fit in the memory limit.")
+    if chosen['median_ms'] > target_ms:
+        click.echo(Fore.YELLOW + f"Even the smallest cost factor exceeds {target_ms} ms." + Style.RESET_ALL)
+    click.echo(Fore.GREEN + f"\nChosen parameters ({chosen['median_ms']:.1f} ms median with {concurrency} concurrent logins):"
+               + Style.RESET_ALL)
+    click.echo(f"kdf:\n  n: {chosen['n']}\n  r: {chosen['r']}\n  p: {chosen['p']}\n  dklen: {chosen['dklen']}")
+
+
+@commands.command('export')
+@click.argument('output', type=click.Path(dir_okay=False, writable=True))
+@click.option('--source', type=click.Choice(['reports', 'chain']), default='reports', show_default=True,
+              help='Stored report line items, or the operations and green actions read from the chain.')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl', 'parquet']), default='csv', show_default=True)
+@click.option('--compression', default=None,
+              help='gzip, bz2 or xz for CSV and JSON Lines; a Parquet codec (snappy, gzip, zstd) for Parquet.')
+@click.option('--username', default=None, help='Export a single user.')
+@click.option('--chunk-size', type=int, default=1000, show_default=True, help='Rows read and written at a time.')
+def export_data(output, source, fmt, compression, username, chunk_size):
+    """
+    Streams reports or on-chain history to OUTPUT without loading the whole dataset in memory.
+    """
+    from singleton.services import services
+
+    db_ops = services.db
+    export = db_ops.export_reports if source == 'reports' else db_ops.export_chain_history
+    try:
+        count = export(output, fmt, compression, username, chunk_size)
+    except (ValueError, RuntimeError) as e:
+        raise click.ClickException(str(e))
+    click.echo(Fore.GREEN + f"{count} rows exported to {output}." + Style.RESET_ALL)
+
+
+@commands.command('stats')
+@click.option('--top', 'k', type=int, default=10, show_default=True, help='Number of top emitters to show.')
+@click.option('--role', type=click.Choice(['FARMER', 'PRODUCER', 'CARRIER', 'SELLER']), default=None,
+              help='Restrict the top emitters and the rolling series to one role.')
+@click.option('--window', type=int, default=7, show_default=True, help='Rolling window in days.')
+def stats(k, role, window):
+    """
+    Prints network-wide emissions statistics computed from the on-chain history.
+    """
+    from tabulate import tabulate
+    from analytics import emissions
+    from singleton.services import services
+
+    data = emissions.load_actions(services.db.conn, services.chain)
+    click.echo(f"{len(data)} actions of {len(data.addresses)} users loaded.\n")
+
+    days, emitted, saved = emissions.co2_per_role_per_day(data)
+    rows = [(str(day), *(f"{emitted[r, d]} / {saved[r, d]}" for r in range(len(emissions.ROLES))))
+            for d, day in enumerate(days[-window:], start=max(len(days) - window, 0))]
+    click.echo(Fore.CYAN + "CO2 emitted / saved per role, last days" + Style.RESET_ALL)
+    click.echo(tabulate(rows, headers=['Day', *emissions.ROLES], tablefmt='fancy_grid'))
+
+    distribution = emissions.net_delta_distribution(data)
+    click.echo(Fore.CYAN + "\nDaily net credit delta per user (minted minus burned)" + Style.RESET_ALL)
+    click.echo(tabulate([(key, value) for key, value in distribution.items()], tablefmt='fancy_grid'))
+
+    click.echo(Fore.CYAN + "\nTop emitters" + Style.RESET_ALL)
+    click.echo(tabulate(emissions.top_emitters(data, k, role), headers=['Username', 'Address', 'CO2 emitted', 'CO2 saved'],
+                        tablefmt='fancy_grid'))
+
+    days, daily, rolling = emissions.rolling_net_co2(data, window, role)
+    click.echo(Fore.CYAN + f"\nNet CO2 with {window}-day rolling sum" + Style.RESET_ALL)
+    click.echo(tabulate(list(zip(map(str, days[-window:]), daily[-window:], rolling[-window:])),
+                        headers=['Day', 'Net CO2', f'Rolling {window}d'], tablefmt='fancy_grid'))
+
+
+@commands.command('search')
+@click.argument('words', nargs=-1, required=True)
+@click.option('--username', default=None, help='Search the reports of a single user.')
+@click.option('--page', type=int, default=1, show_default=True, help='Page of results to show.')
+@click.option('--page-size', type=int, default=20, show_default=True)
+def search_operations(words, username, page, page_size):
+    """
+    Searches the reported operations whose description contains all WORDS (word* for a prefix), best match first.
+    """
+    from tabulate import tabulate
+    from singleton.services import services
+
+    results = services.db.search_operations(' '.join(words), username, max(page, 1) - 1, page_size)
+    if not results:
+        click.echo(Fore.YELLOW + "No operations match the search." + Style.RESET_ALL)
+        return
+    click.echo(tabulate([row[:7] for row in results],
+                        headers=['Report id', 'Report', 'Operation date', 'Username', 'Type', 'Description', 'CO2'],
+                        tablefmt='fancy_grid'))
+
+
+@commands.command('archive')
+@click.option('--months', type=int, default=None,
+              help='Archive reports older than this many months (default: retention.archive_after_months).')
+@click.option('--full-vacuum', is_flag=True,
+              help='Switch a database created without auto_vacuum to incremental mode first. This rewrites '
+                   'the whole file and blocks the other processes while it runs.')
+def archive_reports(months, full_vacuum):
+    """
+    Deduplicates overlapping reports, archives the old ones and reclaims the freed space.
+    """
+    from singleton.services import services
+
+    result = services.db.apply_retention(months, full_vacuum)
+    if result['switched_to_incremental']:
+        click.echo("Database switched to incremental auto_vacuum.")
+    click.echo(f"{result['deduplicated']} superseded reports removed.")
+    click.echo(f"{result['archived']} reports archived in {len(result['files'])} files.")
+    click.echo(f"{result['freed_pages']} pages returned to the file system.")
+    if not result['switched_to_incremental'] and services.db.conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        click.echo(Fore.YELLOW + "The database is not in incremental auto_vacuum mode, so no space was returned; "
+                   "run with --full-vacuum once at a quiet time." + Style.RESET_ALL)
+
+
+@commands.command('snapshot')
+@click.option('--output', type=click.Path(dir_okay=False), default=None,
+              help='Snapshot file (default: a timestamped file in snapshot.dir).')
+@click.option('--chain/--no-chain', default=True, show_default=True, help='Record the current chain block number.')
+def snapshot(output, chain):
+    """
+    Copies the live database to a consistent snapshot file without blocking the application.
+    """
+    import datetime
+    import os
+    from config import config
+    from database import snapshot as snapshots
+
+    settings = config.config.get('snapshot') or {}
+    if output is None:
+        output = os.path.join(settings.get('dir', 'snapshots'),
+                              f"SFS_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.db")
+    block_source = None
+    if chain:
+        from singleton.services import services
+        block_source = services.chain.get_block_number
+
+    def progress(status, remaining, total):
+        click.echo(f"\rCopied {total - remaining} of {total} pages", nl=False)
+
+    try:
+        info = snapshots.create_snapshot(output, block_source, pages=int(settings.get('pages_per_step', 256)),
+                                         sleep=settings.get('sleep_ms', 10) / 1000, progress=progress)
+    except FileExistsError as e:
+        raise click.ClickException(str(e))
+    click.echo(Fore.GREEN + f"\nSnapshot saved to {info['path']} (block {info['block_number']}, "
+               f"schema version {info['schema_version']})." + Style.RESET_ALL)
+
+
+def _echo_result(ok, message):
+    click.echo((Fore.GREEN if ok else Fore.RED) + message + Style.RESET_ALL)
+    if not ok:
+        raise SystemExit(1)
+
+
+def _run_as(username, password, action, **arguments):
+    """
+    Logs the user in, runs one HeadlessRunner action and prints its outcome.
+    """
+    from cli.headless import HeadlessRunner
+
+    runner = HeadlessRunner()
+    ok, message = runner.login(username, password)
+    if ok:
+        try:
+            ok, message = runner.run_action({'action': action, **arguments})
+        finally:
+            runner.logout()
+    _echo_result(ok, message)
+
+
+_username_option = click.option('--username', required=True)
+_password_option = click.option('--password', envvar='SFS_PASSWORD', prompt=True, hide_input=True,
+                                help='Read from SFS_PASSWORD if set, prompted otherwise.')
+
+
+@commands.command('register')
+@click.option('--username', required=True)
+@click.option('--name', required=True)
+@click.option('--lastname', required=True)
+@click.option('--role', type=click.Choice(['FARMER', 'PRODUCER', 'CARRIER', 'SELLER'], case_sensitive=False), required=True)
+@click.option('--birthday', required=True, help='YYYY-MM-DD')
+@click.option('--email', required=True)
+@click.option('--phone', required=True)
+@click.option('--company-name', default='')
+@click.option('--public-key', required=True)
+@click.option('--private-key', envvar='SFS_PRIVATE_KEY', prompt=True, hide_input=True,
+              help='Read from SFS_PRIVATE_KEY if set, prompted otherwise.')
+@click.option('--password', envvar='SFS_PASSWORD', prompt=True, hide_input=True, confirmation_prompt=True,
+              help='Read from SFS_PASSWORD if set, prompted otherwise.')
+def register(username, name, lastname, role, birthday, email, phone, company_name, public_key, private_key, password):
+    """
+    Registers a new user.
+    """
+    from web3.exceptions import Web3Exception
+    from cli.headless import HeadlessRunner
+
+    try:
+        result = HeadlessRunner().register(username, name, lastname, role, birthday, email, phone, company_name,
+                                           password, public_key, private_key)
+    except Web3Exception as e:
+        result = False, f"The on-chain registration failed: {getattr(e, 'message', None) or e}"
+    _echo_result(*result)
+
+
+@commands.command('login-check')
+@_username_option
+@click.option('--public-key', required=True)
+@click.option('--private-key', envvar='SFS_PRIVATE_KEY', prompt=True, hide_input=True,
+              help='Read from SFS_PRIVATE_KEY if set, prompted otherwise.')
+@_password_option
+def login_check(username, public_key, private_key, password):
+    """
+    Checks a set of login credentials; the exit status is 0 when they are valid.
+    """
+    from cli.headless import HeadlessRunner
+
+    _echo_result(*HeadlessRunner().login_check(username, password, public_key, private_key))
+
+
+@commands.command('operation')
+@_username_option
+@_password_option
+@click.option('--operation', required=True, help="The operation name (e.g. 'Irrigation') or its menu number.")
+@click.option('--units', type=int, required=True, help='Hectares or units the operation was performed on.')
+@click.option('--co2', type=int, required=True, help='Actual CO2 emission, in tons.')
+def operation(username, password, operation, units, co2):
+    """
+    Registers an operation of the user.
+    """
+    _run_as(username, password, 'operation', operation=int(operation) if operation.isdigit() else operation,
+            units=units, co2=co2)
+
+
+@commands.command('green-action')
+@_username_option
+@_password_option
+@click.option('--description', required=True)
+@click.option('--co2-saved', type=int, required=True, help='CO2 saved, in tons.')
+def green_action(username, password, description, co2_saved):
+    """
+    Registers a green action of the user.
+    """
+    _run_as(username, password, 'green_action', description=description, co2_saved=co2_saved)
+
+
+@commands.command('give-credit')
+@_username_option
+@_password_option
+@click.option('--to', required=True, help='Username of the recipient.')
+@click.option('--amount', type=int, required=True)
+def give_credit(username, password, to, amount):
+    """
+    Transfers credits to another user.
+    """
+    _run_as(username, password, 'give_credit', to=to, amount=amount)
+
+
+@commands.command('report')
+@_username_option
+@_password_option
+@click.option('--start', required=True, help='First day of the report, YYYY-MM-DD.')
+@click.option('--end', required=True, help='Last day of the report, YYYY-MM-DD.')
+def report(username, password, start, end):
+    """
+    Creates a report of the user's operations between two dates.
+    """
+    _run_as(username, password, 'report', start=start, end=end)
+
+
+@commands.command('run-job')
+@click.argument('job_file', type=click.Path(exists=True, dir_okay=False))
+@click.option('--password', envvar='SFS_PASSWORD', default=None,
+              help="Password of the job's user when the file has none (also read from SFS_PASSWORD).")
+def run_job(job_file, password):
+    """
+    Runs every action of a JSON or YAML job file in one process, e.g.
+
+    \b
+    username: alice
+    actions:
+      - {action: operation, operation: Irrigation, units: 3, co2: 10}
+      - {action: green-action, description: Planted trees, co2_saved: 4}
+      - {action: give-credit, to: bob, amount: 2}
+      - {action: report, start: 2025-01-01, end: 2025-01-31}
+    """
+    from cli.headless import HeadlessRunner, load_job
+
+    try:
+        job = load_job(job_file)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    if job.get('username') and not job.get('password') and password is None:
+        password = click.prompt('Password', hide_input=True)
+
+    def on_result(index, action, ok, message):
+        color = Fore.GREEN if ok else Fore.RED
+        click.echo(color + f"[{index + 1}] {action.get('action')}: {message}" + Style.RESET_ALL)
+
+    results = HeadlessRunner().run_job(job, password, on_result)
+    failed = sum(1 for ok, _ in results if not ok)
+    click.echo(f"\n{len(results) - failed} of {len(results)} actions succeeded.")
+    if failed:
+        raise SystemExit(1)
+
+
+@commands.command('serve')
+@click.option('--host', default=None, help='Address to listen on (default: api.host).')
+@click.option('--port', type=int, default=None, help='Port to listen on (default: api.port).')
+@click.option('--max-concurrency', type=int, default=None, help='Requests handled at once (default: api.max_concurrency).')
+def serve(host, port, max_concurrency):
+    """
+    Serves the HTTP/JSON API, so many users can work at once against one process.
+    """
+    from api.server import ApiServer
+
+    ApiServer(max_concurrency=max_concurrency).run(host, port)
+
+
+@commands.command('metrics')
+@click.argument('job_file', type=click.Path(exists=True, dir_okay=False))
+@click.option('--password', envvar='SFS_PASSWORD', default=None,
+              help="Password of the job's user when the file has none (also read from SFS_PASSWORD).")
+@click.option('--top', type=int, default=20, show_default=True, help='Number of slowest series to show.')
+@click.option('--prometheus', type=click.Path(dir_okay=False), default=None, help='Also write the metrics to this file.')
+def metrics_report(job_file, password, top, prometheus):
+    """
+    Runs a job file (see run-job) and shows where the time went: RPCs, contract functions, SQL statements
+    and crypto calls, slowest first, and the RPCs sent by every user action against metrics.rpc_budget
+    (receipt polls are shown apart, as their number depends on the block time).
+    The exit status is 1 if an action went over its budget.
+    """
+    from tabulate import tabulate
+    from cli.headless import HeadlessRunner, load_job
+    from monitoring.metrics import metrics
+
+    if not metrics.enabled:
+        raise click.ClickException("Metrics are disabled (metrics.enabled in configuration.yml).")
+    try:
+        job = load_job(job_file)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    if job.get('username') and not job.get('password') and password is None:
+        password = click.prompt('Password', hide_input=True)
+
+    results = HeadlessRunner().run_job(job, password)
+    failed = sum(1 for ok, _ in results if not ok)
+    click.echo(f"{len(results) - failed} of {len(results)} actions succeeded.\n")
+    click.echo(tabulate(metrics.summary()[:top], headers=["Metric", "Labels", "Count", "Total ms", "Mean ms", "p95 ms", "Max ms"],
+                        maxcolwidths=[None, 60]))
+    rows, over = metrics.rpc_budget_report()
+    click.echo("\nRPC calls per user action:")
+    click.echo(tabulate(rows, headers=["Action", "Runs", "Mean RPCs", "Max RPCs", "Budget", "Status", "Receipt polls"]))
+    if prometheus:
+        metrics.write_prometheus(prometheus)
+        click.echo(f"\nMetrics written to {prometheus}")
+    if over:
+        click.echo(Fore.RED + "\nSome actions sent more RPCs than their budget." + Style.RESET_ALL)
+        raise SystemExit(1)
@@ -0,0 +1,195 @@
+"""
+This module implements the non-interactive runner behind the scriptable commands.
+One HeadlessRunner holds a single session, database connection and chain connection, so a job
+file with many actions runs them all in one process without reconnecting between actions.
+"""
+
+import yaml
+from datetime import datetime
+from web3.exceptions import Web3Exception
+from controllers.controller import Controller
+from controllers.onboarding_controller import OnboardingController, REGISTRATION_ERRORS
+from session.session import Session
+from singleton.services import ServiceContainer
+
+
+RESULT_MESSAGES = {
+    -1: 'The transaction failed.',
+    -2: 'Insufficient balance.',
+    -3: 'Invalid arguments.',
+}
+
+
+class HeadlessRunner:
+    """
+    Runs user actions without prompts. Every action returns a tuple (ok, message).
+    """
+
+    def __init__(self, session: Session = None, services: ServiceContainer = None):
+        self.session = session or Session()
+        self.controller = Controller(self.session, services)
+        self.username = None
+        self.user_role = None
+
+    def login(self, username, password):
+        """
+        Opens the session of a user and unlocks the wallet stored in the user's credentials.
+        """
+        code, user_role = self.controller.open_session(username, password)
+        if code == -2:
+            return False, "Too many failed login attempts, try again later."
+        if code != 0:
+            return False, f"Wrong credentials for {username}."
+        self.username, self.user_role = username, user_role
+        return True, f"Logged in as {username} ({user_role})."
+
+    def logout(self):
+        """
+        Closes the session and wipes the unlocked wallet.
+        """
+        self.session.reset_session()
+        self.username = self.user_role = None
+
+    def _require_login(self):
+        if self.username is None:
+            raise PermissionError("This action needs a logged in user.")
+
+    def login_check(self, username, password, public_key, private_key):
+        """
+        Verifies a full set of login credentials without opening a session.
+        """
+        if self.controller.db_ops.check_credentials(username, password, public_key, private_key):
+            return True, 'Credentials are valid.'
+        return False, 'Credentials are not valid.'
+
+    def register(self, username, name, lastname, role, birthday, email, phone, company_name, password, public_key, private_key):
+        """
+        Registers a new user in the database and on chain, with the same checks as the registration menu.
+        Errors of the node are raised (see Controller.registration).
+        """
+        row = {'username': username, 'name': name, 'lastname': lastname, 'role': role, 'birthday': birthday,
+               'email': email, 'phone': phone, 'company_name': company_name or '', 'password': password,
+               'public_key': public_key, 'private_key': private_key}
+        reason = OnboardingController(self.controller).validate_row(row)
+        if reason is not None:
+            return False, reason
+        if self.controller.check_username(username) != 0:
+            return False, 'Username already taken'
+        code = self.controller.registration(username, name, lastname, role.upper(), birthday, email, phone,
+                                            company_name or '', password, public_key, private_key)
+        if code == -6:
+            return False, 'The on-chain registration was reverted.'
+        if code != 0:
+            return False, REGISTRATION_ERRORS.get(code, REGISTRATION_ERRORS[-1])
+        return True, f"User {username} registered."
+
+    def operation(self, operation, units, co2):
+        """
+        Registers an operation of the logged in user.
+        """
+        self._require_login()
+        code, delta = self.controller.record_operation(self.username, self.user_role, operation, int(units), int(co2))
+        if code != 0:
+            return False, RESULT_MESSAGES[code]
+        return True, f"Operation recorded, credit delta {delta}."
+
+    def green_action(self, description, co2_saved):
+        """
+        Registers a green action of the logged in user.
+        """
+        self._require_login()
+        code = self.controller.record_green_action(self.username, description, int(co2_saved))
+        if code != 0:
+            return False, RESULT_MESSAGES[code]
+        return True, f"Green action recorded, {co2_saved} credits earned."
+
+    def give_credit(self, to, amount):
+        """
+        Transfers credits from the logged in user to another user.
+        """
+        self._require_login()
+        code = self.controller.give_credit(self.username, to, int(amount))
+        if code != 0:
+            return False, RESULT_MESSAGES[code]
+        return True, f"{amount} credits given to {to}."
+
+    def report(self, start, end):
+        """
+        Creates a report of the logged in user's operations between two dates.
+        """
+        self._require_login()
+        creation_date = datetime.today().strftime('%Y-%m-%d %H:%M:%S')
+        if self.controller.insert_report_info(creation_date, str(start), str(end), self.username) != 1:
+            return False, 'No report created.'
+        return True, f"Report of {start} - {end} created."
+
+    def export(self, output, source='reports', format='csv', compression=None, username=None, chunk_size=1000):
+        """
+        Streams reports or on-chain history to a file.
+        """
+        db_ops = self.controller.db_ops
+        export = db_ops.export_reports if source == 'reports' else db_ops.export_chain_history
+        count = export(output, format, compression, username, int(chunk_size))
+        return True, f"{count} rows exported to {output}."
+
+    def run_action(self, action):
+        """
+        Runs one job action: a dict with an 'action' key naming the method ('green-action' and
+        'green_action' are equivalent) and the method arguments as the other keys.
+        A reverted transaction or a failed RPC fails the action, not the whole job.
+        """
+        action = dict(action)
+        name = str(action.pop('action', '')).replace('-', '_')
+        if name not in JOB_ACTIONS:
+            return False, f"Unknown action '{name}'."
+        try:
+            return getattr(self, name)(**action)
+        except (TypeError, ValueError, PermissionError) as e:
+            return False, str(e)
+        except Web3Exception as e:
+            return False, f"Chain error: {getattr(e, 'message', None) or e}"
+
+    def run_job(self, job, password=None, on_result=None):
+        """
+        Runs a job: an optional 'username' (and 'password') to log in with, and a list of 'actions'.
+        The actions run in order; with 'stop_on_error: true' the job stops at the first failure.
+
+        Args:
+            job (dict): The parsed job file.
+            password (str, optional): Used when the job has a username but no password.
+            on_result (callable, optional): Called as on_result(index, action, ok, message) after each action.
+
+        Returns:
+            list: The (ok, message) result of each action that ran.
+        """
+        results = []
+        if job.get('username'):
+            ok, message = self.login(job['username'], job.get('password') or password)
+            if not ok:
+                return [(False, message)]
+        try:
+            for index, action in enumerate(job.get('actions') or []):
+                ok, message = self.run_action(action)
+                results.append((ok, message))
+                if on_result:
+                    on_result(index, action, ok, message)
+                if not ok and job.get('stop_on_error'):
+                    break
+        finally:
+            self.logout()
+        return results
+
+
+# Actions a job file may use.
+JOB_ACTIONS = ('register', 'login_check', 'operation', 'green_action', 'give_credit', 'report', 'export')
+
+
+def load_job(path):
+    """
+    Reads a job file. YAML is a superset of JSON, so both formats are accepted.
+    """
+    with open(path, 'r', encoding='utf-8') as file:
+        job = yaml.safe_load(file)
+    if not isinstance(job, dict):
+        raise ValueError("A job file must contain a mapping with an 'actions' list.")
+    return job
@@ -0,0 +1,136 @@
+"""
+This module implements the paged report viewer of the command line interface.
+Only one screen of rows is fetched from the database and rendered at a time, with column widths
+computed from that screen and fitted to the terminal, so the first screen of a report appears as
+quickly for a report with thousands of lines as for a small one.
+"""
+
+import shutil
+from colorama import init, Fore, Style
+init(strip=False, convert=False)
+from tabulate import tabulate
+
+
+class Pager:
+    """
+    Shows rows one page at a time, with next, previous and jump navigation.
+    The rows of a page are fetched only when the page is shown; the total number of rows is counted
+    only when the user jumps to a page.
+    """
+
+    def __init__(self, fetch_page, count_rows, headers, page_size=20):
+        """
+        :param fetch_page: Function (offset, limit) -> list of rows, ready to display.
+        :param count_rows: Function () -> total number of rows.
+        :param headers: The column headers.
+        :param page_size: Number of rows per screen.
+        """
+        self.fetch_page = fetch_page
+        self.count_rows = count_rows
+        self.headers = headers
+        self.page_size = page_size
+        self.total_pages = None
+
+    def get_page(self, page):
+        """
+        Fetches the rows of a page (counting from 0) plus one row to tell whether a next page exists.
+
+        :return: Tuple (rows of the page, True if there is a next page).
+        """
+        rows = self.fetch_page(page * self.page_size, self.page_size + 1)
+        return rows[:self.page_size], len(rows) > self.page_size
+
+    def column_widths(self, rows):
+        """
+        Computes the maximum width of every column for a page: the widest value of the page, with the
+        widest column shrunk (and wrapped by tabulate) when the table would not fit in the terminal.
+        """
+        widths = [max([len(str(header))] + [len(str(row[i])) for row in rows]) for i, header in enumerate(self.headers)]
+        # fancy_grid adds a border before the first column and three characters around every column.
+        available = shutil.get_terminal_size((100, 24)).columns - 3 * len(widths) - 1
+        widest = widths.index(max(widths))
+        overflow = sum(widths) - available
+        if overflow > 0:
+            widths[widest] = max(widths[widest] - overflow, len(str(self.headers[widest])), 10)
+        return widths
+
+    def render(self, rows):
+        """
+        Returns the table of a page.
+        """
+        return tabulate(rows, headers=self.headers, tablefmt="fancy_grid", maxcolwidths=self.column_widths(rows))
+
+    def _ask_page(self):
+        if self.total_pages is None:
+            self.total_pages = max((self.count_rows() + self.page_size - 1) // self.page_size, 1)
+        page = input(f"Go to page (1-{self.total_pages}): ").strip()
+        if not page.isdigit() or not 1 <= int(page) <= self.total_pages:
+            print(Fore.RED + "Invalid page number." + Style.RESET_ALL)
+            return None
+        return int(page) - 1
+
+    def show(self):
+        """
+        Runs the pager until the user presses Enter.
+
+        :return: The number of pages shown.
+        """
+        page, shown = 0, 0
+        while True:
+            rows, has_next = self.get_page(page)
+            if not rows and page == 0:
+                print("Report not found.")
+                return shown
+            print(self.render(rows))
+            shown += 1
+            of_total = f" of {self.total_pages}" if self.total_pages else ""
+            commands = (["'n' next"] if has_next else []) + (["'p' previous"] if page > 0 else []) + ["'j' jump"]
+            print(Fore.CYAN + f"Page {page + 1}{of_total}" + Style.RESET_ALL)
+
+            while True:
+                choice = input(f"{', '.join(commands)} or press Enter to go back: ").strip().lower()
+                if choice == "":
+                    return shown
+                if choice == "n" and has_next:
+                    page += 1
+                elif choice == "p" and page > 0:
+                    page -= 1
+                elif choice == "j":
+                    target = self._ask_page()
+                    if target is None:
+                        continue
+                    page = target
+                else:
+                    print(Fore.RED + "Invalid choice! Please try again." + Style.RESET_ALL)
+                    continue
+                break
+
+
+class ReportPager(Pager):
+    """
+    Pages through the line items of a user's reports created at one date.
+    """
+
+    HEADERS = ["Date", "Operation", "Total CO₂ Emissions"]
+
+    def __init__(self, controller, username, creation_date, page_size=20):
+        """
+        :param controller: The Controller the pages are read through.
+        :param username: The user whose reports are shown.
+        :param creation_date: The creation date of the reports.
+        :param page_size: Number of line items per screen.
+        """
+        super().__init__(self._fetch, lambda: controller.count_report_lines(username, creation_date),
+                         self.HEADERS, page_size)
+        self.controller = controller
+        self.username = username
+        self.creation_date = creation_date
+
+    def _fetch(self, offset, limit):
+        rows = self.controller.get_report_line_page(self.username, self.creation_date, offset, limit)
+        table = []
+        for position, (_, operation_date, co2, action_type, description, is_first_line) in enumerate(rows):
+            # The date and total of a report are shown on its first line, and repeated at the top of a page.
+            first = is_first_line or position == 0
+            table.append([operation_date if first else "", f"[{action_type}] {description}", co2 if first else ""])
+        return table
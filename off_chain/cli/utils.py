@@ -1,4 +1,3 @@
-import re
 import click
 import getpass
 from colorama import init, Fore, Style
@@ -6,7 +5,6 @@ init(strip=False, convert=False)
 from datetime import *
 from controllers.action_controller import *
 from controllers.controller import Controller
-from singleton.action_controller_instance import action_controller_instance as act_controller
 from session.session import Session
 
 
@@ -17,23 +15,33 @@ class Utils:
     displaying data, and navigating through pages of the user.
     """
     
-    def __init__(self, session: Session):
+    def __init__(self, session: Session, controller: Controller = None):
 
         """
         Initializes the Utils class with a session object.
 
         Parameters:
             session (Session): The session object containing user information.
+            controller (Controller, optional): The controller shared with the command line interface;
+                                               a new one on the shared services if omitted.
 
         Attributes:
             session (Session): The session object containing user information.
             controller (Controller): An instance of the Controller class for database interaction.
+            chain (ActionController): The shared chain client, connected on first use.
             today_date (str): The current date in string format.
         """
 
         self.session = session
-        self.controller = Controller(session)
+        self.controller = controller or Controller(session)
         self.today_date = str(date.today())
+
+    @property
+    def chain(self):
+        """
+        The chain client of the shared services.
+        """
+        return self.controller.chain
         
 
     def change_passwd(self, username):
@@ -54,8 +62,7 @@ class Utils:
                             new_passwd = getpass.getpass('New password: ')
                             new_confirm_password = getpass.getpass('Confirm new password: ')
 
-                            passwd_regex = r'^(?=.*\d)(?=.*[a-z])(?=.*[A-Z])(?=.*[@#$%^&+=])(?!.*\s).{8,100}$'
-                            if not re.fullmatch(passwd_regex, new_passwd):
+                            if not self.controller.check_password_format(new_passwd):
                                 print(Fore.RED + 'Password must contain at least 8 characters, at least one digit, at least one uppercase letter, one lowercase letter, and at least one special character.\n' + Style.RESET_ALL)    
                             elif new_passwd != new_confirm_password:
                                 print(Fore.RED + 'Password and confirmation do not match. Try again\n' + Style.RESET_ALL)
@@ -97,7 +104,7 @@ class Utils:
 
         # Blockchain update 
         public_key = self.controller.get_public_key_by_username(username)
-        receipt_so = act_controller.update_user(name, lastname, user_role, from_address=public_key)
+        receipt_so = self.chain.update_user(name, lastname, user_role, from_address=public_key, signer=self.session.get_signer())
 
         if receipt_so.status == 1:
             result = self.controller.update_user_profile(username, name, lastname, birthday, phone)
@@ -110,169 +117,54 @@ class Utils:
             print(Fore.RED + "Failed to update profile!" + Style.RESET_ALL)
 
 
-    def make_operation_farmer(self, username, user_role):
+    def make_operation(self, username, user_role):
         """
-        Allows the farmer to perform various operations related to farming activities.
-        It calculates the CO2 emissions based on the operation type and the number of hectares or units.
-        It also checks the user's balance and updates it accordingly after the operation.
+        Allows the user to perform one of the operations of their role, as listed in the emission factor catalog.
+        It calculates the credit delta from the reference emission of the operation (its factor times the
+        number of hectares or units) and the actual CO2 emission, and records the operation if the user's
+        balance covers a negative delta.
         """
 
-        if user_role != "FARMER":
+        factors = self.controller.emission_factors
+        operations = factors.operations(user_role)
+        if not operations:
             print(Fore.RED + "Operation not available for your role." + Style.RESET_ALL)
             return
 
         print(Fore.YELLOW + "You can type 'exit' at any prompt to cancel the operation." + Style.RESET_ALL)
 
         address = self.controller.get_public_key_by_username(username)
-        balance = act_controller.check_balance(address)
-      
-        if balance <= 0:
-            print(Fore.RED + 'WARNING: YOUR BALANCE IS ZERO OR BELOW!' + Style.RESET_ALL)
-        else: print(Fore.MAGENTA + f"Your balance is {balance}" + Style.RESET_ALL)
-
-
-        print(Fore.CYAN + "\nAvailable FARMER Operations:" + Style.RESET_ALL)
-
-        operation_factors = {
-            1: ("Soil Preparation", 12),
-            2: ("Sowing", 3),
-            3: ("Fertilization", 7),
-            4: ("Irrigation", 5),
-            5: ("Harvesting", 8)
-        }
-
-        for key, (desc, factor) in operation_factors.items():
-            print(f"{key}. {desc} (reference: {factor} tons CO2 per hectare)")
-
-        while True:
-            op_input = input("\nSelect the operation (1-5): ").strip()
-            if op_input.lower() == "exit":
-                print(Fore.YELLOW + "Operation aborted by user." + Style.RESET_ALL)
-                return
-            try:
-                op_choice = int(op_input)
-                if op_choice in operation_factors:
-                    break
-                else:
-                    print(Fore.RED + "Invalid option. Try again." + Style.RESET_ALL)
-            except ValueError:
-                print(Fore.RED + "Please enter a number." + Style.RESET_ALL)
-
-        operation_desc, co2_per_unit = operation_factors[op_choice]
-
-        while True:
-            units_input = input(f"Enter number of hectares (or units) for '{operation_desc}': ").strip()
-            if units_input.lower() == "exit":
-                print(Fore.YELLOW + "Operation aborted by user." + Style.RESET_ALL)
-                return
-            try:
-                units = int(units_input)
-                if units > 0:
-                    break
-                else:
-                    print(Fore.RED + "Units must be greater than 0." + Style.RESET_ALL)
-            except ValueError:
-                print(Fore.RED + "Please enter a valid number." + Style.RESET_ALL)
-
-        threshold = co2_per_unit * units
-
-        while True:
-            co2_input = input(f"Insert actual CO2 emission for '{operation_desc}' (in tons): ").strip()
-            if co2_input.lower() == "exit":
-                print(Fore.YELLOW + "Operation aborted by user." + Style.RESET_ALL)
-                return
-            try:
-                co2 = int(co2_input)
-                break
-            except ValueError:
-                print(Fore.RED + "Please enter a valid integer." + Style.RESET_ALL)
-
-        description = f"{operation_desc} ({units} hectares)"
-        address = self.controller.get_public_key_by_username(username)
-
-        delta = threshold - co2
-
-        if delta > 0:
-            receipt_so = act_controller.register_operation(address, operation_desc, description, delta, co2)
-            if receipt_so.status == 1:
-                action = "added to"
-                print(Fore.GREEN + f'The operation has been correctly recorded. {delta} credits has been {action} your wallet.' + Style.RESET_ALL)
-            else:
-                print(Fore.RED + 'Operation Failed!' + Style.RESET_ALL)
-        elif delta < 0:
-            if balance - abs(delta) >= 0:
-                receipt_so = act_controller.register_operation(address, operation_desc, description, delta, co2)
-                if receipt_so.status == 1:
-                    delta = abs(delta)
-                    action = "removed from"
-                    print(Fore.GREEN + f'The operation has been correctly recorded. {delta} credits has been {action} your wallet.' + Style.RESET_ALL)
-                else:
-                    print(Fore.RED + 'Operation Failed!' + Style.RESET_ALL)
-            else:
-                print(Fore.RED + f"WARNING: YOUR BALANCE IS INSUFFICIENT! YOU NEED {abs(delta) - balance} MORE CREDITS" + Style.RESET_ALL)
-                action = None
-        else:
-            receipt_so = act_controller.register_operation(address, operation_desc, description, delta, co2)
-            if receipt_so.status == 1:
-                print(Fore.YELLOW + "The operation has been correctly recorded. No credit variation: emission equals threshold." + Style.RESET_ALL)
-                action = None
-            else:
-                print(Fore.RED + 'Operation Failed!' + Style.RESET_ALL)
-
-        
-
-    
-    def make_operation_producer(self, username, user_role):
-        """
-        Allows the producer to perform various operations related to production activities.
-        It calculates the CO2 emissions based on the operation type and the number of units processed.
-        It also checks the user's balance and updates it accordingly after the operation.
-        """
-
-        if user_role != "PRODUCER":
-            print(Fore.RED + "Operation not available for your role." + Style.RESET_ALL)
-            return
+        balance = self.chain.check_balance(address)
 
-        print(Fore.YELLOW + "You can type 'exit' at any prompt to cancel the operation." + Style.RESET_ALL)
-
-        address = self.controller.get_public_key_by_username(username)
-        balance = act_controller.check_balance(address)
-      
         if balance <= 0:
             print(Fore.RED + 'WARNING: YOUR BALANCE IS ZERO OR BELOW!' + Style.RESET_ALL)
         else: print(Fore.MAGENTA + f"Your balance is {balance}" + Style.RESET_ALL)
 
 
-        print(Fore.CYAN + "\nAvailable PRODUCER Operations:" + Style.RESET_ALL)
-
-        operation_factors = {
-            1: ("Raw Material Processing", 15),
-            2: ("Product Packaging", 6),
-            3: ("Warehouse Storage", 4),
-            4: ("Quality Control", 2)
-        }
+        print(Fore.CYAN + f"\nAvailable {user_role} Operations:" + Style.RESET_ALL)
 
-        for key, (desc, factor) in operation_factors.items():
-            print(f"{key}. {desc} (reference: {factor} tons CO2 per unit)")
+        unit = factors.unit(user_role)
+        for key, (desc, factor) in operations.items():
+            print(f"{key}. {desc} (reference: {factor} tons CO2 per {unit})")
 
         while True:
-            op_input = input("\nSelect the operation (1-4): ").strip()
+            op_input = input(f"\nSelect the operation (1-{len(operations)}): ").strip()
             if op_input.lower() == "exit":
                 print(Fore.YELLOW + "Operation aborted by user." + Style.RESET_ALL)
                 return
             try:
                 op_choice = int(op_input)
-                if op_choice in operation_factors:
+                if op_choice in operations:
                     break
                 else:
                     print(Fore.RED + "Invalid option. Try again." + Style.RESET_ALL)
             except ValueError:
                 print(Fore.RED + "Please enter a number." + Style.RESET_ALL)
 
-        operation_desc, co2_per_unit = operation_factors[op_choice]
+        operation_desc = operations[op_choice][0]
 
         while True:
-            units_input = input(f"Enter number of units (e.g., lots or batches) for '{operation_desc}': ").strip()
+            units_input = input(f"Enter {factors.units_prompt(user_role)} for '{operation_desc}': ").strip()
             if units_input.lower() == "exit":
                 print(Fore.YELLOW + "Operation aborted by user." + Style.RESET_ALL)
                 return
@@ -285,8 +177,6 @@ class Utils:
             except ValueError:
                 print(Fore.RED + "Please enter a valid number." + Style.RESET_ALL)
 
-        threshold = co2_per_unit * units
-
         while True:
             co2_input = input(f"Insert actual CO2 emission for '{operation_desc}' (in tons): ").strip()
             if co2_input.lower() == "exit":
@@ -298,250 +188,18 @@ class Utils:
             except ValueError:
                 print(Fore.RED + "Please enter a valid integer." + Style.RESET_ALL)
 
-        description = f"{operation_desc} ({units} hectares)"
-        address = self.controller.get_public_key_by_username(username)
-        delta = threshold - co2
+        code, delta = self.controller.record_operation(username, user_role, op_choice, units, co2)
 
-        if delta > 0:
-            receipt_so = act_controller.register_operation(address, operation_desc, description, delta, co2)
-            if receipt_so.status == 1:
-                action = "added to"
-                print(Fore.GREEN + f'The operation has been correctly recorded. {delta} credits has been {action} your wallet.' + Style.RESET_ALL)
-            else:
-                print(Fore.RED + 'Operation Failed!' + Style.RESET_ALL)
-        elif delta < 0:
-            if balance - abs(delta) >= 0:
-                receipt_so = act_controller.register_operation(address, operation_desc, description, delta, co2)
-                if receipt_so.status == 1:
-                    delta = abs(delta)
-                    action = "removed from"
-                    print(Fore.GREEN + f'The operation has been correctly recorded. {delta} credits has been {action} your wallet.' + Style.RESET_ALL)
-                else:
-                    print(Fore.RED + 'Operation Failed!' + Style.RESET_ALL)
-            else:
-                print(Fore.RED + f"WARNING: YOUR BALANCE IS INSUFFICIENT! YOU NEED {abs(delta) - balance} MORE CREDITS" + Style.RESET_ALL)
-                action = None
+        if code == 0 and delta > 0:
+            print(Fore.GREEN + f'The operation has been correctly recorded. {delta} credits has been added to your wallet.' + Style.RESET_ALL)
+        elif code == 0 and delta < 0:
+            print(Fore.GREEN + f'The operation has been correctly recorded. {abs(delta)} credits has been removed from your wallet.' + Style.RESET_ALL)
+        elif code == 0:
+            print(Fore.YELLOW + "The operation has been correctly recorded. No credit variation: emission equals threshold." + Style.RESET_ALL)
+        elif code == -2:
+            print(Fore.RED + f"WARNING: YOUR BALANCE IS INSUFFICIENT! YOU NEED {abs(delta) - balance} MORE CREDITS" + Style.RESET_ALL)
         else:
-            receipt_so = act_controller.register_operation(address, operation_desc, description, delta, co2)
-            if receipt_so.status == 1:
-                print(Fore.YELLOW + "The operation has been correctly recorded. No credit variation: emission equals threshold." + Style.RESET_ALL)
-                action = None
-            else:
-                print(Fore.RED + 'Operation Failed!' + Style.RESET_ALL)
-
-    
-    def make_operation_carrier(self, username, user_role):
-        """
-        Allows the carrier to perform various operations related to transportation activities.
-        It calculates the CO2 emissions based on the operation type and the number of shipment units.
-        It also checks the user's balance and updates it accordingly after the operation.
-        """
-
-        if user_role != "CARRIER":
-            print(Fore.RED + "Operation not available for your role." + Style.RESET_ALL)
-            return
-
-        print(Fore.YELLOW + "You can type 'exit' at any prompt to cancel the operation." + Style.RESET_ALL)
-
-        address = self.controller.get_public_key_by_username(username)
-        balance = act_controller.check_balance(address)
-
-        if balance <= 0:
-            print(Fore.RED + 'WARNING: YOUR BALANCE IS ZERO OR BELOW!' + Style.RESET_ALL)
-        else: print(Fore.MAGENTA + f"Your balance is {balance}" + Style.RESET_ALL)
-
-
-        print(Fore.CYAN + "\nAvailable CARRIER Operations:" + Style.RESET_ALL)
-
-        operation_factors = {
-            1: ("Product Loading", 2),
-            2: ("Transport", 10),
-            3: ("Product Unloading", 2)
-        }
-
-        for key, (desc, factor) in operation_factors.items():
-            print(f"{key}. {desc} (reference: {factor} tons CO2 per shipment unit)")
-
-        while True:
-            op_input = input("\nSelect the operation (1-3): ").strip()
-            if op_input.lower() == "exit":
-                print(Fore.YELLOW + "Operation aborted by user." + Style.RESET_ALL)
-                return
-            try:
-                op_choice = int(op_input)
-                if op_choice in operation_factors:
-                    break
-                else:
-                    print(Fore.RED + "Invalid option. Try again." + Style.RESET_ALL)
-            except ValueError:
-                print(Fore.RED + "Please enter a number." + Style.RESET_ALL)
-
-        operation_desc, co2_per_unit = operation_factors[op_choice]
-
-        while True:
-            units_input = input(f"Enter number of units (e.g., shipments or pallets) for '{operation_desc}': ").strip()
-            if units_input.lower() == "exit":
-                print(Fore.YELLOW + "Operation aborted by user." + Style.RESET_ALL)
-                return
-            try:
-                units = int(units_input)
-                if units > 0:
-                    break
-                else:
-                    print(Fore.RED + "Units must be greater than 0." + Style.RESET_ALL)
-            except ValueError:
-                print(Fore.RED + "Please enter a valid number." + Style.RESET_ALL)
-
-        threshold = co2_per_unit * units
-
-        while True:
-            co2_input = input(f"Insert actual CO2 emission for '{operation_desc}' (in tons): ").strip()
-            if co2_input.lower() == "exit":
-                print(Fore.YELLOW + "Operation aborted by user." + Style.RESET_ALL)
-                return
-            try:
-                co2 = int(co2_input)
-                break
-            except ValueError:
-                print(Fore.RED + "Please enter a valid integer." + Style.RESET_ALL)
-
-        description = f"{operation_desc} ({units} hectares)"
-        address = self.controller.get_public_key_by_username(username)
-        delta = threshold - co2
-
-        if delta > 0:
-            receipt_so = act_controller.register_operation(address, operation_desc, description, delta, co2)
-            if receipt_so.status == 1:
-                action = "added to"
-                print(Fore.GREEN + f'The operation has been correctly recorded. {delta} credits has been {action} your wallet.' + Style.RESET_ALL)
-            else:
-                print(Fore.RED + 'Operation Failed!' + Style.RESET_ALL)
-        elif delta < 0:
-            if balance - abs(delta) >= 0:
-                receipt_so = act_controller.register_operation(address, operation_desc, description, delta, co2)
-                if receipt_so.status == 1:
-                    delta = abs(delta)
-                    action = "removed from"
-                    print(Fore.GREEN + f'The operation has been correctly recorded. {delta} credits has been {action} your wallet.' + Style.RESET_ALL)
-                else:
-                    print(Fore.RED + 'Operation Failed!' + Style.RESET_ALL)
-            else:
-                print(Fore.RED + f"WARNING: YOUR BALANCE IS INSUFFICIENT! YOU NEED {abs(delta) - balance} MORE CREDITS" + Style.RESET_ALL)
-                action = None
-        else:
-            receipt_so = act_controller.register_operation(address, operation_desc, description, delta, co2)
-            if receipt_so.status == 1:
-                print(Fore.YELLOW + "The operation has been correctly recorded. No credit variation: emission equals threshold." + Style.RESET_ALL)
-                action = None
-            else:
-                print(Fore.RED + 'Operation Failed!' + Style.RESET_ALL)
-
-
-
-    def make_operation_seller(self, username, user_role):
-        """
-        Allows the seller to perform various operations related to sales activities.
-        It calculates the CO2 emissions based on the operation type and the number of units sold.
-        It also checks the user's balance and updates it accordingly after the operation.
-        """
-
-        if user_role != "SELLER":
-            print(Fore.RED + "Operation not available for your role." + Style.RESET_ALL)
-            return
-
-        print(Fore.YELLOW + "You can type 'exit' at any prompt to cancel the operation." + Style.RESET_ALL)
-
-        address = self.controller.get_public_key_by_username(username)
-        balance = act_controller.check_balance(address)
-        if balance <= 0:
-            print(Fore.RED + 'WARNING: YOUR BALANCE IS ZERO OR BELOW!' + Style.RESET_ALL)
-        else: print(Fore.MAGENTA + f"Your balance is {balance}" + Style.RESET_ALL)
-
-
-        print(Fore.CYAN + "\nAvailable SELLER Operations:" + Style.RESET_ALL)
-
-        operation_factors = {
-            1: ("Storage (e.g. fridge/freezer)", 5),
-            2: ("Sales (energy, POS, etc.)", 0.5),
-            3: ("Packaging Disposal", 2)
-        }
-
-        for key, (desc, factor) in operation_factors.items():
-            print(f"{key}. {desc} (reference: {factor} tons CO2 per unit)")
-
-        while True:
-            op_input = input("\nSelect the operation (1-3): ").strip()
-            if op_input.lower() == "exit":
-                print(Fore.YELLOW + "Operation aborted by user." + Style.RESET_ALL)
-                return
-            try:
-                op_choice = int(op_input)
-                if op_choice in operation_factors:
-                    break
-                else:
-                    print(Fore.RED + "Invalid option. Try again." + Style.RESET_ALL)
-            except ValueError:
-                print(Fore.RED + "Please enter a number." + Style.RESET_ALL)
-
-        operation_desc, co2_per_unit = operation_factors[op_choice]
-
-        while True:
-            units_input = input(f"Enter number of units for '{operation_desc}': ").strip()
-            if units_input.lower() == "exit":
-                print(Fore.YELLOW + "Operation aborted by user." + Style.RESET_ALL)
-                return
-            try:
-                units = int(units_input)
-                if units > 0:
-                    break
-                else:
-                    print(Fore.RED + "Units must be greater than 0." + Style.RESET_ALL)
-            except ValueError:
-                print(Fore.RED + "Please enter a valid number." + Style.RESET_ALL)
-
-        threshold = co2_per_unit * units
-
-        while True:
-            co2_input = input(f"Insert actual CO2 emission for '{operation_desc}' (in tons): ").strip()
-            if co2_input.lower() == "exit":
-                print(Fore.YELLOW + "Operation aborted by user." + Style.RESET_ALL)
-                return
-            try:
-                co2 = int(co2_input)
-                break
-            except ValueError:
-                print(Fore.RED + "Please enter a valid number." + Style.RESET_ALL)
-
-        description = f"{operation_desc} ({units} hectares)"
-        address = self.controller.get_public_key_by_username(username)
-        delta = threshold - co2
-
-        if delta > 0:
-            receipt_so = act_controller.register_operation(address, operation_desc, description, delta, co2)
-            if receipt_so.status == 1:
-                action = "added to"
-                print(Fore.GREEN + f'The operation has been correctly recorded. {delta} credits has been {action} your wallet.' + Style.RESET_ALL)
-            else:
-                print(Fore.RED + 'Operation Failed!' + Style.RESET_ALL)
-        elif delta < 0:
-            if balance - abs(delta) >= 0:
-                receipt_so = act_controller.register_operation(address, operation_desc, description, delta, co2)
-                if receipt_so.status == 1:
-                    delta = abs(delta)
-                    action = "removed from"
-                    print(Fore.GREEN + f'The operation has been correctly recorded. {delta} credits has been {action} your wallet.' + Style.RESET_ALL)
-                else:
-                    print(Fore.RED + 'Operation Failed!' + Style.RESET_ALL)
-            else:
-                print(Fore.RED + f"WARNING: YOUR BALANCE IS INSUFFICIENT! YOU NEED {abs(delta) - balance} MORE CREDITS" + Style.RESET_ALL)
-                action = None
-        else:
-            receipt_so = act_controller.register_operation(address, operation_desc, description, delta, co2)
-            if receipt_so.status == 1:
-                print(Fore.YELLOW + "The operation has been correctly recorded. No credit variation: emission equals threshold." + Style.RESET_ALL)
-                action = None
-            else:
-                print(Fore.RED + 'Operation Failed!' + Style.RESET_ALL)
+            print(Fore.RED + 'Operation Failed!' + Style.RESET_ALL)
 
 
     def make_green_action(self, username):
@@ -578,7 +236,7 @@ class Utils:
 
         description = f"Green Action: {green_action}"
         address = self.controller.get_public_key_by_username(username)
-        receipt_ga = act_controller.register_green_action(address, description, co2_saved)
+        receipt_ga = self.chain.register_green_action(address, description, co2_saved, signer=self.session.get_signer())
 
         if receipt_ga.status == 1:
             print(Fore.GREEN + f"Green action registered. {co2_saved} tons of CO2 saved credited to your wallet." + Style.RESET_ALL)
@@ -609,7 +267,7 @@ class Utils:
         if credit == 0:
             return 
         address = self.controller.get_public_key_by_username(username)
-        balance = act_controller.check_balance(address)        
+        balance = self.chain.check_balance(address)        
         if balance >= credit:
             while True:
                 username_credit = input("Insert the username of the account you want to give credit (type 'exit' to go back):\n").strip()
@@ -632,7 +290,7 @@ class Utils:
                 addres_user = self.controller.get_public_key_by_username(username)
                 addres_credit = self.controller.get_public_key_by_username(username_credit)
                 print(f"{Fore.YELLOW}You will give credits to the address: {addres_credit}{Style.RESET_ALL}")
-                receipt = act_controller.transfer_token(addres_user, addres_credit, credit) 
+                receipt = self.chain.transfer_token(addres_user, addres_credit, credit, signer=self.session.get_signer()) 
                 if receipt.status == 1:
                     print(Fore.GREEN + f'Your credits have been successfully given to: {username_credit}' + Style.RESET_ALL)
                 else:
@@ -7,6 +7,7 @@ import sys
 import os
 import time
 from dotenv import load_dotenv
+from monitoring.metrics import metrics
 
 
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '../../', '.env'))
@@ -16,6 +17,34 @@ NODES = [node.strip() for node in NODES if node.strip()]
 
 _w3_instance = None
 
+
+class InstrumentedHTTPProvider(Web3.HTTPProvider):
+    """
+    HTTP provider that records the method and latency of every JSON-RPC request in the metrics registry.
+    A batch is one HTTP round trip and is recorded as one 'batch' request.
+    """
+
+    def make_request(self, method, params):
+        start = time.perf_counter()
+        failed = True
+        try:
+            response = super().make_request(method, params)
+            failed = isinstance(response, dict) and 'error' in response
+            return response
+        finally:
+            metrics.record_rpc(method, time.perf_counter() - start, failed)
+
+    def make_batch_request(self, requests):
+        start = time.perf_counter()
+        failed = True
+        try:
+            response = super().make_batch_request(requests)
+            failed = False
+            return response
+        finally:
+            metrics.record_rpc('batch', time.perf_counter() - start, failed)
+
+
 def try_connect():
     """
     Tries to connect to a random Ethereum node from the list.
@@ -26,7 +55,7 @@ def try_connect():
     nodes_to_try = random.sample(NODES, len(NODES))  
 
     for node_url in nodes_to_try:
-        w3 = Web3(Web3.HTTPProvider(node_url))
+        w3 = Web3(InstrumentedHTTPProvider(node_url) if metrics.enabled else Web3.HTTPProvider(node_url))
         w3.middleware_onion.inject(ExtraDataToPOAMiddleware, layer=0)
 
         if w3.is_connected():
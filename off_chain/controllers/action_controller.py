@@ -1,10 +1,13 @@
 import os
 import json
 import sys
+import threading
+import time
 from colorama import init, Fore, Style
 init(strip=False, convert=False)
 from controllers.deploy_controller import DeployController
-from session.logging import log_msg, log_error
+from session.logging import log_error, log_transaction
+from monitoring.metrics import metrics, CONTRACT
 from web3 import Web3
 from config.web3_provider import get_web3
 import getpass
@@ -29,6 +32,9 @@ class ActionController:
         
         self.w3 = get_web3()
         self.contract = None
+        # Admin transactions are sent one at a time, with nonces taken from a shared counter.
+        self._admin_lock = threading.Lock()
+        self._admin_nonce = None
 
 
     def load_contract(self):
@@ -111,30 +117,94 @@ class ActionController:
         """
         
         try:
+                start = time.perf_counter()
                 private_key = os.getenv('ADMIN_PRIVATE_KEY')
+                admin_address = os.getenv('ADMIN_ADDRESS')
                 function = getattr(self.contract.functions, function_name)(*args)
-                gas_estimate = function.estimate_gas({'from': os.getenv('ADMIN_ADDRESS')})
-           
-                transaction = function.build_transaction({
-                'from': os.getenv('ADMIN_ADDRESS'),
-                'nonce': self.w3.eth.get_transaction_count(os.getenv('ADMIN_ADDRESS')),
-                'gas': int(gas_estimate),
-                'gasPrice': self.w3.eth.gas_price
-                })
-                
-                signed_txn = self.w3.eth.account.sign_transaction(transaction, private_key=private_key)
-                tx_hash = self.w3.eth.send_raw_transaction(signed_txn.raw_transaction)
+                gas_estimate = function.estimate_gas({'from': admin_address})
+
+                with self._admin_lock:
+                    transaction = function.build_transaction({
+                    'from': admin_address,
+                    'nonce': self._next_admin_nonce(admin_address),
+                    'gas': int(gas_estimate),
+                    'gasPrice': self.w3.eth.gas_price
+                    })
+                    signed_txn = self.w3.eth.account.sign_transaction(transaction, private_key=private_key)
+                    tx_hash = self._send_admin_transaction(signed_txn)
                 receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
-                log_msg(f"Transaction {function_name} executed. From: {os.getenv('ADMIN_ADDRESS')}, Tx Hash: {tx_hash.hex()}, Gas: {gas_estimate}, Gas Price: {self.w3.eth.gas_price}")
+                latency = time.perf_counter() - start
+                metrics.observe(CONTRACT, latency, function_name, 'transact')
+                log_transaction(function_name, admin_address, tx_hash.hex(), gas_estimate, transaction['gasPrice'],
+                                latency, receipt.status)
                 
                 return receipt
 
         except Exception as e:
-                log_error(f"Error executing registration. Error: {str(e)}")
+                metrics.inc('sfs_contract_errors_total', function_name)
+                log_error("Error executing registration.", function=function_name, error=str(e))
                 raise e
         
         
-    def write_data(self, function_name, from_address, *args):
+    def _next_admin_nonce(self, admin_address):
+        """
+        Returns the nonce of the next admin transaction. The counter is seeded from the pending
+        transaction count the first time and after a send fails. Call it holding _admin_lock.
+        """
+        if self._admin_nonce is None:
+            self._admin_nonce = self.w3.eth.get_transaction_count(admin_address, 'pending')
+        return self._admin_nonce
+
+
+    def _send_admin_transaction(self, signed_txn):
+        """
+        Sends a signed admin transaction and advances the nonce counter only if the node accepted it.
+        Call it holding _admin_lock.
+        """
+        try:
+            tx_hash = self.w3.eth.send_raw_transaction(signed_txn.raw_transaction)
+        except Exception:
+            self._admin_nonce = None
+            raise
+        self._admin_nonce += 1
+        return tx_hash
+
+
+    def _prompt_private_key(self, from_address):
+        """
+        Asks for the private key that confirms a transaction and checks it belongs to the sender.
+
+        Args:
+            from_address (str): The Ethereum address the transaction is sent from.
+
+        Returns:
+            str: The private key, or None if no valid key for the address was entered.
+        """
+        max_attempts = 3
+        private_key = None
+
+        for _ in range(max_attempts):
+            input_key = getpass.getpass('Insert private key to confirm the transaction: ').strip()
+
+            if re.fullmatch(r'0x[a-fA-F0-9]{64}', input_key):
+                private_key = input_key
+                break
+            else:
+                print(f"{Fore.YELLOW}Invalid private key format. Please try again.{Style.RESET_ALL}")
+        
+        if private_key is None:
+            print(f"{Fore.RED}Too many invalid attempts. Transaction aborted.{Style.RESET_ALL}")
+            return None
+
+        account = self.w3.eth.account.from_key(private_key)
+
+        if account.address.lower() != from_address.lower():
+            print(f"{Fore.RED}That private key doesn't match your account. Transaction cancelled.{Style.RESET_ALL}")
+            return None
+        return private_key
+
+
+    def write_data(self, function_name, from_address, *args, signer=None):
         """
         Writes data to a contract's function. It is used for: updating user information, transferring tokens, 
         registering operations, and registering green actions.
@@ -143,33 +213,22 @@ class ActionController:
             function_name (str): The function name to call on the contract.
             from_address (str): The Ethereum address to send the transaction from.
             *args: Arguments required by the function.
+            signer (SessionSigner, optional): The unlocked wallet of the session. When it is active and
+                belongs to from_address the transaction is signed with it, otherwise the private key is prompted.
 
         Returns:
             The transaction receipt object.
         """
         
         try:
-            max_attempts = 3
-            private_key = None
-
-            for _ in range(max_attempts):
-                input_key = getpass.getpass('Insert private key to confirm the transaction: ').strip()
-
-                if re.fullmatch(r'0x[a-fA-F0-9]{64}', input_key):
-                    private_key = input_key
-                    break
-                else:
-                    print(f"{Fore.YELLOW}Invalid private key format. Please try again.{Style.RESET_ALL}")
-            
-            if private_key is None:
-                print(f"{Fore.RED}Too many invalid attempts. Transaction aborted.{Style.RESET_ALL}")
-                return FailedReceipt(status=0)
-
-            account = self.w3.eth.account.from_key(private_key)
-
-            if account.address.lower() != from_address.lower():
-                print(f"{Fore.RED}That private key doesn't match your account. Transaction cancelled.{Style.RESET_ALL}")
-                return FailedReceipt(status=0)
+            start = time.perf_counter()
+            if signer is not None and signer.can_sign_for(from_address):
+                sign = signer.sign_transaction
+            else:
+                private_key = self._prompt_private_key(from_address)
+                if private_key is None:
+                    return FailedReceipt(status=0)
+                sign = lambda transaction: self.w3.eth.account.sign_transaction(transaction, private_key=private_key)
         
             function = getattr(self.contract.functions, function_name)(*args)
             gas_estimate = function.estimate_gas({'from': from_address})
@@ -181,15 +240,19 @@ class ActionController:
             'gasPrice': self.w3.eth.gas_price
             })
             
-            signed_txn = self.w3.eth.account.sign_transaction(transaction, private_key=private_key)
+            signed_txn = sign(transaction)
             tx_hash = self.w3.eth.send_raw_transaction(signed_txn.raw_transaction)
             receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
-            log_msg(f"Transaction {function_name} executed. From: {from_address}, Tx Hash: {tx_hash.hex()}, Gas: {gas_estimate}, Gas Price: {self.w3.eth.gas_price}")
+            latency = time.perf_counter() - start
+            metrics.observe(CONTRACT, latency, function_name, 'transact')
+            log_transaction(function_name, from_address, tx_hash.hex(), gas_estimate, transaction['gasPrice'],
+                            latency, receipt.status)
 
             return receipt
 
         except Exception as e:
-            log_error(f"Error executing {function_name} from {from_address}. Error: {str(e)}")
+            metrics.inc('sfs_contract_errors_total', function_name)
+            log_error(f"Error executing {function_name}.", function=function_name, from_address=from_address, error=str(e))
             raise e
         
     
@@ -201,37 +264,94 @@ class ActionController:
         return self.write_data_user('addUser', from_address, name, last_name, user_role)
     
 
-    def update_user(self, name: str, last_name: str, user_role: str, from_address: str):
+    def add_users_batch(self, users, on_result=None):
+        """
+        Registers many users on chain with pipelined admin transactions: every addUser transaction
+        is signed with the next nonce and sent without waiting, then all receipts are collected.
+        The nonce only advances when a transaction is accepted by the node, so a rejected one
+        leaves no gap for the transactions after it. Other admin transactions wait until the batch is sent.
+
+        Args:
+            users (list): Tuples (name, last_name, user_role, address).
+            on_result (callable, optional): Called as on_result(index, receipt_or_error) as each result is known.
+
+        Returns:
+            list: For each user, in input order, the transaction receipt or the exception that prevented it.
+        """
+        start = time.perf_counter()
+        private_key = os.getenv('ADMIN_PRIVATE_KEY')
+        admin_address = os.getenv('ADMIN_ADDRESS')
+        gas_price = self.w3.eth.gas_price
+        results = [None] * len(users)
+        pending = []
+
+        with self._admin_lock:
+            for index, (name, last_name, user_role, address) in enumerate(users):
+                try:
+                    function = self.contract.functions.addUser(Web3.to_checksum_address(address), name, last_name, user_role)
+                    gas_estimate = function.estimate_gas({'from': admin_address})
+                    transaction = function.build_transaction({
+                        'from': admin_address,
+                        'nonce': self._next_admin_nonce(admin_address),
+                        'gas': int(gas_estimate),
+                        'gasPrice': gas_price
+                    })
+                    signed_txn = self.w3.eth.account.sign_transaction(transaction, private_key=private_key)
+                    tx_hash = self._send_admin_transaction(signed_txn)
+                    pending.append((index, tx_hash, gas_estimate))
+                except Exception as e:
+                    log_error("Error executing registration.", function='addUser', address=address, error=str(e))
+                    results[index] = e
+                    if on_result:
+                        on_result(index, e)
+
+        for index, tx_hash, gas_estimate in pending:
+            try:
+                receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
+                latency = time.perf_counter() - start
+                metrics.observe(CONTRACT, latency, 'addUser', 'transact')
+                log_transaction('addUser', admin_address, tx_hash.hex(), gas_estimate, gas_price, latency, receipt.status)
+                results[index] = receipt
+            except Exception as e:
+                log_error("Error waiting for addUser transaction.", function='addUser', tx_hash=tx_hash.hex(), error=str(e))
+                results[index] = e
+            if on_result:
+                on_result(index, results[index])
+
+        return results
+
+
+    def update_user(self, name: str, last_name: str, user_role: str, from_address: str, signer=None):
         """
         Calls updateUser(name, lastName)
         """
         from_address = Web3.to_checksum_address(from_address)
-        return self.write_data('updateUser', from_address, name, last_name, user_role)
+        return self.write_data('updateUser', from_address, name, last_name, user_role, signer=signer)
     
 
-    def transfer_token(self, from_address: str, to_address: str, amount: int):
+    def transfer_token(self, from_address: str, to_address: str, amount: int, signer=None):
         """
         Calls transferToken(to, amount)
         """
         from_address = Web3.to_checksum_address(from_address)
         to_address = Web3.to_checksum_address(to_address)
-        return self.write_data('transferToken', from_address, to_address, amount)
+        return self.write_data('transferToken', from_address, to_address, amount, signer=signer)
     
     
-    def register_operation(self, address: str, operationType: str, operationDescription: str, delta: int, co2emissions: int):
+    def register_operation(self, address: str, operationType: str, operationDescription: str, delta: int, co2emissions: int, signer=None):
         """
         Calls registerOperation(address, operationType, operationDescription, co2)
         """
         address = Web3.to_checksum_address(address)
-        return self.write_data('registerOperation', address, operationType, operationDescription, delta, co2emissions)
+        return self.write_data('registerOperation', address, operationType, operationDescription, delta, co2emissions, signer=signer)
     
     
-    def register_green_action(self, address: str, operationDescription: str, co2saved: int):
+    def register_green_action(self, address: str, operationDescription: str, co2saved: int, signer=None):
         """
         Calls registerOperation(address, operationType, operationDescription, co2)
         """
         address = Web3.to_checksum_address(address)
-        return self.write_data('registerGreenAction', address, operationDescription, co2saved)
+        return self.write_data('registerGreenAction', address, operationDescription, co2saved, signer=signer)
     
     
     def check_balance(self, address: str):
@@ -240,5 +360,125 @@ class ActionController:
         """
         address = Web3.to_checksum_address(address)
         function = getattr(self.contract.functions, 'checkBalance')()
-        return function.call({'from': address})
+        with metrics.timer(CONTRACT, 'checkBalance', 'call', errors='sfs_contract_errors_total'):
+            return function.call({'from': address})
+
+
+    def get_block_number(self):
+        """
+        Returns the number of the latest block.
+        """
+        return self.w3.eth.block_number
+
+
+    def balances_of(self, addresses, block_identifier='latest'):
+        """
+        Reads the token balance of many addresses at the same block, sending the balanceOf calls
+        as one JSON-RPC batch. Falls back to one call per address if the node rejects batches.
+
+        Args:
+            addresses (list): The addresses to read.
+            block_identifier: The block the balances are read at.
+
+        Returns:
+            list: The balances, in the same order as the addresses.
+        """
+        addresses = [Web3.to_checksum_address(address) for address in addresses]
+        if not addresses:
+            return []
+        try:
+            with metrics.timer(CONTRACT, 'balanceOf', 'batch'), self.w3.batch_requests() as batch:
+                for address in addresses:
+                    batch.add(self.contract.functions.balanceOf(address).call(block_identifier=block_identifier))
+                balances = batch.execute()
+        except Exception:
+            balances = [self.contract.functions.balanceOf(address).call(block_identifier=block_identifier)
+                        for address in addresses]
+        return list(balances)
+
+
+    def histories_of(self, addresses):
+        """
+        Reads the operations and green actions of many addresses, sending the getOperations and
+        getGreenActions calls as one JSON-RPC batch. Falls back to two calls per address if the
+        node rejects batches.
+
+        Args:
+            addresses (list): The addresses to read.
+
+        Returns:
+            list: One (operations, green actions) tuple per address, in the same order.
+        """
+        addresses = [Web3.to_checksum_address(address) for address in addresses]
+        if not addresses:
+            return []
+        try:
+            with metrics.timer(CONTRACT, 'getOperations+getGreenActions', 'batch'), self.w3.batch_requests() as batch:
+                for address in addresses:
+                    batch.add(self.contract.functions.getOperations(address).call())
+                    batch.add(self.contract.functions.getGreenActions(address).call())
+                results = batch.execute()
+        except Exception:
+            results = []
+            for address in addresses:
+                results += [self.contract.functions.getOperations(address).call(),
+                            self.contract.functions.getGreenActions(address).call()]
+        return list(zip(results[0::2], results[1::2]))
+
+
+    def get_token_transfer_addresses(self, from_block, to_block, step=5000):
+        """
+        Returns every address whose balance changed between two blocks, read from the ERC20
+        Transfer events (emitted for mints, burns and transfers). Large ranges are split in steps.
+
+        Args:
+            from_block (int): The first block to scan.
+            to_block (int): The last block to scan.
+            step (int): The maximum number of blocks per log query.
+
+        Returns:
+            set: The checksum addresses involved in a transfer.
+        """
+        zero_address = '0x' + '0' * 40
+        addresses = set()
+        for start in range(from_block, to_block + 1, step):
+            end = min(start + step - 1, to_block)
+            for event in self.contract.events.Transfer.get_logs(from_block=start, to_block=end):
+                addresses.update((event['args']['from'], event['args']['to']))
+        addresses.discard(zero_address)
+        return addresses
+
+    def get_operation_deltas(self, from_block=0, to_block=None, step=5000):
+        """
+        Returns the credit delta of every registered operation. The Operation struct does not keep it,
+        so it is read from the TokensAdded/TokensRemoved event that registerOperation emits in the same
+        transaction as OperationRegistered (no event: a delta of zero). Large ranges are split in steps.
+
+        Args:
+            from_block (int): The first block to scan.
+            to_block (int, optional): The last block to scan; defaults to the latest block.
+            step (int): The maximum number of blocks per log query.
+
+        Returns:
+            dict: For every checksum address, the deltas of its operations in registration order,
+                  i.e. in the order of getOperations.
+        """
+        if to_block is None:
+            to_block = self.w3.eth.block_number
+        events = self.contract.events
+        deltas = {}
+        for start in range(from_block, to_block + 1, step):
+            end = min(start + step - 1, to_block)
+            changes = {}
+            for event in events.TokensAdded.get_logs(from_block=start, to_block=end):
+                key = (event['transactionHash'], event['args']['to'])
+                changes[key] = changes.get(key, 0) + event['args']['amount']
+            for event in events.TokensRemoved.get_logs(from_block=start, to_block=end):
+                key = (event['transactionHash'], event['args']['from'])
+                changes[key] = changes.get(key, 0) - event['args']['amount']
+            operations = events.OperationRegistered.get_logs(from_block=start, to_block=end)
+            for event in sorted(operations, key=lambda event: (event['blockNumber'], event['logIndex'])):
+                user = event['args']['user']
+                deltas.setdefault(user, []).append(changes.get((event['transactionHash'], user), 0))
+        return deltas
 
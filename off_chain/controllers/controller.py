@@ -2,29 +2,58 @@ import re
 from datetime import datetime
 from colorama import init, Fore, Style
 init(strip=False, convert=False)
-from database.database_operation import DatabaseOperations
+from config import config
 from session.session import Session
 from models.credentials import Credentials
- 
+from eth_keys import keys
+from eth_utils import decode_hex, is_address
+from singleton.services import ServiceContainer, services as default_services
+from monitoring.metrics import metrics
+
+
 class Controller:
     """
     Controller class to manage user authentication, registration, and session handling.
     """
     
  
-    def __init__(self, session: Session):
+    def __init__(self, session: Session, services: ServiceContainer = None):
         """
-        Initialize the Controller with a session object and set up the database operations.
+        Initialize the Controller with a session object and the shared services.
        
         :param session: The session object to manage user sessions and login attempts.
+        :param services: The service container providing the database layer and the chain client;
+                         the application-wide container if omitted.
         """
-        self.db_ops = DatabaseOperations()
+        self.services = services or default_services
         self.session = session
         self.__n_attempts_limit = 5 # Maximum number of login attempts before lockout.
         self.__timeout_timer = 180 # Timeout duration in seconds.
+
+    @property
+    def db_ops(self):
+        """
+        The database layer of the calling thread, shared with the other components.
+        """
+        return self.services.db
+
+    @property
+    def chain(self):
+        """
+        The chain client, shared with the other components and connected on first use.
+        """
+        return self.services.chain
+
+    @property
+    def emission_factors(self):
+        """
+        The emission factor catalog, shared with the other components.
+        """
+        return self.services.emission_factors
  
        
-    def login(self, username: str, password: str, public_key: str, private_key: str):
+    @metrics.action('login')
+    def login(self, username: str, password: str, public_key: str, private_key: str, unlock_signer: bool = False):
         """
         Attempts to log a user in by validating credentials and handling session attempts.
        
@@ -32,13 +61,18 @@ class Controller:
         :param password: The user's password.
         :param public_key: The user's public key.
         :param private_key: The user's private key.
+        :param unlock_signer: If True, the wallet stored in the user's credentials is decrypted and kept
+                              unlocked in the session, so transactions are signed without prompting for the key.
         :return: Tuple containing a status code and the user's role, if successful.
         """
-        if(self.check_attempts() and self.db_ops.check_credentials(username, password, public_key, private_key)):
-            creds: Credentials = self.db_ops.get_creds_by_username(username)
+        creds: Credentials = self.db_ops.authenticate(username, password, public_key, private_key) if self.check_attempts() else None
+        if creds is not None:
             user_role = creds.get_role()
             user = self.db_ops.get_user_by_username(username)
             self.session.set_user(user)
+            if unlock_signer:
+                self.session.unlock_signer(self.db_ops.decrypt_private_k(creds.get_private_key(), password),
+                                           (config.config.get('signer') or {}).get('idle_ttl', 900))
             return 0, user_role
         elif self.check_attempts():
             self.session.increment_attempts()
@@ -49,10 +83,106 @@ class Controller:
             return -2, None
         
    
+    @metrics.action('open_session')
+    def open_session(self, username: str, password: str, unlock_signer: bool = True):
+        """
+        Logs a user in with username and password only, for non-interactive use. The wallet is taken from
+        the encrypted private key stored in the user's credentials and, if requested, unlocked in the session.
+
+        :param username: The user's username.
+        :param password: The user's password.
+        :param unlock_signer: Whether the wallet is unlocked so transactions can be signed without prompting.
+        :return: Tuple containing a status code (0 on success, -1 for wrong credentials, -2 if the session
+                 has run out of login attempts) and the user's role.
+        """
+        if not self.check_attempts():
+            return -2, None
+        creds: Credentials = self.db_ops.authenticate_password(username, password)
+        if creds is None:
+            self.session.increment_attempts()
+            if self.session.get_attempts() == self.__n_attempts_limit:
+                self.session.set_error_attempts_timeout(self.__timeout_timer)
+            return -1, None
+        self.session.reset_attempts()
+        self.session.set_user(self.db_ops.get_user_by_username(username))
+        if unlock_signer:
+            self.session.unlock_signer(self.db_ops.decrypt_private_k(creds.get_private_key(), password),
+                                       (config.config.get('signer') or {}).get('idle_ttl', 900))
+        return 0, creds.get_role()
+
+    @metrics.action('record_operation')
+    def record_operation(self, username: str, user_role: str, operation, units: int, co2: int):
+        """
+        Registers an operation of the user on chain. The credit delta is the reference emission of the
+        operation (its factor times the units) minus the actual emission; a negative delta needs enough balance.
+
+        :param username: The user's username.
+        :param user_role: The user's role, which determines the available operations.
+        :param operation: The operation, as its choice number or its name.
+        :param units: The number of units (of the role's unit, e.g. hectares) the operation was performed on.
+        :param co2: The actual CO2 emission of the operation, in tons.
+        :return: Tuple (code, delta): code 0 on success, -1 if the transaction failed, -2 if the balance is
+                 insufficient, -3 if the operation is not available for the role or the units are not positive.
+        """
+        operation = self.emission_factors.resolve(user_role, operation)
+        if operation is None or units <= 0:
+            return -3, None
+
+        operation_desc = self.emission_factors.operations(user_role)[operation][0]
+        delta = self.emission_factors.delta(user_role, operation, units, co2)
+        address = self.get_public_key_by_username(username)
+        if delta < 0 and self.chain.check_balance(address) < abs(delta):
+            return -2, delta
+
+        unit = self.emission_factors.unit(user_role)
+        receipt = self.chain.register_operation(address, operation_desc,
+                                                f"{operation_desc} ({units} {unit}{'s' if units != 1 else ''})",
+                                                delta, co2, signer=self.session.get_signer())
+        return (0 if receipt.status == 1 else -1), delta
+
+    @metrics.action('record_green_action')
+    def record_green_action(self, username: str, description: str, co2_saved: int):
+        """
+        Registers a green action of the user on chain.
+
+        :param username: The user's username.
+        :param description: What the user did.
+        :param co2_saved: The tons of CO2 saved, which are credited to the user's wallet.
+        :return: 0 on success, -1 if the transaction failed, -3 if the description is empty or co2_saved is not positive.
+        """
+        if not description or co2_saved <= 0:
+            return -3
+        address = self.get_public_key_by_username(username)
+        receipt = self.chain.register_green_action(address, f"Green Action: {description}", co2_saved,
+                                                   signer=self.session.get_signer())
+        return 0 if receipt.status == 1 else -1
+
+    @metrics.action('give_credit')
+    def give_credit(self, username: str, recipient: str, amount: int):
+        """
+        Transfers credits from the user to another user.
+
+        :param username: The user's username.
+        :param recipient: The username of the user receiving the credits.
+        :param amount: The number of credits to transfer.
+        :return: 0 on success, -1 if the transaction failed, -2 if the balance is insufficient,
+                 -3 if the recipient does not exist or is the user, or the amount is not positive.
+        """
+        if amount <= 0 or recipient == username or self.check_username(recipient) != -1:
+            return -3
+        address = self.get_public_key_by_username(username)
+        if self.chain.check_balance(address) < amount:
+            return -2
+        receipt = self.chain.transfer_token(address, self.get_public_key_by_username(recipient), amount,
+                                            signer=self.session.get_signer())
+        return 0 if receipt.status == 1 else -1
+
     def registration(self, username: str, name: str, lastname: str, user_role: str, birthday: str, 
                      mail: str, phone: str, company_name: str, password: str, public_key: str, private_key: str):
         """
-        Inserts user information into the database.
+        Registers a new user: inserts the user information into the database, whose constraints decide
+        whether the username, e-mail, phone number and keys are free, then adds the user on chain.
+        If the on-chain registration fails the database insert is undone.
  
         :param username: The user's username.
         :param name: The user's first name. 
@@ -65,19 +195,31 @@ class Controller:
         :param password: The user's password.
         :param public_key: The user's public key.
         :param private_key: The user's private key.
-        :return: A registration code indicating the result of the operation.
+        :return: A registration code: 0 on success, the codes of register_user if the insert failed,
+                 -6 if the on-chain registration was reverted.
+        :raises Exception: The error of the on-chain registration (e.g. Web3Exception), once the insert is undone.
         """
         
         registration_code = self.db_ops.register_user(username, name, lastname, user_role, birthday, mail, 
                                                     phone, company_name, password, public_key, private_key)
- 
-        if registration_code == 0:
-            user = self.db_ops.get_user_by_username(username)
-            self.session.set_user(user)
- 
+        if registration_code != 0:
+            return registration_code
+
+        try:
+            receipt = self.chain.add_user(name, lastname, user_role, public_key)
+        except Exception:
+            self.db_ops.unregister_user(username)
+            raise
+        if receipt.status != 1:
+            self.db_ops.unregister_user(username)
+            return -6
+
+        user = self.db_ops.get_user_by_username(username)
+        self.session.set_user(user)
         return registration_code
     
     
+    @metrics.action('insert_report_info')
     def insert_report_info(self, creation_date: str, start_date: str, end_date: str, username: str):
         """
         Inserts report information into the database and updates the session with the report details.
@@ -86,7 +228,7 @@ class Controller:
         report_code = self.db_ops.insert_report(creation_date, username, start_date, end_date)
        
         if report_code == 1:
-            report = self.db_ops.get_report_by_username(username)
+            report = self.db_ops.get_report_by_date(username, creation_date)
             self.session.set_report(report)
         return report_code
     
@@ -152,6 +294,31 @@ class Controller:
         else:
             return False
 
+    def check_password_format(self, password):
+        """
+        Validates that a password satisfies the password policy.
+
+        :param password: The password to validate.
+        :return: Returns True if the password is 8 to 100 characters long, contains no whitespace and includes
+                 digits, upper and lower case letters and a special character. Returns False otherwise.
+        """
+        passwd_regex = r'^(?=.*\d)(?=.*[a-z])(?=.*[A-Z])(?=.*[@#$%^&+=])(?!.*\s).{8,100}$'
+        return re.fullmatch(passwd_regex, password) is not None
+
+    def check_key_pair(self, public_key, private_key):
+        """
+        Validates that a private key is well formed and belongs to the given public address.
+
+        :param public_key: The checksum or lowercase address of the wallet.
+        :param private_key: The hex encoded private key.
+        :return: Returns True if the private key derives the given address. Returns False otherwise.
+        """
+        try:
+            derived = keys.PrivateKey(decode_hex(private_key)).public_key.to_checksum_address()
+        except Exception:
+            return False
+        return is_address(public_key) and derived.lower() == public_key.lower()
+
     def check_username(self, username):
         """
         Checks if a username already exists in the database.
@@ -222,8 +389,15 @@ class Controller:
     def get_public_key_by_username(self, username):
         """
         Retrieves the public key associated with a given username.
-        """
-        return self.db_ops.get_public_key_by_username(username)
+        Public keys never change once registered, so they are cached in the shared 'public_keys' cache.
+        """
+        public_keys = self.services.cache('public_keys')
+        public_key = public_keys.get(username)
+        if public_key is None:
+            public_key = self.db_ops.get_public_key_by_username(username)
+            if public_key is not None:
+                public_keys[username] = public_key
+        return public_key
     
     def get_role_by_username(self, username):
         """
@@ -243,12 +417,97 @@ class Controller:
         """
         return self.db_ops.get_report_by_date(username, creation_date)
     
+    def iter_report_pages(self, username, page_size=50):
+        """
+        Streams the reports of a user page by page.
+        """
+        return self.db_ops.iter_report_pages(username, page_size)
+    
+    def iter_report_date_pages(self, username, page_size=20):
+        """
+        Streams the distinct creation dates of a user's reports page by page.
+        """
+        return self.db_ops.iter_report_date_pages(username, page_size)
+    
+    def get_report_lines(self, id_report):
+        """
+        Retrieves the line items (single operations) of a report.
+        """
+        return self.db_ops.get_report_lines(id_report)
+
+    def get_report_line_page(self, username, creation_date, offset=0, page_size=20):
+        """
+        Retrieves one page of the line items of the user's reports created at the given date.
+        """
+        return self.db_ops.get_report_line_page(username, creation_date, offset, page_size)
+
+    def count_report_lines(self, username, creation_date):
+        """
+        Counts the line items of the user's reports created at the given date.
+        """
+        return self.db_ops.count_report_lines(username, creation_date)
+    
+    def get_co2_totals_by_action_type(self, username, start_date=None, end_date=None):
+        """
+        Retrieves the CO2 totals of a user's reported operations grouped by action type.
+        """
+        return self.db_ops.get_co2_totals_by_action_type(username, start_date, end_date)
+    
+    def get_archived_report_dates(self, username):
+        """
+        Retrieves the creation dates of the user's archived reports.
+        """
+        return self.db_ops.get_archived_report_dates(username)
+    
+    def get_archived_reports(self, username, creation_date):
+        """
+        Retrieves the user's archived reports created at the given date.
+        """
+        return self.db_ops.get_archived_reports(username, creation_date)
+    
+    def search_operations(self, text, username=None, page=0, page_size=20):
+        """
+        Searches the reported operations by the words of their description, best match first.
+        """
+        return self.db_ops.search_operations(text, username, page, page_size)
+    
+    def refresh_co2_aggregates(self, username):
+        """
+        Updates the precomputed CO2 totals of a user with the operations recorded since the last update.
+        """
+        return self.db_ops.refresh_co2_aggregates(username)
+    
+    def refresh_role_co2_aggregates(self, role):
+        """
+        Updates the precomputed CO2 totals of every user of a role, so the role totals cover the whole role.
+        """
+        return self.db_ops.refresh_role_co2_aggregates(role)
+    
+    def get_co2_aggregates(self, scope, subject, granularity, start_period=None, end_period=None):
+        """
+        Retrieves precomputed CO2 totals for a user or a role at day, week or month resolution.
+        """
+        return self.db_ops.get_co2_aggregates(scope, subject, granularity, start_period, end_period)
+    
     def get_information_for_credit(self):
         """
         Retrieves information necessary for calculating carbon credits.
         """
         return self.db_ops.get_information_for_credit()
     
+    def get_top_credit_holders(self, k=10, role=None, company_name=None, exclude_username=None):
+        """
+        Refreshes the credit balance snapshot and returns the top-k credit holders.
+        """
+        self.db_ops.refresh_credit_balances()
+        return self.db_ops.get_top_credit_holders(k, role, company_name, exclude_username)
+    
+    def iter_user_pages(self, page_size=50):
+        """
+        Streams the registered users page by page.
+        """
+        return self.db_ops.iter_user_pages(page_size)
+    
     def update_user_profile(self, username, name, lastname, birthday, phone):
         """
         Updates the user's profile information in the database.
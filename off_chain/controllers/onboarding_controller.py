@@ -0,0 +1,188 @@
+"""
+This module implements bulk onboarding: registering many users at once from a CSV file.
+Rows are validated up front, passwords are hashed and private keys encrypted in a process pool,
+the database rows are written with executemany in one transaction per chunk, and the users are
+registered on chain with pipelined admin transactions.
+"""
+
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+from controllers.controller import Controller
+from database import crypto
+from session.session import Session
+
+
+CSV_COLUMNS = ('username', 'name', 'lastname', 'role', 'birthday', 'email', 'phone',
+               'company_name', 'password', 'public_key', 'private_key')
+
+ROLES = ('FARMER', 'PRODUCER', 'CARRIER', 'SELLER')
+
+REGISTRATION_ERRORS = {
+    -1: 'Internal error',
+    -2: 'Username already taken',
+    -3: 'E-mail already inserted',
+    -4: 'Phone number already inserted',
+    -5: 'A wallet with these keys already exists',
+}
+
+
+class OnboardingController:
+    """
+    Registers users in bulk from a CSV file and reports the outcome of every row.
+    """
+
+    def __init__(self, controller: Controller = None, chain=None):
+        """
+        :param controller: Controller used for the field validation and the database layer.
+        :param chain: ActionController used for the on-chain registration; the controller's chain client if omitted.
+        """
+        self.controller = controller or Controller(Session())
+        self.db_ops = self.controller.db_ops
+        self._chain = chain
+
+    @property
+    def chain(self):
+        """
+        The chain client used for the on-chain registration, connected on first use.
+        """
+        return self._chain or self.controller.chain
+
+    def read_csv(self, path):
+        """
+        Reads the users from a CSV file with a header row.
+
+        :param path: Path to the CSV file. It must contain every column in CSV_COLUMNS.
+        :return: A list of (row number, row dict) tuples; row numbers count the header as line 1.
+        :raises ValueError: If required columns are missing.
+        """
+        with open(path, newline='', encoding='utf-8-sig') as file:
+            reader = csv.DictReader(file)
+            missing = [column for column in CSV_COLUMNS if column not in (reader.fieldnames or [])]
+            if missing:
+                raise ValueError(f"Missing columns: {', '.join(missing)}")
+            return [(line, {key: (value or '').strip() for key, value in row.items() if key})
+                    for line, row in enumerate(reader, start=2)]
+
+    def validate_row(self, row):
+        """
+        Validates the fields of one CSV row with the same rules as the interactive registration.
+
+        :param row: The row dict.
+        :return: None if the row is valid, otherwise the reason it was rejected.
+        """
+        for column in ('username', 'name', 'lastname', 'email', 'password'):
+            if not self.controller.check_null_info(row[column]):
+                return f"Missing {column}"
+        if row['role'].upper() not in ROLES:
+            return f"Invalid role '{row['role']}'"
+        if not self.controller.check_birthdate_format(row['birthday']):
+            return 'Invalid birthdate or incorrect format'
+        if not self.controller.check_email_format(row['email']):
+            return 'Invalid e-mail format'
+        if not self.controller.check_phone_number_format(row['phone']):
+            return 'Invalid phone number format'
+        if not self.controller.check_password_format(row['password']):
+            return 'Password does not satisfy the password policy'
+        if not self.controller.check_key_pair(row['public_key'], row['private_key']):
+            return 'The provided public and private key do not match'
+        return None
+
+    def validate(self, rows):
+        """
+        Validates every row and rejects values repeated inside the file.
+        Conflicts with users already in the database are detected by the insert itself.
+
+        :param rows: The (row number, row dict) tuples returned by read_csv.
+        :return: Tuple (valid rows, {row number: reason} for the rejected rows).
+        """
+        valid, errors = [], {}
+        seen = {column: set() for column in ('username', 'email', 'phone', 'public_key')}
+        for line, row in rows:
+            reason = self.validate_row(row)
+            if reason is None:
+                for column, values in seen.items():
+                    value = row[column].lower() if column == 'public_key' else row[column]
+                    if value in values:
+                        reason = f"Duplicate {column} in the file"
+                        break
+            if reason is not None:
+                errors[line] = reason
+                continue
+            for column, values in seen.items():
+                values.add(row[column].lower() if column == 'public_key' else row[column])
+            valid.append((line, row))
+        return valid, errors
+
+    def import_users(self, path, workers=None, chunk_size=500, register_on_chain=True, on_row=None):
+        """
+        Registers every valid user of a CSV file.
+
+        :param path: Path to the CSV file.
+        :param workers: Number of hashing processes; defaults to the number of CPUs.
+        :param chunk_size: Number of rows hashed, inserted and sent on chain together.
+        :param register_on_chain: Whether the stored users are also registered on chain; users whose
+                                  on-chain registration fails or is reverted are removed again.
+        :param on_row: Called as on_row(row number, username, ok, message) once per row, as soon as its outcome is known.
+        :return: A list of (row number, username, ok, message) tuples, one per CSV row, in file order.
+        """
+        results = {}
+
+        def report(line, username, ok, message):
+            results[line] = (line, username, ok, message)
+            if on_row:
+                on_row(line, username, ok, message)
+
+        rows = self.read_csv(path)
+        valid, errors = self.validate(rows)
+        usernames = {line: row['username'] for line, row in rows}
+        for line, reason in errors.items():
+            report(line, usernames[line], False, reason)
+
+        workers = workers or os.cpu_count() or 1
+        params = (self.db_ops.n_param, self.db_ops.r_param, self.db_ops.p_param, self.db_ops.dklen_param)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for start in range(0, len(valid), chunk_size):
+                chunk = valid[start:start + chunk_size]
+                protected = list(pool.map(crypto.protect_credentials,
+                                          [row['password'] for _, row in chunk],
+                                          [row['private_key'] for _, row in chunk],
+                                          *([param] * len(chunk) for param in params),
+                                          chunksize=max(1, len(chunk) // (4 * workers))))
+
+                codes = self.db_ops.register_users_bulk([
+                    (row['username'], row['name'], row['lastname'], row['role'].upper(), row['birthday'],
+                     row['email'], row['phone'], row['company_name'], hashed, row['public_key'], encrypted)
+                    for (_, row), (hashed, encrypted) in zip(chunk, protected)
+                ])
+
+                stored = []
+                for (line, row), code in zip(chunk, codes):
+                    if code != 0:
+                        report(line, row['username'], False, REGISTRATION_ERRORS.get(code, REGISTRATION_ERRORS[-1]))
+                    elif not register_on_chain:
+                        report(line, row['username'], True, 'Registered off chain')
+                    else:
+                        stored.append((line, row))
+
+                if stored:
+                    def on_result(index, result, stored=stored):
+                        # As in Controller.registration, a user whose on-chain registration fails is removed
+                        # again, so the row can be imported anew instead of being stuck with a taken username.
+                        line, row = stored[index]
+                        if isinstance(result, Exception):
+                            message = f"On-chain registration failed: {result}"
+                        elif result.status != 1:
+                            message = 'On-chain registration reverted'
+                        else:
+                            report(line, row['username'], True, 'Registered')
+                            return
+                        if self.db_ops.unregister_user(row['username']) == 0:
+                            report(line, row['username'], False, f"{message}; not saved")
+                        else:
+                            report(line, row['username'], False, f"{message}; saved off chain only")
+
+                    self.chain.add_users_batch([(row['name'], row['lastname'], row['role'].upper(), row['public_key'])
+                                                for _, row in stored], on_result=on_result)
+
+        return [results[line] for line, _ in rows]
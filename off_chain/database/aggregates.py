@@ -0,0 +1,135 @@
+"""
+This module maintains the materialized CO2 aggregates at day, week and month resolution,
+per user and per role. The on-chain operation and green action arrays of a user are append-only,
+so a per-user high-water mark (how many entries of each array were already folded in) is enough
+to update the aggregates incrementally: only entries past the mark are ever added.
+"""
+
+import datetime
+from collections import defaultdict
+
+
+GRANULARITIES = ('DAY', 'WEEK', 'MONTH')
+
+
+def period_keys(timestamp):
+    """
+    Returns the (DAY, WEEK, MONTH) period keys of a unix timestamp, in local time like the reports.
+    Keys are 'YYYY-MM-DD', ISO week 'YYYY-Www' and 'YYYY-MM', so they sort chronologically as text.
+    """
+    ts = datetime.datetime.fromtimestamp(timestamp)
+    iso_year, iso_week, _ = ts.isocalendar()
+    return (
+        ('DAY', ts.strftime('%Y-%m-%d')),
+        ('WEEK', f"{iso_year}-W{iso_week:02d}"),
+        ('MONTH', ts.strftime('%Y-%m')),
+    )
+
+
+def period_key(granularity, day):
+    """
+    Returns the period key of a date for the given granularity.
+
+    Args:
+        granularity (str): 'DAY', 'WEEK' or 'MONTH'.
+        day (datetime.date): The date.
+    """
+    if granularity == 'DAY':
+        return day.strftime('%Y-%m-%d')
+    if granularity == 'WEEK':
+        iso_year, iso_week, _ = day.isocalendar()
+        return f"{iso_year}-W{iso_week:02d}"
+    return day.strftime('%Y-%m')
+
+
+def apply_new_actions(conn, username, role, raw_ops, raw_green):
+    """
+    Folds the operations and green actions of a user that are past the user's high-water mark
+    into the aggregates of the user and of the user's role, then advances the mark.
+    Everything happens in one IMMEDIATE transaction and the mark only ever moves forward, so a
+    process holding an older read of the arrays than the one that last advanced the mark folds
+    nothing and concurrent processes never fold the same entry twice.
+
+    Args:
+        conn (sqlite3.Connection): The database connection.
+        username (str): The user the actions belong to.
+        role (str): The role of the user.
+        raw_ops (list): The full on-chain operations array (action_type, description, timestamp, co2).
+        raw_green (list): The full on-chain green actions array (description, timestamp, co2_saved).
+
+    Returns:
+        int: The number of newly folded entries.
+    """
+    cur = conn.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        mark = cur.execute("""SELECT operations_seen, green_actions_seen
+                              FROM AggregateWatermarks
+                              WHERE username = ?""", (username,)).fetchone()
+        ops_seen, green_seen = mark if mark else (0, 0)
+        new_ops = raw_ops[ops_seen:]
+        new_green = raw_green[green_seen:]
+
+        # [co2_emitted, co2_saved, operations, green_actions] per (scope, subject, granularity, period)
+        deltas = defaultdict(lambda: [0, 0, 0, 0])
+        for _, _, timestamp, co2 in new_ops:
+            for granularity, period in period_keys(timestamp):
+                for scope, subject in (('USER', username), ('ROLE', role)):
+                    delta = deltas[(scope, subject, granularity, period)]
+                    delta[0] += co2
+                    delta[2] += 1
+        for _, timestamp, co2_saved in new_green:
+            for granularity, period in period_keys(timestamp):
+                for scope, subject in (('USER', username), ('ROLE', role)):
+                    delta = deltas[(scope, subject, granularity, period)]
+                    delta[1] += co2_saved
+                    delta[3] += 1
+
+        cur.executemany("""
+            INSERT INTO Co2Aggregates (scope, subject, granularity, period, co2_emitted, co2_saved, operations, green_actions)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(scope, subject, granularity, period) DO UPDATE SET
+                co2_emitted = co2_emitted + excluded.co2_emitted,
+                co2_saved = co2_saved + excluded.co2_saved,
+                operations = operations + excluded.operations,
+                green_actions = green_actions + excluded.green_actions
+        """, [key + tuple(values) for key, values in deltas.items()])
+
+        cur.execute("""
+            INSERT INTO AggregateWatermarks (username, operations_seen, green_actions_seen, updated_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(username) DO UPDATE SET
+                operations_seen = MAX(operations_seen, excluded.operations_seen),
+                green_actions_seen = MAX(green_actions_seen, excluded.green_actions_seen),
+                updated_at = excluded.updated_at
+        """, (username, len(raw_ops), len(raw_green), datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return len(new_ops) + len(new_green)
+
+
+def get_aggregates(conn, scope, subject, granularity, start_period=None, end_period=None):
+    """
+    Reads precomputed aggregate rows for a user or a role, in chronological order.
+
+    Args:
+        conn (sqlite3.Connection): The database connection.
+        scope (str): 'USER' or 'ROLE'.
+        subject (str): The username or the role.
+        granularity (str): 'DAY', 'WEEK' or 'MONTH'.
+        start_period (str, optional): First period key to include.
+        end_period (str, optional): Last period key to include.
+
+    Returns:
+        list: Tuples (period, co2_emitted, co2_saved, net co2, operations, green_actions).
+    """
+    return conn.execute("""
+        SELECT period, co2_emitted, co2_saved, co2_emitted - co2_saved, operations, green_actions
+        FROM Co2Aggregates
+        WHERE scope = ? AND subject = ? AND granularity = ?
+        AND period >= COALESCE(?, period)
+        AND period <= COALESCE(?, period)
+        ORDER BY period
+    """, (scope, subject, granularity, start_period, end_period)).fetchall()
@@ -0,0 +1,206 @@
+"""
+This module provides the asyncio-facing data-access layer.
+AsyncDatabaseOperations mirrors the methods of DatabaseOperations as coroutines. Every call runs
+on a bounded pool of worker threads; each worker owns its own DatabaseOperations instance and,
+through database/connection.py, its own SQLite connection, so queries never share a cursor and
+the event loop stays free to serve other sessions or wait on RPC calls in the meantime.
+"""
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config import config
+from database.database_operation import DatabaseOperations
+
+
+class AsyncDatabaseOperations:
+    """
+    Awaitable repository API over DatabaseOperations, backed by a bounded pool of per-thread connections.
+    """
+
+    def __init__(self, pool_size=None):
+        """
+        Args:
+            pool_size (int, optional): Number of worker threads, and so of SQLite connections;
+                defaults to storage.pool_size in the configuration.
+        """
+        if pool_size is None:
+            pool_size = (config.config.get("storage") or {}).get("pool_size", 4)
+        self.pool_size = int(pool_size)
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="sfs-db")
+
+    def _get_ops(self):
+        """
+        Returns the DatabaseOperations bound to the calling worker thread, creating it on first use.
+        """
+        ops = getattr(self._local, "ops", None)
+        if ops is None:
+            ops = DatabaseOperations()
+            self._local.ops = ops
+        return ops
+
+    def _call(self, method_name, args, kwargs):
+        return getattr(self._get_ops(), method_name)(*args, **kwargs)
+
+    async def run(self, method_name, *args, **kwargs):
+        """
+        Runs any DatabaseOperations method on the pool and awaits its result.
+
+        Args:
+            method_name (str): The name of the DatabaseOperations method.
+            *args, **kwargs: Arguments passed to the method.
+
+        Returns:
+            The value returned by the method.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(self._call, method_name, args, kwargs))
+
+    async def call(self, func, *args, **kwargs):
+        """
+        Runs any blocking function on the pool, e.g. a call of the SQLite session store, and awaits its result.
+        The function gets the per-thread connection of the worker it runs on through get_connection().
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def close(self):
+        """
+        Shuts the pool down, waiting for running calls to finish. The per-thread connections are
+        released together with their worker threads.
+        """
+        await asyncio.get_running_loop().run_in_executor(None, self._executor.shutdown, True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    # Login lookups
+
+    async def authenticate(self, username, password, public_key, private_key):
+        return await self.run("authenticate", username, password, public_key, private_key)
+
+    async def authenticate_password(self, username, password):
+        return await self.run("authenticate_password", username, password)
+
+    async def check_credentials(self, username, password, public_key, private_key):
+        return await self.run("check_credentials", username, password, public_key, private_key)
+
+    async def check_passwd(self, username, password):
+        return await self.run("check_passwd", username, password)
+
+    async def get_creds_by_username(self, username):
+        return await self.run("get_creds_by_username", username)
+
+    async def get_user_by_username(self, username):
+        return await self.run("get_user_by_username", username)
+
+    async def get_role_by_username(self, username):
+        return await self.run("get_role_by_username", username)
+
+    async def get_public_key_by_username(self, username):
+        return await self.run("get_public_key_by_username", username)
+
+    async def key_exists(self, public_key, private_key):
+        return await self.run("key_exists", public_key, private_key)
+
+    # Registration and profile
+
+    async def register_user(self, username, name, lastname, user_role, birthday, email, phone, company_name, hash_password, public_key, private_key):
+        return await self.run("register_user", username, name, lastname, user_role, birthday, email, phone,
+                              company_name, hash_password, public_key, private_key)
+
+    async def check_username(self, username):
+        return await self.run("check_username", username)
+
+    async def check_unique_email(self, email):
+        return await self.run("check_unique_email", email)
+
+    async def check_unique_phone_number(self, phone):
+        return await self.run("check_unique_phone_number", phone)
+
+    async def update_user_profile(self, username, name, lastname, birthday, phone):
+        return await self.run("update_user_profile", username, name, lastname, birthday, phone)
+
+    async def change_passwd(self, username, old_pass, new_pass):
+        return await self.run("change_passwd", username, old_pass, new_pass)
+
+    # Reports
+
+    async def insert_report(self, creation_date, username, start_date, end_date):
+        return await self.run("insert_report", creation_date, username, start_date, end_date)
+
+    async def get_report_by_username(self, username):
+        return await self.run("get_report_by_username", username)
+
+    async def get_report_by_date(self, username, creation_date):
+        return await self.run("get_report_by_date", username, creation_date)
+
+    async def get_report_lines(self, id_report):
+        return await self.run("get_report_lines", id_report)
+
+    async def get_co2_totals_by_action_type(self, username, start_date=None, end_date=None):
+        return await self.run("get_co2_totals_by_action_type", username, start_date, end_date)
+
+    async def get_co2_aggregates(self, scope, subject, granularity, start_period=None, end_period=None):
+        return await self.run("get_co2_aggregates", scope, subject, granularity, start_period, end_period)
+
+    async def refresh_co2_aggregates(self, username):
+        return await self.run("refresh_co2_aggregates", username)
+
+    async def refresh_role_co2_aggregates(self, role):
+        return await self.run("refresh_role_co2_aggregates", role)
+
+    async def get_top_credit_holders(self, k=10, role=None, company_name=None, exclude_username=None):
+        return await self.run("get_top_credit_holders", k, role, company_name, exclude_username)
+
+    async def refresh_credit_balances(self):
+        return await self.run("refresh_credit_balances")
+
+    # Paginated streams: each page is one pool call, so no cursor outlives a worker call.
+
+    async def iter_report_pages(self, username, page_size=50):
+        """
+        Async counterpart of DatabaseOperations.iter_report_pages.
+        """
+        last_key = ("", 0)
+        while True:
+            page = await self.run("get_report_page", username, last_key, page_size)
+            if not page:
+                return
+            yield page
+            if len(page) < page_size:
+                return
+            last_key = (page[-1].get_creation_date(), page[-1].get_id_report())
+
+    async def iter_report_date_pages(self, username, page_size=20):
+        """
+        Async counterpart of DatabaseOperations.iter_report_date_pages.
+        """
+        last_date = ""
+        while True:
+            page = await self.run("get_report_date_page", username, last_date, page_size)
+            if not page:
+                return
+            yield page
+            if len(page) < page_size:
+                return
+            last_date = page[-1]
+
+    async def iter_user_pages(self, page_size=50):
+        """
+        Async counterpart of DatabaseOperations.iter_user_pages.
+        """
+        last_username = ""
+        while True:
+            page = await self.run("get_user_page", last_username, page_size)
+            if not page:
+                return
+            yield page
+            if len(page) < page_size:
+                return
+            last_username = page[-1].get_username()
@@ -0,0 +1,155 @@
+"""
+This module provides the shared SQLite connection layer used by every component that accesses the database.
+Each thread gets exactly one connection to the configured database file, which is reused by all
+DatabaseOperations instances and models living on that thread. When metrics are enabled the
+connections time every SQL statement (see monitoring/metrics.py). The pragmas listed in the
+'storage' section of configuration.yml are applied to every connection when it is opened.
+"""
+
+import functools
+import sqlite3
+import threading
+import time
+from config import config
+from monitoring.metrics import metrics, SQL
+
+
+_local = threading.local()
+
+# Pragmas that can be set from the 'storage' section, with the values each one accepts.
+_PRAGMAS = {
+    "journal_mode": ("DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"),
+    "synchronous": ("OFF", "NORMAL", "FULL", "EXTRA"),
+    "cache_size": int,
+    "mmap_size": int,
+    "busy_timeout": int,
+    "temp_store": ("DEFAULT", "FILE", "MEMORY"),
+}
+
+
+def _pragma_value(name, value):
+    """
+    Validates a pragma value read from the configuration and returns it in SQL form.
+
+    Raises:
+        ValueError: If the value is not accepted by the pragma.
+    """
+    allowed = _PRAGMAS[name]
+    if allowed is int:
+        return str(int(value))
+    value = str(value).upper()
+    if value not in allowed:
+        raise ValueError(f"Invalid value '{value}' for storage.{name}; expected one of {', '.join(allowed)}")
+    return value
+
+
+@functools.lru_cache(maxsize=1024)
+def _statement_label(sql):
+    """
+    Returns the metrics label of a statement: its text on one line, cut at 120 characters.
+    """
+    label = ' '.join(sql.split())
+    return label if len(label) <= 120 else label[:117] + '...'
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """
+    Cursor that records the execution time of every statement in the metrics registry.
+    """
+
+    def _timed(self, run, sql, *args):
+        start = time.perf_counter()
+        try:
+            return run(sql, *args)
+        except Exception:
+            metrics.inc('sfs_sql_errors_total', _statement_label(sql))
+            raise
+        finally:
+            metrics.observe(SQL, time.perf_counter() - start, _statement_label(sql))
+
+    def execute(self, sql, parameters=()):
+        return self._timed(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._timed(super().executemany, sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self._timed(super().executescript, sql_script)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """
+    Connection whose cursors, including the ones behind Connection.execute, are InstrumentedCursor.
+    """
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+
+def apply_pragmas(conn, storage=None):
+    """
+    Applies the configured storage pragmas to a connection.
+
+    Args:
+        conn (sqlite3.Connection): The connection to configure.
+        storage (dict, optional): Pragma settings; defaults to the 'storage' section of the configuration.
+    """
+    if storage is None:
+        storage = config.config.get("storage") or {}
+    for name in _PRAGMAS:
+        if name in storage:
+            conn.execute(f"PRAGMA {name} = {_pragma_value(name, storage[name])}")
+
+
+def open_connection(db_path=None):
+    """
+    Opens a new, configured connection to the database.
+    Most code should use get_connection() instead; this is meant for dedicated connections.
+
+    Args:
+        db_path (str, optional): Database file; defaults to the configured db_path.
+
+    Returns:
+        sqlite3.Connection: The new connection.
+    """
+    conn = sqlite3.connect(db_path or config.config["db_path"],
+                           factory=InstrumentedConnection if metrics.enabled else sqlite3.Connection)
+    # Only takes effect on a new, empty file, and has to precede journal_mode, which writes the header;
+    # existing databases keep their mode until `archive --full-vacuum` switches them.
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    apply_pragmas(conn)
+    return conn
+
+
+def get_connection():
+    """
+    Returns the connection bound to the calling thread, opening it on first use.
+
+    Returns:
+        sqlite3.Connection: The shared connection for the current thread.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = open_connection()
+        _local.conn = conn
+    return conn
+
+
+def close_connection():
+    """
+    Closes the connection bound to the calling thread, if any.
+    The next call to get_connection() on this thread opens a fresh one.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
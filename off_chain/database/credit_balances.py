@@ -0,0 +1,119 @@
+"""
+This module maintains the CreditBalances snapshot: one row per registered user with the user's
+token balance, role and company, indexed by balance so the top credit holders can be read
+without touching the chain. The snapshot is refreshed incrementally: the ERC20 Transfer events
+since the last synced block tell which addresses changed, and only those balances are re-read.
+"""
+
+import datetime
+
+
+SYNC_NAME = 'credit_balances'
+
+
+def get_synced_block(conn, name=SYNC_NAME):
+    """
+    Returns the last block a chain-derived table was synced to, or None if it never was.
+    """
+    row = conn.execute("SELECT block_number FROM SyncState WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else None
+
+
+def refresh_balances(conn, chain, batch_size=100):
+    """
+    Brings the snapshot up to date with the chain.
+    Users missing from the snapshot and users whose address appears in a Transfer event since the
+    last synced block have their balance re-read, in batches, at the latest block.
+
+    Args:
+        conn (sqlite3.Connection): The database connection.
+        chain (ActionController): The chain client used for the event and balance reads.
+        batch_size (int): The number of balances read per JSON-RPC batch.
+
+    Returns:
+        int: The number of refreshed users.
+    """
+    latest_block = chain.get_block_number()
+    synced_block = get_synced_block(conn)
+
+    users = conn.execute("""
+        SELECT c.username, c.public_key, c.role, u.company_name
+        FROM Credentials c
+        JOIN Users u ON u.username = c.username
+        WHERE c.username NOT IN (SELECT username FROM CreditBalances)
+    """).fetchall()
+
+    if synced_block is not None and synced_block < latest_block:
+        changed = list(chain.get_token_transfer_addresses(synced_block + 1, latest_block))
+        for start in range(0, len(changed), 500):
+            # Keys are stored in checksum form, as the events report them; the lowercase spelling
+            # still matches the rows the checksum migration had to leave alone.
+            chunk = changed[start:start + 500]
+            chunk += [address.lower() for address in chunk]
+            users += conn.execute(f"""
+                SELECT c.username, c.public_key, c.role, u.company_name
+                FROM Credentials c
+                JOIN Users u ON u.username = c.username
+                WHERE c.public_key IN ({', '.join('?' * len(chunk))})
+            """, chunk).fetchall()
+
+    now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    rows = []
+    for start in range(0, len(users), batch_size):
+        batch = users[start:start + batch_size]
+        balances = chain.balances_of([user[1] for user in batch], block_identifier=latest_block)
+        for (username, public_key, role, company_name), balance in zip(batch, balances):
+            rows.append((username, public_key, role, company_name, balance, latest_block, now))
+
+    cur = conn.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        cur.executemany("""
+            INSERT INTO CreditBalances (username, public_key, role, company_name, balance, block_number, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(username) DO UPDATE SET
+                public_key = excluded.public_key,
+                role = excluded.role,
+                company_name = excluded.company_name,
+                balance = excluded.balance,
+                block_number = excluded.block_number,
+                updated_at = excluded.updated_at
+            WHERE excluded.block_number >= CreditBalances.block_number
+        """, rows)
+        cur.execute("""
+            INSERT INTO SyncState (name, block_number) VALUES (?, ?)
+            ON CONFLICT(name) DO UPDATE SET block_number = MAX(block_number, excluded.block_number)
+        """, (SYNC_NAME, latest_block))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return len(rows)
+
+
+def get_top_holders(conn, k=10, role=None, company_name=None, exclude_username=None):
+    """
+    Returns the k users with the highest positive balance, optionally filtered by role and/or company.
+    Served by the (balance), (role, balance) and (company_name, balance) indexes.
+
+    Returns:
+        list: Tuples (username, email, role, company_name, balance), highest balance first.
+    """
+    conditions, params = ["b.balance > 0"], []
+    if role is not None:
+        conditions.append("b.role = ?")
+        params.append(role)
+    if company_name is not None:
+        conditions.append("b.company_name = ?")
+        params.append(company_name)
+    if exclude_username is not None:
+        conditions.append("b.username != ?")
+        params.append(exclude_username)
+    return conn.execute(f"""
+        SELECT b.username, u.email, b.role, b.company_name, b.balance
+        FROM CreditBalances b
+        JOIN Users u ON u.username = b.username
+        WHERE {' AND '.join(conditions)}
+        ORDER BY b.balance DESC
+        LIMIT ?
+    """, (*params, k)).fetchall()
@@ -0,0 +1,157 @@
+"""
+This module holds the password hashing and private key encryption primitives used for the credentials.
+They are plain module-level functions with no database state, so they can also run in a process pool
+(bulk onboarding hashes thousands of passwords at once).
+"""
+
+import os
+import time
+import hmac
+import hashlib
+import base64
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from cryptography.fernet import Fernet
+from monitoring.metrics import metrics, CRYPTO
+
+
+def scrypt_maxmem(n, r, p):
+    """
+    Returns the memory limit scrypt needs for the given parameters (128 * r * (n + p + 2) bytes, plus slack).
+    OpenSSL refuses anything above 32 MiB unless the limit is raised explicitly.
+    """
+    return 128 * r * (n + p + 2) + 1024 * 1024
+
+
+def _scrypt(password, salt, n, r, p, dklen):
+    return hashlib.scrypt(password, salt=salt, n=n, r=r, p=p, dklen=dklen, maxmem=scrypt_maxmem(n, r, p))
+
+
+@metrics.timed(CRYPTO, 'scrypt_hash')
+def hash_password(password, n, r, p, dklen):
+    """
+    Hashes a password with scrypt and a random salt.
+
+    Args:
+        password (str): The password to hash.
+        n (int): CPU/Memory cost factor.
+        r (int): Block size.
+        p (int): Parallelization factor.
+        dklen (int): Length of the derived key.
+
+    Returns:
+        str: The hash and the parameters used, in the form digest$salt$n$r$p$dklen.
+    """
+    salt = os.urandom(16)
+    digest = _scrypt(password.encode(), salt, n, r, p, dklen)
+    return f"{digest.hex()}${salt.hex()}${n}${r}${p}${dklen}"
+
+
+@metrics.timed(CRYPTO, 'scrypt_verify')
+def verify_password(password, saved_hash):
+    """
+    Checks a password against a hash produced by hash_password, using the parameters stored in the hash.
+
+    Returns:
+        bool: True if the password matches.
+    """
+    params = saved_hash.split('$')
+    digest = _scrypt(password.encode('utf-8'), bytes.fromhex(params[1]),
+                     int(params[2]), int(params[3]), int(params[4]), int(params[5]))
+    return hmac.compare_digest(digest.hex(), params[0])
+
+
+def needs_rehash(saved_hash, n, r, p, dklen):
+    """
+    Tells whether a hash was produced with parameters other than the current ones.
+    """
+    return [int(param) for param in saved_hash.split('$')[2:6]] != [n, r, p, dklen]
+
+
+def _fernet(passwd):
+    passwd_hash = hashlib.sha256(passwd.encode('utf-8')).digest()
+    return Fernet(base64.urlsafe_b64encode(passwd_hash))
+
+
+@metrics.timed(CRYPTO, 'fernet_encrypt')
+def encrypt_private_key(private_key, passwd):
+    """
+    Encrypts a private key with a key derived from the password.
+
+    Returns:
+        bytes: The encrypted private key.
+    """
+    return _fernet(passwd).encrypt(private_key.encode('utf-8'))
+
+
+@metrics.timed(CRYPTO, 'fernet_decrypt')
+def decrypt_private_key(encrypted_private_k, passwd):
+    """
+    Decrypts a private key encrypted by encrypt_private_key.
+
+    Returns:
+        str: The private key.
+    """
+    return _fernet(passwd).decrypt(encrypted_private_k.decode('utf-8')).decode('utf-8')
+
+
+def protect_credentials(password, private_key, n, r, p, dklen):
+    """
+    Hashes the password and encrypts the private key of one user. Top-level so a process pool can pickle it.
+
+    Returns:
+        tuple: (password hash, encrypted private key).
+    """
+    return hash_password(password, n, r, p, dklen), encrypt_private_key(private_key, password)
+
+
+def measure_verify_latency(n, r, p, dklen, concurrency=1, rounds=3):
+    """
+    Measures how long one password verification takes while `concurrency` verifications run at once,
+    as happens with simultaneous logins.
+
+    Returns:
+        tuple: (median, worst) latency in milliseconds over all the verifications.
+    """
+    saved_hash = hash_password('calibration', n, r, p, dklen)
+
+    def timed_verify(_):
+        start = time.perf_counter()
+        verify_password('calibration', saved_hash)
+        return (time.perf_counter() - start) * 1000
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(timed_verify, range(concurrency * rounds)))
+    return statistics.median(samples), max(samples)
+
+
+def calibrate(target_ms, r=8, p=1, dklen=64, concurrency=1, max_memory=256 * 1024 * 1024, on_step=None):
+    """
+    Picks the largest scrypt cost factor n (a power of two) whose median verify latency stays within
+    the target, measured under the given number of concurrent verifications.
+
+    Args:
+        target_ms (float): The latency budget of one verification, in milliseconds.
+        r (int): Block size.
+        p (int): Parallelization factor.
+        dklen (int): Length of the derived key.
+        concurrency (int): Number of verifications running at the same time during the measurement.
+        max_memory (int): Upper bound, in bytes, for the memory one verification may use.
+        on_step (callable, optional): Called as on_step(n, median_ms, worst_ms) for every measured n.
+
+    Returns:
+        dict: The chosen parameters (n, r, p, dklen) and their measured median_ms and worst_ms.
+    """
+    n = 2 ** 10
+    chosen = None
+    while scrypt_maxmem(n, r, p) <= max_memory:
+        median_ms, worst_ms = measure_verify_latency(n, r, p, dklen, concurrency)
+        if on_step:
+            on_step(n, median_ms, worst_ms)
+        if median_ms > target_ms and chosen is not None:
+            break
+        chosen = {'n': n, 'r': r, 'p': p, 'dklen': dklen, 'median_ms': median_ms, 'worst_ms': worst_ms}
+        if median_ms > target_ms:
+            break
+        n *= 2
+    return chosen
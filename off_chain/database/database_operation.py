@@ -5,78 +5,59 @@ It manages the creation, update, and retrieval of user data through a series of
 
 import datetime
 import sqlite3
-import os
-import hashlib
-import base64
-from cryptography.fernet import Fernet
 from colorama import init, Fore, Style
 init(strip=False, convert=False)
 from config import config
+from database.connection import get_connection
+from database.migrations import ensure_unique_indexes, run_migrations
+from database import aggregates
+from database import credit_balances
+from database import crypto
+from database import export
+from database import search
+from database import retention
 from models.users import User
 from models.credentials import Credentials
 from models.report import Report
+from models.report_line import ReportLine
 from collections import defaultdict
 import datetime
-from singleton.action_controller_instance import action_controller_instance as act_controller 
+from singleton.services import services
 from types import SimpleNamespace
+from eth_utils import is_address, to_checksum_address
+
+
+def _checksum_address(address):
+    """
+    Returns an address in checksum form, the only spelling web3 accepts in contract calls;
+    a value that is not an address is returned unchanged.
+    """
+    return to_checksum_address(address) if is_address(address) else address
 
 
 class DatabaseOperations:
     """
     Handles all interactions with the database for user data manipulation and retrieval.
-    This class manages the connection to the database and executes SQL queries to manage the data.
+    This class uses the shared per-thread connection and executes SQL queries to manage the data.
     """
     
 
     def __init__(self):
         """
-        Initializes the database connection and cursor, and creates new tables if they do not exist.
+        Binds to the shared database connection, opens a cursor, and applies any pending schema migration.
+        Registration columns whose UNIQUE index cannot be created yet are checked by the registration itself.
         """
-        self.conn = sqlite3.connect(config.config["db_path"])
+        self.conn = get_connection()
         self.cur = self.conn.cursor()
-        self._create_new_table()
-        self.n_param = 2
-        self.r_param = 8
-        self.p_param = 1
-        self.dklen_param = 64
+        run_migrations(self.conn)
+        self.unenforced_unique = ensure_unique_indexes(self.conn)
+        kdf = config.config.get("kdf") or {}
+        self.n_param = int(kdf.get("n", 16384))
+        self.r_param = int(kdf.get("r", 8))
+        self.p_param = int(kdf.get("p", 1))
+        self.dklen_param = int(kdf.get("dklen", 64))
         self.today_date = datetime.date.today().strftime('%Y-%m-%d')
 
-    def _create_new_table(self):
-        """
-        Creates necessary tables in the database if they are not already present.
-        This ensures that the database schema is prepared before any operations are performed.
-        """
-        self.cur.execute('''CREATE TABLE IF NOT EXISTS Credentials(
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    username TEXT NOT NULL,
-                    hash_password TEXT NOT NULL,
-                    role TEXT CHECK(role IN ('FARMER', 'CARRIER', 'PRODUCER', 'SELLER')) NOT NULL,
-                    public_key TEXT NOT NULL,
-                    private_key TEXT NOT NULL
-                    );''')
-        self.cur.execute('''CREATE TABLE IF NOT EXISTS Users(
-                    username TEXT NOT NULL,
-                    name TEXT NOT NULL,
-                    lastname TEXT NOT NULL,
-                    birthday DATE NOT NULL,
-                    user_role TEXT CHECK(user_role IN ('FARMER', 'CARRIER', 'PRODUCER', 'SELLER')) NOT NULL,
-                    email TEXT NOT NULL,
-                    phone TEXT,
-                    company_name TEXT,
-                    FOREIGN KEY(username) REFERENCES Credentials(username)
-                    );''')
-        self.cur.execute('''CREATE TABLE IF NOT EXISTS Reports(
-                    id_report INTEGER PRIMARY KEY AUTOINCREMENT,
-                    creation_date TEXT NOT NULL,
-                    operation_date DATE NOT NULL,
-                    username TEXT NOT NULL,
-                    role TEXT CHECK(role IN ('FARMER', 'CARRIER', 'PRODUCER', 'SELLER')) NOT NULL,
-                    operations TEXT NOT NULL,
-                    co2 INTEGER NOT NULL
-                    );''')
-        self.conn.commit()
-    
-    
     def register_user(self, username, name, lastname, user_role, birthday, email, phone, company_name, hash_password, public_key, private_key):
         """
         Registers a new user into the Users and Credentials table in the database.
@@ -89,20 +70,25 @@ class DatabaseOperations:
             birthday : The birth date of the user in YYYY-MM-DD format.
             email : The email address of the user.
             hash_password : The password of the user, which will be hashed before storage.
-            public_key : The public key of the user, used for encryption and identification.
+            public_key : The address of the user's wallet, stored in checksum form.
             private_key : The private key of the user, which will be encrypted before storage.
             company_name : The name of the company associated with the user, if applicable.
             phone : The phone number of the user.
 
         Returns:
-            int: 0 if the insertion was successful, -1 if an integrity error occurred (e.g., duplicate username).
+            int: 0 if the insertion was successful, -2 if the username is taken, -3 if the email is taken,
+                 -4 if the phone number is taken, -5 if the public key is already registered,
+                 -1 for any other integrity error.
         """
+        public_key = _checksum_address(public_key)
         try:
-            if self.check_username(username) != 0:
-                return -2  
             obfuscated_private_k = self.encrypt_private_k(private_key, hash_password)
             hashed_passwd = self.hash_function(hash_password)
-            self.conn.execute("BEGIN")
+            self.conn.execute("BEGIN IMMEDIATE")
+            code = self._taken_code(username, email, phone, public_key)
+            if code != 0:
+                self.conn.rollback()
+                return code
 
             self.cur.execute("""
                             INSERT INTO Credentials
@@ -126,9 +112,126 @@ class DatabaseOperations:
             self.conn.commit()
             return 0
         except sqlite3.IntegrityError as e:
-            print(f"Integrity error: {e}")
             self.conn.rollback()
+            code = self._unique_violation_code(e)
+            if code == -1:
+                print(f"Integrity error: {e}")
+            return code
+
+    def unregister_user(self, username):
+        """
+        Removes a user just registered with register_user from the Users and Credentials tables,
+        e.g. when the on-chain registration that follows it fails.
+
+        Args:
+            username : Username of the user.
+
+        Returns:
+            int: 0 if the user was removed, -1 if an internal error occurred.
+        """
+        try:
+            self.conn.execute("BEGIN")
+            self.cur.execute("DELETE FROM Users WHERE username = ?", (username,))
+            self.cur.execute("DELETE FROM Credentials WHERE username = ?", (username,))
+            self.conn.commit()
+            return 0
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            print(Fore.RED + f'Internal error while removing the user: {str(e)}' + Style.RESET_ALL)
             return -1
+
+    def _taken_code(self, username, email, phone, public_key):
+        """
+        Checks a new user against the registration columns that have no UNIQUE index (see
+        ensure_unique_indexes), inside the caller's write transaction.
+
+        Returns:
+            int: 0 if no such column holds the value already, otherwise the registration code of the first one that does.
+        """
+        values = {'username': username, 'email': email, 'phone': phone, 'public_key': public_key}
+        for table, column, code in self.unenforced_unique:
+            if self.cur.execute(f"SELECT 1 FROM {table} WHERE {column} = ? LIMIT 1", (values[column],)).fetchone():
+                return code
+        return 0
+
+    def _unique_violation_code(self, error):
+        """
+        Maps a UNIQUE constraint violation raised during registration to a registration code.
+
+        Args:
+            error (sqlite3.IntegrityError): The error raised by the insert.
+
+        Returns:
+            int: -2 for the username, -3 for the email, -4 for the phone number, -5 for the public key,
+                 -1 if the error is not a known unique violation.
+        """
+        message = str(error)
+        if "Credentials.username" in message or "Users.username" in message:
+            return -2
+        if "Users.email" in message:
+            return -3
+        if "Users.phone" in message:
+            return -4
+        if "Credentials.public_key" in message:
+            return -5
+        return -1
+
+    def register_users_bulk(self, users):
+        """
+        Registers many users whose password is already hashed and private key already encrypted.
+        All rows are inserted with executemany in a single transaction. If any row violates a
+        constraint the whole batch is rolled back and the rows are inserted one by one instead,
+        each behind its own savepoint, so every valid row is still stored and every invalid one
+        gets its own code. While a registration column has no UNIQUE index the rows always go
+        one by one, each checked against that column first.
+
+        Args:
+            users (list): Tuples (username, name, lastname, user_role, birthday, email, phone,
+                          company_name, hashed_password, public_key, encrypted_private_key).
+                          The public keys are stored in checksum form.
+
+        Returns:
+            list: One registration code per user, in input order (same codes as register_user).
+        """
+        credentials = [(u[0], u[8], u[3], _checksum_address(u[9]), u[10]) for u in users]
+        profiles = [u[:8] for u in users]
+        insert_credentials = """INSERT INTO Credentials
+                                (username, hash_password, role, public_key, private_key) VALUES (?, ?, ?, ?, ?)"""
+        insert_user = """INSERT INTO Users
+                         (username, name, lastname, user_role, birthday, email, phone, company_name)
+                         VALUES (?, ?, ?, ?, ?, ?, ?, ?)"""
+        if not self.unenforced_unique:
+            try:
+                self.conn.execute("BEGIN")
+                self.cur.executemany(insert_credentials, credentials)
+                self.cur.executemany(insert_user, profiles)
+                self.conn.commit()
+                return [0] * len(users)
+            except sqlite3.IntegrityError:
+                self.conn.rollback()
+
+        codes = []
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            for credential, profile in zip(credentials, profiles):
+                code = self._taken_code(profile[0], profile[5], profile[6], credential[3])
+                if code != 0:
+                    codes.append(code)
+                    continue
+                self.cur.execute("SAVEPOINT bulk_user")
+                try:
+                    self.cur.execute(insert_credentials, credential)
+                    self.cur.execute(insert_user, profile)
+                    codes.append(0)
+                except sqlite3.IntegrityError as e:
+                    self.cur.execute("ROLLBACK TO bulk_user")
+                    codes.append(self._unique_violation_code(e))
+                self.cur.execute("RELEASE bulk_user")
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        return codes
     
     def update_user_profile(self, username, name, lastname, birthday, phone):
         """
@@ -197,11 +300,7 @@ class DatabaseOperations:
             bytes: The encrypted private key.
         """
 
-        passwd_hash = hashlib.sha256(passwd.encode('utf-8')).digest()
-        key = base64.urlsafe_b64encode(passwd_hash)
-        cipher_suite = Fernet(key)
-        ciphertext = cipher_suite.encrypt(private_key.encode('utf-8'))
-        return ciphertext
+        return crypto.encrypt_private_key(private_key, passwd)
         
     def decrypt_private_k(self, encrypted_private_k, passwd):
         """
@@ -215,11 +314,7 @@ class DatabaseOperations:
             str: The decrypted private key.
         """
 
-        passwd_hash = hashlib.sha256(passwd.encode('utf-8')).digest()
-        key = base64.urlsafe_b64encode(passwd_hash)
-        cipher_suite = Fernet(key)
-        plaintext = cipher_suite.decrypt(encrypted_private_k.decode('utf-8'))
-        return plaintext.decode('utf-8')
+        return crypto.decrypt_private_key(encrypted_private_k, passwd)
     
     def check_unique_email(self, email):
         """
@@ -254,7 +349,7 @@ class DatabaseOperations:
         """
         try:
             query = "SELECT public_key, private_key FROM Credentials WHERE public_key=? OR private_key=?"
-            existing_users = self.cur.execute(query, (public_key, private_key)).fetchall()
+            existing_users = self.cur.execute(query, (_checksum_address(public_key), private_key)).fetchall()
             return len(existing_users) > 0
         except Exception as e:
             print(Fore.RED + f"An error occurred: {e}" + Style.RESET_ALL)
@@ -272,6 +367,72 @@ class DatabaseOperations:
 
         return None
 
+    def refresh_credit_balances(self):
+        """
+        Updates the credit balance snapshot with the balances that changed on chain since the last refresh.
+
+        Returns:
+            int: The number of refreshed users.
+        """
+        return credit_balances.refresh_balances(self.conn, services.chain)
+
+    def get_top_credit_holders(self, k=10, role=None, company_name=None, exclude_username=None):
+        """
+        Retrieves the users holding the most credits from the balance snapshot.
+
+        Args:
+            k (int): Maximum number of users to return.
+            role (str, optional): Only return users with this role.
+            company_name (str, optional): Only return users of this company.
+            exclude_username (str, optional): A user to leave out (usually the one asking).
+
+        Returns:
+            list: Tuples (username, email, role, company_name, balance), highest balance first.
+        """
+        return credit_balances.get_top_holders(self.conn, k, role, company_name, exclude_username)
+
+    def get_user_page(self, after_username="", page_size=50):
+        """
+        Retrieves one page of the Users table, ordered by username.
+        Keyset pagination on the username index: the page starts right after the given username,
+        so every page costs the same no matter how far into the table it is.
+
+        Args:
+            after_username (str): The last username of the previous page ("" for the first page).
+            page_size (int): Maximum number of users per page.
+
+        Returns:
+            list: A list of User objects, empty when there are no more users.
+        """
+        page = self.cur.execute("""
+            SELECT username, name, lastname, user_role, birthday, email, phone, company_name
+            FROM Users
+            WHERE username > ?
+            ORDER BY username
+            LIMIT ?
+        """, (after_username, page_size)).fetchall()
+        return [User(*row) for row in page]
+
+    def iter_user_pages(self, page_size=50):
+        """
+        Streams the Users table one page at a time, ordered by username, holding only one page in memory.
+
+        Args:
+            page_size (int): Maximum number of users per page.
+
+        Yields:
+            list: A non-empty list of User objects.
+        """
+        last_username = ""
+        while True:
+            page = self.get_user_page(last_username, page_size)
+            if not page:
+                return
+            yield page
+            if len(page) < page_size:
+                return
+            last_username = page[-1].get_username()
+
     def get_creds_by_username(self, username):
         """
         Retrieves a user's credentials from the Credentials table based on their username.
@@ -321,11 +482,13 @@ class DatabaseOperations:
             username (str): The username of the user whose actions are to be retrieved.
             start_date (str): The start date of the range in YYYY-MM-DD format.
             end_date (str): The end date of the range in YYYY-MM-DD format.
+
+        Returns:
+            list: One entry per day with the day's line items (action type, description, co2,
+                  green flag, timestamp) and the day's total CO2.
         """ 
         
-        user_address = self.get_public_key_by_username(username)
-        raw_ops = act_controller.contract.functions.getOperations(user_address).call()
-        raw_green = act_controller.contract.functions.getGreenActions(user_address).call()
+        raw_ops, raw_green = self._fetch_user_actions(username)
 
         grouped = defaultdict(list)
 
@@ -335,10 +498,13 @@ class DatabaseOperations:
             date_str = ts.strftime("%Y-%m-%d")
 
             if start_date <= date_str <= end_date:
-                grouped[date_str].append({
-                    "description": f"[{action_type}] {description}",
-                    "co2": co2  
-                })
+                grouped[date_str].append(SimpleNamespace(
+                    action_type=action_type,
+                    description=description,
+                    co2=co2,
+                    is_green=False,
+                    timestamp=timestamp
+                ))
 
         for gop in raw_green:
             description, timestamp, co2 = gop
@@ -346,30 +512,105 @@ class DatabaseOperations:
             date_str = ts.strftime("%Y-%m-%d")
 
             if start_date <= date_str <= end_date:
-                grouped[date_str].append({
-                    "description": f"[GREEN] {description}",
-                    "co2": -co2  
-                })
-
+                grouped[date_str].append(SimpleNamespace(
+                    action_type="GREEN",
+                    description=description,
+                    co2=-co2,
+                    is_green=True,
+                    timestamp=timestamp
+                ))
+
+        role = self.get_role_by_username(username)
+        daily_totals = {row[0]: row[3] for row in aggregates.get_aggregates(self.conn, 'USER', username, 'DAY', start_date, end_date)}
         results = []
-        for date_str, ops in grouped.items():
-            combined_desc = " | ".join(op["description"] for op in ops)
-            total_co2 = sum(op["co2"] for op in ops)
-
+        for date_str, lines in grouped.items():
+            lines.sort(key=lambda line: line.timestamp)
             results.append(SimpleNamespace(
                 creation_date=date_str,
                 username=username,
-                role=self.get_role_by_username(username),  
-                operations=combined_desc,
-                co2=total_co2
+                role=role,
+                lines=lines,
+                co2=daily_totals.get(date_str, sum(line.co2 for line in lines))
             ))
 
         return results
+
+    def _fetch_user_actions(self, username):
+        """
+        Reads the on-chain operations and green actions of a user and folds the ones not seen yet
+        into the CO2 aggregates, so every chain read also keeps the aggregates current.
+
+        Args:
+            username (str): The username of the user.
+
+        Returns:
+            tuple: The raw operations array and the raw green actions array.
+        """
+        user_address = self.get_public_key_by_username(username)
+        raw_ops = services.chain.contract.functions.getOperations(user_address).call()
+        raw_green = services.chain.contract.functions.getGreenActions(user_address).call()
+        aggregates.apply_new_actions(self.conn, username, self.get_role_by_username(username), raw_ops, raw_green)
+        return raw_ops, raw_green
+
+    def refresh_co2_aggregates(self, username):
+        """
+        Brings the CO2 aggregates of a user (and of the user's role) up to date with the chain.
+
+        Args:
+            username (str): The username of the user.
+        """
+        self._fetch_user_actions(username)
+
+    def refresh_role_co2_aggregates(self, role, page_size=100):
+        """
+        Brings the CO2 aggregates of every user of a role, and so the role totals, up to date with the chain.
+        The users are walked with keyset pagination and the histories of each page are read in one batch.
+
+        Args:
+            role (str): The role.
+            page_size (int): Number of users read per page and per JSON-RPC batch.
+
+        Returns:
+            int: The number of newly folded entries.
+        """
+        folded, last_username = 0, ""
+        while True:
+            users = self.cur.execute("""
+                SELECT username, public_key
+                FROM Credentials
+                WHERE role = ? AND username > ?
+                ORDER BY username
+                LIMIT ?
+            """, (role, last_username, page_size)).fetchall()
+            histories = services.chain.histories_of([public_key for _, public_key in users])
+            for (username, _), (raw_ops, raw_green) in zip(users, histories):
+                folded += aggregates.apply_new_actions(self.conn, username, role, raw_ops, raw_green)
+            if len(users) < page_size:
+                return folded
+            last_username = users[-1][0]
+
+    def get_co2_aggregates(self, scope, subject, granularity, start_period=None, end_period=None):
+        """
+        Retrieves precomputed CO2 totals for a user or a role.
+
+        Args:
+            scope (str): 'USER' or 'ROLE'.
+            subject (str): The username or the role.
+            granularity (str): 'DAY', 'WEEK' or 'MONTH'.
+            start_period (str, optional): First period to include ('YYYY-MM-DD', 'YYYY-Www' or 'YYYY-MM').
+            end_period (str, optional): Last period to include.
+
+        Returns:
+            list: Tuples (period, co2_emitted, co2_saved, net co2, operations, green_actions).
+        """
+        return aggregates.get_aggregates(self.conn, scope, subject, granularity, start_period, end_period)
     
         
     def insert_report(self, creation_date, username, start_date, end_date):
         """
         Inserts a report into the Reports table based on the operations performed by a user within a specified date range.
+        Every day of the range becomes one Reports row and each of its operations one ReportLines row;
+        everything is written in a single transaction.
         
         Args:
             creation_date (str): The date when the report is created, in YYYY-MM-DD format.
@@ -388,11 +629,21 @@ class DatabaseOperations:
                 print(Fore.RED + f"No operations found for user {username} between {start_date} and {end_date}." + Style.RESET_ALL)
                 return 0
 
+            self.conn.execute("BEGIN")
+            lines = []
             for op in operations:
                 self.cur.execute("""
                     INSERT INTO Reports (creation_date, operation_date, username, role, operations, co2)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (creation_date, op.creation_date, op.username, op.role, op.operations, op.co2))
+                    VALUES (?, ?, ?, ?, '', ?)
+                """, (creation_date, op.creation_date, op.username, op.role, op.co2))
+                id_report = self.cur.lastrowid
+                lines.extend((id_report, line.action_type, line.description, line.co2, int(line.is_green), line.timestamp)
+                             for line in op.lines)
+
+            self.cur.executemany("""
+                INSERT INTO ReportLines (id_report, action_type, description, co2, is_green, timestamp)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, lines)
             
             self.conn.commit()
             return 1
@@ -407,6 +658,52 @@ class DatabaseOperations:
             print("Integrity error while insert_report_info:", e)
             return -1
 
+    def get_report_lines(self, id_report):
+        """
+        Retrieves the line items of a report, in the order the operations were performed.
+
+        Args:
+            id_report (int): The id of the report.
+
+        Returns:
+            list: A list of ReportLine objects, empty if the report has no lines.
+        """
+        lines = self.cur.execute("""
+                                SELECT id, id_report, action_type, description, co2, is_green, timestamp
+                                FROM ReportLines
+                                WHERE id_report = ?
+                                ORDER BY timestamp, id
+                                """, (id_report,)).fetchall()
+        return [ReportLine(*row) for row in lines]
+
+    def get_co2_totals_by_action_type(self, username, start_date=None, end_date=None):
+        """
+        Computes the CO2 totals of a user's reported operations grouped by action type.
+        When the same day appears in several reports only the most recent report of that day is counted.
+
+        Args:
+            username (str): The username of the user.
+            start_date (str, optional): First operation date to include, in YYYY-MM-DD format.
+            end_date (str, optional): Last operation date to include, in YYYY-MM-DD format.
+
+        Returns:
+            list: Tuples (action_type, is_green, number of operations, total CO2) sorted by total CO2, highest first.
+        """
+        return self.cur.execute("""
+                                SELECT l.action_type, l.is_green, COUNT(*), COALESCE(SUM(l.co2), 0)
+                                FROM ReportLines l
+                                WHERE l.id_report IN (
+                                    SELECT MAX(id_report)
+                                    FROM Reports
+                                    WHERE username = ?
+                                    AND operation_date >= COALESCE(?, operation_date)
+                                    AND operation_date <= COALESCE(?, operation_date)
+                                    GROUP BY operation_date
+                                )
+                                GROUP BY l.action_type, l.is_green
+                                ORDER BY 4 DESC
+                                """, (username, start_date, end_date)).fetchall()
+
         
     def get_report_by_username(self, username):
         """
@@ -446,6 +743,7 @@ class DatabaseOperations:
                                 SELECT id_report, creation_date, operation_date, username, role, operations, co2
                                 FROM Reports
                                 WHERE username = ? AND creation_date = ?
+                                ORDER BY operation_date, id_report
                                 """, (username, creation_date)).fetchall()  
 
         if report_data:
@@ -453,6 +751,232 @@ class DatabaseOperations:
 
         return None
 
+    def get_report_line_page(self, username, creation_date, offset=0, page_size=20):
+        """
+        Retrieves one page of the line items of a user's reports created at the given date, ordered by
+        operation date, report and line timestamp. The order matches the report viewer indexes, so the
+        rows are read in index order and only the requested page is fetched.
+
+        Args:
+            username (str): The username of the user whose reports are to be retrieved.
+            creation_date (str): The creation date of the reports.
+            offset (int): Number of line items before the page.
+            page_size (int): Maximum number of line items per page.
+
+        Returns:
+            list: Tuples (id_report, operation_date, report co2, action_type, description, is_first_line),
+                  where is_first_line is 1 for the first line item of its report.
+        """
+        return self.cur.execute("""
+            SELECT r.id_report, r.operation_date, r.co2, l.action_type, l.description,
+                   l.id = (SELECT first.id FROM ReportLines first
+                           WHERE first.id_report = r.id_report
+                           ORDER BY first.timestamp, first.id
+                           LIMIT 1)
+            FROM Reports r
+            JOIN ReportLines l ON l.id_report = r.id_report
+            WHERE r.username = ? AND r.creation_date = ?
+            ORDER BY r.operation_date, r.id_report, l.timestamp, l.id
+            LIMIT ? OFFSET ?
+        """, (username, creation_date, page_size, offset)).fetchall()
+
+    def count_report_lines(self, username, creation_date):
+        """
+        Counts the line items of a user's reports created at the given date.
+
+        Returns:
+            int: The number of line items.
+        """
+        return self.cur.execute("""
+            SELECT COUNT(*)
+            FROM Reports r
+            JOIN ReportLines l ON l.id_report = r.id_report
+            WHERE r.username = ? AND r.creation_date = ?
+        """, (username, creation_date)).fetchone()[0]
+
+    def get_report_page(self, username, after_key=("", 0), page_size=50):
+        """
+        Retrieves one page of a user's reports, ordered by creation date and id.
+        Keyset pagination on (creation_date, id_report), served by the (username, creation_date) index.
+
+        Args:
+            username (str): The username of the user whose reports are to be retrieved.
+            after_key (tuple): (creation_date, id_report) of the last report of the previous page.
+            page_size (int): Maximum number of reports per page.
+
+        Returns:
+            list: A list of Report objects, empty when there are no more reports.
+        """
+        page = self.cur.execute("""
+            SELECT id_report, creation_date, operation_date, username, role, operations, co2
+            FROM Reports
+            WHERE username = ? AND (creation_date, id_report) > (?, ?)
+            ORDER BY creation_date, id_report
+            LIMIT ?
+        """, (username, *after_key, page_size)).fetchall()
+        return [Report(*row) for row in page]
+
+    def iter_report_pages(self, username, page_size=50):
+        """
+        Streams a user's reports one page at a time, holding only one page in memory.
+
+        Args:
+            username (str): The username of the user whose reports are to be retrieved.
+            page_size (int): Maximum number of reports per page.
+
+        Yields:
+            list: A non-empty list of Report objects.
+        """
+        last_key = ("", 0)
+        while True:
+            page = self.get_report_page(username, last_key, page_size)
+            if not page:
+                return
+            yield page
+            if len(page) < page_size:
+                return
+            last_key = (page[-1].get_creation_date(), page[-1].get_id_report())
+
+    def get_report_date_page(self, username, after_date="", page_size=20):
+        """
+        Retrieves one page of the distinct creation dates of a user's reports, oldest first.
+        Sorting and de-duplication happen in SQL on the (username, creation_date) index.
+
+        Args:
+            username (str): The username of the user whose report dates are to be retrieved.
+            after_date (str): The last date of the previous page ("" for the first page).
+            page_size (int): Maximum number of dates per page.
+
+        Returns:
+            list: A list of creation dates, empty when there are no more dates.
+        """
+        return [row[0] for row in self.cur.execute("""
+            SELECT DISTINCT creation_date
+            FROM Reports
+            WHERE username = ? AND creation_date > ?
+            ORDER BY creation_date
+            LIMIT ?
+        """, (username, after_date, page_size)).fetchall()]
+
+    def iter_report_date_pages(self, username, page_size=20):
+        """
+        Streams the distinct creation dates of a user's reports one page at a time.
+
+        Args:
+            username (str): The username of the user whose report dates are to be retrieved.
+            page_size (int): Maximum number of dates per page.
+
+        Yields:
+            list: A non-empty list of creation dates.
+        """
+        last_date = ""
+        while True:
+            page = self.get_report_date_page(username, last_date, page_size)
+            if not page:
+                return
+            yield page
+            if len(page) < page_size:
+                return
+            last_date = page[-1]
+
+
+    def apply_retention(self, months=None, full_vacuum=False):
+        """
+        Applies the retention policy of the 'retention' configuration section: overlapping reports are
+        deduplicated, reports older than the retention period are moved to compressed archive files,
+        and the freed space is reclaimed with incremental VACUUM.
+
+        Args:
+            months (int, optional): Overrides retention.archive_after_months.
+            full_vacuum (bool): Switch a database created without auto_vacuum to INCREMENTAL mode first,
+                                with a full VACUUM that blocks the other processes while it runs.
+
+        Returns:
+            dict: The number of deduplicated and archived reports, the archive files, the freed pages
+                  and whether the database was switched to INCREMENTAL mode.
+        """
+        policy = config.config.get("retention") or {}
+        return retention.apply_retention(self.conn,
+                                         months if months is not None else int(policy.get("archive_after_months", 12)),
+                                         policy.get("archive_dir", "archive"),
+                                         policy.get("vacuum_pages"), full_vacuum=full_vacuum)
+
+    def get_archived_report_dates(self, username):
+        """
+        Retrieves the distinct creation dates of a user's archived reports.
+
+        Args:
+            username (str): The username of the user.
+
+        Returns:
+            list: The creation dates, oldest first.
+        """
+        return retention.get_archived_report_dates(self.conn, username)
+
+    def get_archived_reports(self, username, creation_date):
+        """
+        Reads a user's archived reports of a creation date back from the archive files.
+
+        Args:
+            username (str): The username of the user.
+            creation_date (str): The creation date of the reports.
+
+        Returns:
+            list: Dicts with id_report, creation_date, operation_date, username, role, co2 and lines
+                  (each line a dict with action_type, description, co2, is_green and timestamp).
+        """
+        return retention.load_archived_reports(self.conn, (config.config.get("retention") or {}).get("archive_dir", "archive"),
+                                               username, creation_date)
+
+    def search_operations(self, text, username=None, page=0, page_size=20):
+        """
+        Full-text search over the operations stored in the reports, best match first.
+
+        Args:
+            text (str): The words to search for; 'word*' searches for a prefix.
+            username (str, optional): Restricts the search to the reports of one user.
+            page (int): Zero-based page number.
+            page_size (int): Maximum number of results per page.
+
+        Returns:
+            list: Tuples (id_report, creation_date, operation_date, username, action_type, description, co2, score).
+        """
+        return search.search_operations(self.conn, text, username, page, page_size)
+
+    def export_reports(self, path, fmt='csv', compression=None, username=None, chunk_size=1000):
+        """
+        Streams every report line item (optionally of one user) to a CSV, JSON Lines or Parquet file.
+
+        Args:
+            path (str): The output file.
+            fmt (str): 'csv', 'jsonl' or 'parquet'.
+            compression (str, optional): 'gzip', 'bz2' or 'xz' (CSV, JSON Lines) or a Parquet codec.
+            username (str, optional): Restricts the export to one user.
+            chunk_size (int): Number of rows read and written at a time.
+
+        Returns:
+            int: The number of exported rows.
+        """
+        return export.export_rows(export.iter_report_rows(self.conn, username, chunk_size), export.REPORT_COLUMNS,
+                                  path, fmt, compression, chunk_size)
+
+    def export_chain_history(self, path, fmt='csv', compression=None, username=None, chunk_size=1000):
+        """
+        Streams the on-chain operations and green actions of every user (optionally of one user),
+        read one user at a time, to a CSV, JSON Lines or Parquet file.
+
+        Args:
+            path (str): The output file.
+            fmt (str): 'csv', 'jsonl' or 'parquet'.
+            compression (str, optional): 'gzip', 'bz2' or 'xz' (CSV, JSON Lines) or a Parquet codec.
+            username (str, optional): Restricts the export to one user.
+            chunk_size (int): Number of rows written at a time.
+
+        Returns:
+            int: The number of exported rows.
+        """
+        return export.export_rows(export.iter_chain_rows(self.conn, services.chain, username), export.CHAIN_COLUMNS,
+                                  path, fmt, compression, chunk_size)
 
     def get_role_by_username(self, username):
         """
@@ -510,18 +1034,80 @@ class DatabaseOperations:
             A string containing the hashed password and the parameters used for hashing.
         """
 
-        salt = os.urandom(16)
-        digest = hashlib.scrypt(
-            password.encode(), 
-            salt = salt,
-            n = self.n_param,
-            r = self.r_param,
-            p = self.p_param,
-            dklen = self.dklen_param
-        )
-        hashed_passwd = f"{digest.hex()}${salt.hex()}${self.n_param}${self.r_param}${self.p_param}${self.dklen_param}"
-        return hashed_passwd
+        return crypto.hash_password(password, self.n_param, self.r_param, self.p_param, self.dklen_param)
  
+    def authenticate(self, username, password, public_key, private_key):
+        """
+        Verifies a user's login credentials with a single lookup of the Credentials row.
+        When the stored password hash was made with outdated KDF parameters, it is replaced
+        by a hash with the current parameters while the plaintext password is at hand.
+
+        Args:
+            username (str): The username of the user whose credentials are being verified.
+            password (str): The password provided by the user for verification.
+            public_key (str): The public key provided by the user for verification.
+            private_key (str): The private key provided by the user for verification.
+
+        Returns:
+            Credentials: The user's credentials if all provided values match the stored ones.
+            None: Otherwise.
+        """
+        row = self.cur.execute("""
+                                SELECT *
+                                FROM Credentials
+                                WHERE username=?""", (username,)).fetchone()
+        if row is None:
+            return None
+        creds = Credentials(*row)
+        if creds.get_public_key() != _checksum_address(public_key) or not crypto.verify_password(password, creds.get_hash_password()):
+            return None
+        try:
+            if private_key != self.decrypt_private_k(creds.get_private_key(), password):
+                return None
+        except Exception:
+            return None
+
+        self._upgrade_password_hash(creds, password)
+        return creds
+
+    def authenticate_password(self, username, password):
+        """
+        Verifies a user's password with a single lookup of the Credentials row, for the logins that do
+        not ask for the key pair (headless commands and the API). Outdated password hashes are upgraded
+        as in authenticate.
+
+        Args:
+            username (str): The username of the user whose password is being verified.
+            password (str): The plaintext password provided by the user.
+
+        Returns:
+            Credentials: The user's credentials if the password matches.
+            None: Otherwise.
+        """
+        row = self.cur.execute("""
+                                SELECT *
+                                FROM Credentials
+                                WHERE username=?""", (username,)).fetchone()
+        if row is None:
+            return None
+        creds = Credentials(*row)
+        if not crypto.verify_password(password, creds.get_hash_password()):
+            return None
+        self._upgrade_password_hash(creds, password)
+        return creds
+
+    def _upgrade_password_hash(self, creds, password):
+        """
+        Replaces a password hash made with outdated KDF parameters by one with the current parameters.
+        """
+        if crypto.needs_rehash(creds.get_hash_password(), self.n_param, self.r_param, self.p_param, self.dklen_param):
+            creds.hash_password = self.hash_function(password)
+            self.cur.execute("""
+                            UPDATE Credentials
+                            SET hash_password = ?
+                            WHERE username = ?""", (creds.hash_password, creds.get_username()))
+            self.conn.commit()
+
     def check_credentials(self, username, password, public_key, private_key):
         """
         Verifies a user's login credentials against the stored values in the database.
@@ -535,12 +1121,8 @@ class DatabaseOperations:
         Returns:
             bool: True if all provided credentials match the stored values, False otherwise.
         """
-        creds = self.get_creds_by_username(username)
-        if(creds is not None and self.check_passwd(username, password) and creds.get_public_key() == public_key and private_key == self.decrypt_private_k(creds.get_private_key(), password)):
-            return True
-        else:
-            return False
-    
+        return self.authenticate(username, password, public_key, private_key) is not None
+
     def check_passwd(self, username, password):
         """
         Verifies a user's password by comparing it against the hashed password stored in the database.
@@ -561,18 +1143,7 @@ class DatabaseOperations:
                                 FROM Credentials
                                 WHERE username =?""", (username,))
         hash = result.fetchone()
-        if hash:
-            saved_hash = hash[0]
-            params = saved_hash.split('$')
-            hashed_passwd = hashlib.scrypt(
-                password.encode('utf-8'),
-                salt=bytes.fromhex(params[1]),
-                n = int(params[2]),
-                r = int(params[3]),
-                p = int(params[4]),
-                dklen= int(params[5])
-            )
-        return hashed_passwd.hex() == params[0]
+        return hash is not None and crypto.verify_password(password, hash[0])
     
     def change_passwd(self, username, old_pass, new_pass):
         """
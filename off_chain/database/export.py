@@ -0,0 +1,186 @@
+"""
+This module streams reports and on-chain history out of the system as CSV, JSON Lines or Parquet.
+Rows flow through generators from a database cursor (or one user's chain history at a time) to a
+writer that flushes fixed-size chunks, so memory use does not grow with the size of the export.
+"""
+
+import bz2
+import csv
+import gzip
+import json
+import lzma
+from itertools import islice
+
+
+REPORT_COLUMNS = ('id_report', 'creation_date', 'operation_date', 'username', 'role', 'report_co2',
+                  'action_type', 'description', 'co2', 'is_green', 'timestamp')
+
+CHAIN_COLUMNS = ('username', 'address', 'kind', 'action_type', 'description', 'co2', 'timestamp')
+
+# Value type of every exported column, used for the Parquet schema.
+COLUMN_TYPES = {
+    'id_report': int, 'creation_date': str, 'operation_date': str, 'username': str, 'role': str,
+    'report_co2': int, 'action_type': str, 'description': str, 'co2': int, 'is_green': int,
+    'timestamp': int, 'address': str, 'kind': str,
+}
+
+FORMATS = ('csv', 'jsonl', 'parquet')
+
+_TEXT_OPENERS = {None: open, 'gzip': gzip.open, 'bz2': bz2.open, 'xz': lzma.open}
+
+
+def iter_report_rows(conn, username=None, chunk_size=1000):
+    """
+    Yields one row per report line item (reports without line items yield a single row with empty
+    line fields), ordered by report. The rows are read with fetchmany, chunk_size at a time.
+
+    Args:
+        conn (sqlite3.Connection): The database connection.
+        username (str, optional): Restricts the export to one user.
+        chunk_size (int): Number of rows fetched from the cursor at a time.
+
+    Yields:
+        tuple: A row with the REPORT_COLUMNS fields.
+    """
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT r.id_report, r.creation_date, r.operation_date, r.username, r.role, r.co2,
+               l.action_type, l.description, l.co2, l.is_green, l.timestamp
+        FROM Reports r
+        LEFT JOIN ReportLines l ON l.id_report = r.id_report
+        WHERE r.username = COALESCE(?, r.username)
+        ORDER BY r.id_report, l.id
+    """, (username,))
+    try:
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                return
+            yield from rows
+    finally:
+        cur.close()
+
+
+def iter_chain_rows(conn, chain, username=None, page_size=100):
+    """
+    Yields the on-chain operations and green actions of every registered user, one user at a time,
+    walking the users with keyset pagination.
+
+    Args:
+        conn (sqlite3.Connection): The database connection, used to list the users.
+        chain (ActionController): The chain client the histories are read from.
+        username (str, optional): Restricts the export to one user.
+        page_size (int): Number of users listed per query.
+
+    Yields:
+        tuple: A row with the CHAIN_COLUMNS fields.
+    """
+    last_username = ""
+    while True:
+        users = conn.execute("""
+            SELECT username, public_key
+            FROM Credentials
+            WHERE username > ? AND username = COALESCE(?, username)
+            ORDER BY username
+            LIMIT ?
+        """, (last_username, username, page_size)).fetchall()
+        for name, address in users:
+            for action_type, description, timestamp, co2 in chain.contract.functions.getOperations(address).call():
+                yield (name, address, 'OPERATION', action_type, description, co2, timestamp)
+            for description, timestamp, co2_saved in chain.contract.functions.getGreenActions(address).call():
+                yield (name, address, 'GREEN', 'GREEN', description, co2_saved, timestamp)
+        if len(users) < page_size:
+            return
+        last_username = users[-1][0]
+
+
+def _chunks(rows, chunk_size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def write_csv(rows, columns, path, compression=None, chunk_size=1000):
+    """
+    Writes rows to a CSV file with a header, optionally compressed.
+
+    Returns:
+        int: The number of rows written.
+    """
+    count = 0
+    with _TEXT_OPENERS[compression](path, 'wt', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(columns)
+        for chunk in _chunks(rows, chunk_size):
+            writer.writerows(chunk)
+            count += len(chunk)
+    return count
+
+
+def write_jsonl(rows, columns, path, compression=None, chunk_size=1000):
+    """
+    Writes rows to a JSON Lines file, one object per row, optionally compressed.
+
+    Returns:
+        int: The number of rows written.
+    """
+    count = 0
+    with _TEXT_OPENERS[compression](path, 'wt', encoding='utf-8') as file:
+        for chunk in _chunks(rows, chunk_size):
+            file.write(''.join(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + '\n' for row in chunk))
+            count += len(chunk)
+    return count
+
+
+def write_parquet(rows, columns, path, compression=None, chunk_size=1000):
+    """
+    Writes rows to a Parquet file, one row group per chunk. Requires pyarrow.
+    The compression is a Parquet codec (e.g. 'snappy', 'gzip', 'zstd'); the default is snappy.
+
+    Returns:
+        int: The number of rows written.
+
+    Raises:
+        RuntimeError: If pyarrow is not installed.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export requires pyarrow (pip install pyarrow).")
+
+    schema = pa.schema([(column, pa.int64() if COLUMN_TYPES[column] is int else pa.string()) for column in columns])
+    count = 0
+    with pq.ParquetWriter(path, schema, compression=compression or 'snappy') as writer:
+        for chunk in _chunks(rows, chunk_size):
+            writer.write_table(pa.Table.from_pylist([dict(zip(columns, row)) for row in chunk], schema=schema))
+            count += len(chunk)
+    return count
+
+
+_WRITERS = {'csv': write_csv, 'jsonl': write_jsonl, 'parquet': write_parquet}
+
+
+def export_rows(rows, columns, path, fmt='csv', compression=None, chunk_size=1000):
+    """
+    Streams rows to a file in the given format.
+
+    Args:
+        rows (iterable): The rows, e.g. from iter_report_rows or iter_chain_rows.
+        columns (tuple): The column names of the rows.
+        path (str): The output file.
+        fmt (str): 'csv', 'jsonl' or 'parquet'.
+        compression (str, optional): 'gzip', 'bz2' or 'xz' for CSV and JSON Lines; a Parquet codec for Parquet.
+        chunk_size (int): Number of rows buffered per write.
+
+    Returns:
+        int: The number of rows written.
+    """
+    if fmt not in _WRITERS:
+        raise ValueError(f"Unknown format '{fmt}'; expected one of {', '.join(FORMATS)}")
+    if fmt != 'parquet' and compression not in _TEXT_OPENERS:
+        raise ValueError(f"Unsupported compression '{compression}' for {fmt}; expected gzip, bz2 or xz")
+    return _WRITERS[fmt](rows, columns, path, compression, chunk_size)
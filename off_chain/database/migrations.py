@@ -0,0 +1,386 @@
+"""
+This module implements the versioned schema migrations of the SQLite database.
+The schema version is tracked with PRAGMA user_version: at startup every migration newer
+than the stored version is applied in order, each one inside its own transaction.
+"""
+
+import sqlite3
+from eth_utils import is_address, to_checksum_address
+from colorama import init, Fore, Style
+init(strip=False, convert=False)
+from session.logging import log_error
+
+
+def _initial_schema(cur):
+    """
+    Creates the original tables if they are not already present.
+    """
+    cur.execute('''CREATE TABLE IF NOT EXISTS Credentials(
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT NOT NULL,
+                hash_password TEXT NOT NULL,
+                role TEXT CHECK(role IN ('FARMER', 'CARRIER', 'PRODUCER', 'SELLER')) NOT NULL,
+                public_key TEXT NOT NULL,
+                private_key TEXT NOT NULL
+                );''')
+    cur.execute('''CREATE TABLE IF NOT EXISTS Users(
+                username TEXT NOT NULL,
+                name TEXT NOT NULL,
+                lastname TEXT NOT NULL,
+                birthday DATE NOT NULL,
+                user_role TEXT CHECK(user_role IN ('FARMER', 'CARRIER', 'PRODUCER', 'SELLER')) NOT NULL,
+                email TEXT NOT NULL,
+                phone TEXT,
+                company_name TEXT,
+                FOREIGN KEY(username) REFERENCES Credentials(username)
+                );''')
+    cur.execute('''CREATE TABLE IF NOT EXISTS Reports(
+                id_report INTEGER PRIMARY KEY AUTOINCREMENT,
+                creation_date TEXT NOT NULL,
+                operation_date DATE NOT NULL,
+                username TEXT NOT NULL,
+                role TEXT CHECK(role IN ('FARMER', 'CARRIER', 'PRODUCER', 'SELLER')) NOT NULL,
+                operations TEXT NOT NULL,
+                co2 INTEGER NOT NULL
+                );''')
+
+
+# UNIQUE indexes of the registration columns: (index name, table, column, registration code of a violation).
+UNIQUE_INDEXES = (
+    ("ux_credentials_username", "Credentials", "username", -2),
+    ("ux_credentials_public_key", "Credentials", "public_key", -5),
+    ("ux_users_username", "Users", "username", -2),
+    ("ux_users_email", "Users", "email", -3),
+    ("ux_users_phone", "Users", "phone", -4),
+)
+
+
+def _has_unique_index(cur, index_name, table):
+    return any(row[1] == index_name and row[2] for row in cur.execute(f"PRAGMA index_list({table})").fetchall())
+
+
+def _create_unique_index(cur, index_name, table, column):
+    """
+    Creates a UNIQUE index on a column. If the existing rows contain duplicates, they are written to the
+    error log and a plain index named ix_... is created instead, so lookups stay indexed; the UNIQUE index
+    is then retried at every start (see ensure_unique_indexes) until the duplicates are cleaned up.
+    A plain index left under the UNIQUE index's name by earlier versions is replaced.
+
+    Returns:
+        bool: True if the UNIQUE index exists.
+    """
+    if _has_unique_index(cur, index_name, table):
+        return True
+    cur.execute(f"DROP INDEX IF EXISTS {index_name}")
+    duplicates = cur.execute(f'''SELECT {column}, COUNT(*)
+                                FROM {table}
+                                WHERE {column} IS NOT NULL
+                                GROUP BY {column}
+                                HAVING COUNT(*) > 1''').fetchall()
+    if duplicates:
+        values = ", ".join(str(row[0]) for row in duplicates)
+        log_error(f"Migration: duplicate values in {table}.{column} ({values}); the UNIQUE index {index_name} is not created.")
+        print(Fore.YELLOW + f"Warning: duplicate values found in {table}.{column} ({values}); "
+              f"uniqueness is checked by the registration until they are removed." + Style.RESET_ALL)
+        cur.execute(f"CREATE INDEX IF NOT EXISTS ix_{index_name[3:]} ON {table}({column})")
+        return False
+    cur.execute(f"CREATE UNIQUE INDEX {index_name} ON {table}({column})")
+    cur.execute(f"DROP INDEX IF EXISTS ix_{index_name[3:]}")
+    return True
+
+
+def _add_indexes_and_constraints(cur):
+    """
+    Adds the lookup indexes and UNIQUE constraints used by login, registration and reports.
+    """
+    for index_name, table, column, _ in UNIQUE_INDEXES:
+        _create_unique_index(cur, index_name, table, column)
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_reports_username_creation_date ON Reports(username, creation_date)")
+
+
+def _retry_unique_indexes(cur):
+    """
+    Retries the UNIQUE indexes that migration 2 could not create, replacing the plain indexes
+    earlier versions created under their names.
+    """
+    for index_name, table, column, _ in UNIQUE_INDEXES:
+        _create_unique_index(cur, index_name, table, column)
+
+
+def _parse_legacy_operation(text):
+    """
+    Splits a legacy "[TYPE] description" operation string into (action_type, description, is_green).
+    """
+    text = text.strip()
+    action_type, description = "UNKNOWN", text
+    if text.startswith("[") and "]" in text:
+        action_type, description = text[1:text.index("]")], text[text.index("]") + 1:].strip()
+    return action_type, description, int(action_type == "GREEN")
+
+
+def _add_report_lines(cur):
+    """
+    Creates the ReportLines table and backfills it from the pipe-joined Reports.operations strings.
+    Legacy strings carry no per-operation CO2 or timestamp, so those stay NULL unless the
+    report holds a single operation, whose CO2 is then the report total.
+    """
+    cur.execute('''CREATE TABLE IF NOT EXISTS ReportLines(
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                id_report INTEGER NOT NULL REFERENCES Reports(id_report) ON DELETE CASCADE,
+                action_type TEXT NOT NULL,
+                description TEXT NOT NULL,
+                co2 INTEGER,
+                is_green INTEGER NOT NULL DEFAULT 0 CHECK(is_green IN (0, 1)),
+                timestamp INTEGER
+                );''')
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_report_lines_report ON ReportLines(id_report)")
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_report_lines_action_type ON ReportLines(action_type)")
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_reports_username_operation_date ON Reports(username, operation_date)")
+
+    legacy = cur.execute("""SELECT id_report, operations, co2
+                            FROM Reports
+                            WHERE operations != ''
+                            AND id_report NOT IN (SELECT id_report FROM ReportLines)""").fetchall()
+    lines = []
+    for id_report, operations, co2 in legacy:
+        parts = [part for part in operations.split(" | ") if part.strip()]
+        for part in parts:
+            action_type, description, is_green = _parse_legacy_operation(part)
+            lines.append((id_report, action_type, description, co2 if len(parts) == 1 else None, is_green))
+    cur.executemany("""INSERT INTO ReportLines (id_report, action_type, description, co2, is_green, timestamp)
+                       VALUES (?, ?, ?, ?, ?, NULL)""", lines)
+
+
+def _add_co2_aggregates(cur):
+    """
+    Creates the materialized CO2 aggregate table and the per-user high-water marks that drive its updates.
+    """
+    cur.execute('''CREATE TABLE IF NOT EXISTS Co2Aggregates(
+                scope TEXT CHECK(scope IN ('USER', 'ROLE')) NOT NULL,
+                subject TEXT NOT NULL,
+                granularity TEXT CHECK(granularity IN ('DAY', 'WEEK', 'MONTH')) NOT NULL,
+                period TEXT NOT NULL,
+                co2_emitted INTEGER NOT NULL DEFAULT 0,
+                co2_saved INTEGER NOT NULL DEFAULT 0,
+                operations INTEGER NOT NULL DEFAULT 0,
+                green_actions INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (scope, subject, granularity, period)
+                ) WITHOUT ROWID;''')
+    cur.execute('''CREATE TABLE IF NOT EXISTS AggregateWatermarks(
+                username TEXT PRIMARY KEY,
+                operations_seen INTEGER NOT NULL DEFAULT 0,
+                green_actions_seen INTEGER NOT NULL DEFAULT 0,
+                updated_at TEXT
+                );''')
+
+
+def _add_credit_balances(cur):
+    """
+    Creates the CreditBalances snapshot with its balance indexes, and the SyncState table that
+    records the last block each chain-derived table was synced to.
+    """
+    cur.execute('''CREATE TABLE IF NOT EXISTS CreditBalances(
+                username TEXT PRIMARY KEY,
+                public_key TEXT NOT NULL,
+                role TEXT CHECK(role IN ('FARMER', 'CARRIER', 'PRODUCER', 'SELLER')) NOT NULL,
+                company_name TEXT,
+                balance INTEGER NOT NULL DEFAULT 0,
+                block_number INTEGER NOT NULL DEFAULT 0,
+                updated_at TEXT
+                );''')
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_credit_balances_balance ON CreditBalances(balance DESC)")
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_credit_balances_role_balance ON CreditBalances(role, balance DESC)")
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_credit_balances_company_balance ON CreditBalances(company_name, balance DESC)")
+    cur.execute('''CREATE TABLE IF NOT EXISTS SyncState(
+                name TEXT PRIMARY KEY,
+                block_number INTEGER NOT NULL
+                );''')
+
+
+def _add_operations_search(cur):
+    """
+    Creates the ReportLinesFts full-text index over the descriptions and types of the report line items.
+    It is an external-content FTS5 table: the text lives only in ReportLines, and triggers keep the index
+    in sync with every insert, update and delete. If the SQLite build has no FTS5, the index is skipped
+    and searches fall back to a LIKE scan.
+    """
+    try:
+        cur.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS ReportLinesFts USING fts5(
+                    description,
+                    action_type,
+                    content='ReportLines',
+                    content_rowid='id',
+                    tokenize='unicode61 remove_diacritics 2',
+                    prefix='2 3'
+                    );''')
+    except sqlite3.OperationalError as e:
+        log_error(f"Migration: full-text search not available ({e}); searches will scan the descriptions.")
+        print(Fore.YELLOW + "Warning: SQLite FTS5 is not available, operation search will be slower." + Style.RESET_ALL)
+        return
+    cur.execute('''CREATE TRIGGER IF NOT EXISTS report_lines_fts_insert AFTER INSERT ON ReportLines BEGIN
+                    INSERT INTO ReportLinesFts(rowid, description, action_type)
+                    VALUES (new.id, new.description, new.action_type);
+                END;''')
+    cur.execute('''CREATE TRIGGER IF NOT EXISTS report_lines_fts_delete AFTER DELETE ON ReportLines BEGIN
+                    INSERT INTO ReportLinesFts(ReportLinesFts, rowid, description, action_type)
+                    VALUES ('delete', old.id, old.description, old.action_type);
+                END;''')
+    cur.execute('''CREATE TRIGGER IF NOT EXISTS report_lines_fts_update AFTER UPDATE ON ReportLines BEGIN
+                    INSERT INTO ReportLinesFts(ReportLinesFts, rowid, description, action_type)
+                    VALUES ('delete', old.id, old.description, old.action_type);
+                    INSERT INTO ReportLinesFts(rowid, description, action_type)
+                    VALUES (new.id, new.description, new.action_type);
+                END;''')
+    cur.execute("INSERT INTO ReportLinesFts(ReportLinesFts) VALUES ('rebuild')")
+
+
+def _add_archived_reports(cur):
+    """
+    Creates the ArchivedReports lookup table, which tells which archive file holds each archived report.
+    """
+    cur.execute('''CREATE TABLE IF NOT EXISTS ArchivedReports(
+                id_report INTEGER PRIMARY KEY,
+                creation_date TEXT NOT NULL,
+                operation_date DATE NOT NULL,
+                username TEXT NOT NULL,
+                role TEXT NOT NULL,
+                co2 INTEGER NOT NULL,
+                archive_file TEXT NOT NULL
+                );''')
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_archived_reports_username_creation_date ON ArchivedReports(username, creation_date)")
+
+
+def _add_report_view_indexes(cur):
+    """
+    Adds the indexes that return the line items of a user's reports for one creation date already in
+    display order (operation date, report, line timestamp), so a page of them is read without sorting.
+    """
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_reports_username_creation_operation ON Reports(username, creation_date, operation_date)")
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_report_lines_report_timestamp ON ReportLines(id_report, timestamp, id)")
+
+
+def _add_sessions(cur):
+    """
+    Creates the tables of the SQLite session store: the API sessions, keyed by the digest of their
+    token, and the failed login attempts, keyed by login name.
+    """
+    cur.execute('''CREATE TABLE IF NOT EXISTS Sessions(
+                token_hash TEXT PRIMARY KEY,
+                username TEXT NOT NULL,
+                role TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL
+                );''')
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_sessions_expires_at ON Sessions(expires_at)")
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_sessions_username ON Sessions(username)")
+    cur.execute('''CREATE TABLE IF NOT EXISTS LoginAttempts(
+                login TEXT PRIMARY KEY,
+                attempts INTEGER NOT NULL,
+                locked_until REAL NOT NULL,
+                updated_at REAL NOT NULL
+                );''')
+
+
+def _checksum_public_keys(cur):
+    """
+    Rewrites the stored wallet addresses in checksum form, the only spelling web3 accepts in contract
+    calls and the one the registration now stores. An address whose checksum spelling is already
+    registered to another user is left as it is and written to the error log.
+    """
+    rows = cur.execute("SELECT id, username, public_key FROM Credentials").fetchall()
+    for row_id, username, public_key in rows:
+        if not is_address(public_key) or to_checksum_address(public_key) == public_key:
+            continue
+        try:
+            cur.execute("UPDATE Credentials SET public_key = ? WHERE id = ?", (to_checksum_address(public_key), row_id))
+        except sqlite3.IntegrityError:
+            log_error(f"Migration: the address {public_key} of {username} is already registered in checksum form; left unchanged.")
+            continue
+        cur.execute("UPDATE CreditBalances SET public_key = ? WHERE username = ?", (to_checksum_address(public_key), username))
+
+
+# Ordered list of (version, description, migration function). Append new entries, never edit old ones.
+MIGRATIONS = [
+    (1, "Initial schema", _initial_schema),
+    (2, "Indexes and unique constraints", _add_indexes_and_constraints),
+    (3, "Report line items", _add_report_lines),
+    (4, "CO2 aggregates", _add_co2_aggregates),
+    (5, "Credit balance snapshot", _add_credit_balances),
+    (6, "Operation full-text search", _add_operations_search),
+    (7, "Archived reports index", _add_archived_reports),
+    (8, "Report viewer indexes", _add_report_view_indexes),
+    (9, "Session store", _add_sessions),
+    (10, "Checksum wallet addresses", _checksum_public_keys),
+    (11, "Retry unique constraints", _retry_unique_indexes),
+]
+
+
+def ensure_unique_indexes(conn):
+    """
+    Creates the UNIQUE indexes of the registration columns that are still missing, e.g. once the
+    duplicates that kept a migration from creating them have been removed. Costs one PRAGMA per
+    table when every index exists.
+
+    Args:
+        conn (sqlite3.Connection): The connection to the migrated database.
+
+    Returns:
+        list: (table, column, registration code) of the columns still without a UNIQUE index.
+    """
+    cur = conn.cursor()
+    missing = [spec for spec in UNIQUE_INDEXES if not _has_unique_index(cur, spec[0], spec[1])]
+    if not missing:
+        return []
+    unenforced = []
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        for index_name, table, column, code in missing:
+            if not _create_unique_index(cur, index_name, table, column):
+                unenforced.append((table, column, code))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return unenforced
+
+
+def get_schema_version(conn):
+    """
+    Returns the schema version currently stored in the database.
+    """
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def run_migrations(conn):
+    """
+    Applies every pending migration to the database.
+    Each migration runs in an IMMEDIATE transaction together with the version bump, so a
+    failing migration leaves the database at the previous version and concurrent processes
+    starting at the same time do not apply the same migration twice.
+
+    Args:
+        conn (sqlite3.Connection): The connection to migrate.
+
+    Returns:
+        int: The schema version after the migrations have been applied.
+    """
+    latest = MIGRATIONS[-1][0]
+    if get_schema_version(conn) >= latest:
+        return latest
+
+    for version, description, migration in MIGRATIONS:
+        cur = conn.cursor()
+        try:
+            cur.execute("BEGIN IMMEDIATE")
+            if get_schema_version(conn) >= version:
+                conn.rollback()
+                continue
+            migration(cur)
+            cur.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            log_error(f"Migration {version} ({description}) failed: {e}")
+            raise
+
+    return get_schema_version(conn)
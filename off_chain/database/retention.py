@@ -0,0 +1,239 @@
+"""
+This module implements the retention policy of the Reports table.
+Overlapping reports are deduplicated (only the newest report of a user for a given operation
+date is kept), reports older than the retention period are moved to gzip-compressed JSON Lines
+archive files listed in the ArchivedReports lookup table, and the freed pages are returned to
+the file system with incremental VACUUM.
+"""
+
+import datetime
+import gzip
+import json
+import os
+from database.connection import open_connection
+
+
+def _months_ago(months, today=None):
+    """
+    Returns the date the given number of months before today, as YYYY-MM-DD.
+    """
+    today = today or datetime.date.today()
+    year, month = divmod(today.year * 12 + today.month - 1 - months, 12)
+    day = min(today.day, 28)
+    return datetime.date(year, month + 1, day).strftime('%Y-%m-%d')
+
+
+def dedupe_reports(conn):
+    """
+    Deletes every report superseded by a newer report of the same user for the same operation date,
+    together with its line items. The newest report is the one with the latest creation date
+    (the highest id among equal creation dates).
+
+    Returns:
+        int: The number of deleted reports.
+    """
+    cur = conn.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        cur.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS superseded_reports(id_report INTEGER PRIMARY KEY)
+        """)
+        cur.execute("DELETE FROM superseded_reports")
+        cur.execute("""
+            INSERT INTO superseded_reports (id_report)
+            SELECT id_report FROM (
+                SELECT id_report, ROW_NUMBER() OVER (
+                    PARTITION BY username, operation_date
+                    ORDER BY creation_date DESC, id_report DESC
+                ) AS position
+                FROM Reports
+            )
+            WHERE position > 1
+        """)
+        cur.execute("DELETE FROM ReportLines WHERE id_report IN (SELECT id_report FROM superseded_reports)")
+        deleted = cur.execute("DELETE FROM Reports WHERE id_report IN (SELECT id_report FROM superseded_reports)").rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return deleted
+
+
+def archive_reports(conn, before_date, archive_dir, batch_size=1000):
+    """
+    Moves the reports whose operation date is before the given date to archive files.
+    Each batch of reports is written to its own gzip-compressed JSON Lines file (one report with its
+    line items per line), which is flushed to disk before the reports are indexed in ArchivedReports
+    and deleted from Reports and ReportLines in one transaction.
+
+    Args:
+        conn (sqlite3.Connection): The database connection.
+        before_date (str): Reports with an operation date before this YYYY-MM-DD date are archived.
+        archive_dir (str): The directory the archive files are written to.
+        batch_size (int): Number of reports per archive file.
+
+    Returns:
+        tuple: (number of archived reports, list of written archive files).
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    archived, files = 0, []
+    cur = conn.cursor()
+
+    while True:
+        reports = cur.execute("""
+            SELECT id_report, creation_date, operation_date, username, role, co2
+            FROM Reports
+            WHERE operation_date < ?
+            ORDER BY id_report
+            LIMIT ?
+        """, (before_date, batch_size)).fetchall()
+        if not reports:
+            return archived, files
+
+        ids = [report[0] for report in reports]
+        lines = {}
+        for id_report, action_type, description, co2, is_green, timestamp in cur.execute(f"""
+                SELECT id_report, action_type, description, co2, is_green, timestamp
+                FROM ReportLines
+                WHERE id_report IN ({', '.join('?' * len(ids))})
+                ORDER BY id
+                """, ids):
+            lines.setdefault(id_report, []).append({'action_type': action_type, 'description': description, 'co2': co2,
+                                                    'is_green': is_green, 'timestamp': timestamp})
+
+        file_name = f"reports_{ids[0]}_{ids[-1]}.jsonl.gz"
+        path = os.path.join(archive_dir, file_name)
+        with gzip.open(path, 'wt', encoding='utf-8') as file:
+            for id_report, creation_date, operation_date, username, role, co2 in reports:
+                file.write(json.dumps({'id_report': id_report, 'creation_date': creation_date,
+                                       'operation_date': operation_date, 'username': username, 'role': role,
+                                       'co2': co2, 'lines': lines.get(id_report, [])}) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
+
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            cur.executemany("""
+                INSERT OR REPLACE INTO ArchivedReports (id_report, creation_date, operation_date, username, role, co2, archive_file)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, [report + (file_name,) for report in reports])
+            placeholders = ', '.join('?' * len(ids))
+            cur.execute(f"DELETE FROM ReportLines WHERE id_report IN ({placeholders})", ids)
+            cur.execute(f"DELETE FROM Reports WHERE id_report IN ({placeholders})", ids)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            os.remove(path)
+            raise
+        archived += len(reports)
+        files.append(path)
+
+
+def enable_incremental_vacuum(db_path):
+    """
+    Switches a database created without auto_vacuum to INCREMENTAL mode. This takes one full VACUUM,
+    which rewrites the whole file and holds the write lock meanwhile, so it runs on its own connection
+    and only when asked for (`python main.py archive --full-vacuum`); databases created by this version
+    are already in INCREMENTAL mode.
+
+    Args:
+        db_path (str): The database file.
+
+    Returns:
+        bool: True if the mode was switched, False if it already was INCREMENTAL.
+    """
+    conn = open_connection(db_path)
+    try:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            return False
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        return True
+    finally:
+        conn.close()
+
+
+def incremental_vacuum(conn, pages=None):
+    """
+    Returns free pages to the file system with PRAGMA incremental_vacuum. On a database that is not
+    in INCREMENTAL auto_vacuum mode nothing is freed (see enable_incremental_vacuum).
+
+    Args:
+        conn (sqlite3.Connection): The database connection.
+        pages (int, optional): Maximum number of pages to free; all free pages if omitted.
+
+    Returns:
+        int: The number of freed pages.
+    """
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        return 0
+    before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    # execute() steps the pragma once, which frees a single page; executescript() runs it to completion.
+    conn.executescript(f"PRAGMA incremental_vacuum({int(pages)})" if pages else "PRAGMA incremental_vacuum")
+    return before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+
+def apply_retention(conn, months, archive_dir, vacuum_pages=None, today=None, full_vacuum=False):
+    """
+    Runs the whole retention policy: deduplication, archival of the reports older than the
+    retention period, and incremental VACUUM.
+
+    Args:
+        conn (sqlite3.Connection): The database connection.
+        months (int): Reports with an operation date older than this many months are archived.
+        archive_dir (str): The directory the archive files are written to.
+        vacuum_pages (int, optional): Maximum number of pages freed by the VACUUM step.
+        today (datetime.date, optional): The reference date; defaults to today.
+        full_vacuum (bool): Switch the database to INCREMENTAL auto_vacuum first if it is not, with
+                            a full VACUUM (see enable_incremental_vacuum).
+
+    Returns:
+        dict: The number of deduplicated and archived reports, the archive files, the freed pages
+              and whether the database was switched to INCREMENTAL mode.
+    """
+    deduplicated = dedupe_reports(conn)
+    archived, files = archive_reports(conn, _months_ago(months, today), archive_dir)
+    switched = full_vacuum and enable_incremental_vacuum(conn.execute("PRAGMA database_list").fetchone()[2])
+    freed_pages = incremental_vacuum(conn, vacuum_pages)
+    return {'deduplicated': deduplicated, 'archived': archived, 'files': files, 'freed_pages': freed_pages,
+            'switched_to_incremental': switched}
+
+
+def get_archived_report_dates(conn, username):
+    """
+    Returns the distinct creation dates of a user's archived reports, oldest first.
+    """
+    return [row[0] for row in conn.execute("""
+        SELECT DISTINCT creation_date
+        FROM ArchivedReports
+        WHERE username = ?
+        ORDER BY creation_date
+    """, (username,)).fetchall()]
+
+
+def load_archived_reports(conn, archive_dir, username, creation_date):
+    """
+    Reads back the archived reports of a user created at the given date, with their line items.
+    Only the archive files listed for those reports in ArchivedReports are opened.
+
+    Returns:
+        list: Dicts with id_report, creation_date, operation_date, username, role, co2 and lines,
+              ordered by operation date.
+    """
+    entries = conn.execute("""
+        SELECT id_report, archive_file
+        FROM ArchivedReports
+        WHERE username = ? AND creation_date = ?
+    """, (username, creation_date)).fetchall()
+    wanted = {}
+    for id_report, archive_file in entries:
+        wanted.setdefault(archive_file, set()).add(id_report)
+
+    reports = []
+    for archive_file, ids in wanted.items():
+        with gzip.open(os.path.join(archive_dir, archive_file), 'rt', encoding='utf-8') as file:
+            for line in file:
+                report = json.loads(line)
+                if report['id_report'] in ids:
+                    reports.append(report)
+    return sorted(reports, key=lambda report: (report['operation_date'], report['id_report']))
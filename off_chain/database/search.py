@@ -0,0 +1,77 @@
+"""
+This module implements the full-text search over the operations stored in the reports.
+Queries run against the ReportLinesFts index and are ranked with bm25; when the SQLite build
+has no FTS5 the same API falls back to a LIKE scan of the descriptions.
+"""
+
+import re
+
+
+def fts_available(conn):
+    """
+    Returns True if the ReportLinesFts index exists.
+    """
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'ReportLinesFts'").fetchone() is not None
+
+
+def build_match_query(text):
+    """
+    Turns free text into an FTS5 query that matches every word, in any order.
+    Each word is quoted, so punctuation and FTS5 keywords (AND, OR, NEAR, column names) are taken
+    literally; a trailing '*' on a word is kept as a prefix search.
+
+    Returns:
+        str: The MATCH expression, or None if the text contains no words.
+    """
+    terms = []
+    for word in text.split():
+        prefix = word.endswith('*')
+        word = word.rstrip('*')
+        if not re.search(r'\w', word):
+            continue
+        terms.append('"' + word.replace('"', '""') + '"' + ('*' if prefix else ''))
+    return ' '.join(terms) or None
+
+
+def search_operations(conn, text, username=None, page=0, page_size=20):
+    """
+    Finds the report line items whose description or type contains every word of the text,
+    best match first.
+
+    Args:
+        conn (sqlite3.Connection): The database connection.
+        text (str): The words to search for; 'word*' searches for a prefix.
+        username (str, optional): Restricts the search to the reports of one user.
+        page (int): Zero-based page number.
+        page_size (int): Maximum number of results per page.
+
+    Returns:
+        list: Tuples (id_report, creation_date, operation_date, username, action_type, description, co2, score),
+              where the description has the matched words between ** and ** and a lower score is a better match.
+    """
+    query = build_match_query(text)
+    if query is None:
+        return []
+    if not fts_available(conn):
+        words = [word.rstrip('*') for word in text.split()]
+        conditions = ' AND '.join("(l.description LIKE ? OR l.action_type LIKE ?)" for _ in words)
+        params = [value for word in words for value in (f'%{word}%', f'%{word}%')]
+        return conn.execute(f"""
+            SELECT r.id_report, r.creation_date, r.operation_date, r.username, l.action_type, l.description, l.co2, 0
+            FROM ReportLines l
+            JOIN Reports r ON r.id_report = l.id_report
+            WHERE {conditions} AND r.username = COALESCE(?, r.username)
+            ORDER BY r.creation_date DESC, l.id
+            LIMIT ? OFFSET ?
+        """, (*params, username, page_size, page * page_size)).fetchall()
+
+    return conn.execute("""
+        SELECT r.id_report, r.creation_date, r.operation_date, r.username, l.action_type,
+               highlight(ReportLinesFts, 0, '**', '**'), l.co2, bm25(ReportLinesFts) AS score
+        FROM ReportLinesFts
+        JOIN ReportLines l ON l.id = ReportLinesFts.rowid
+        JOIN Reports r ON r.id_report = l.id_report
+        WHERE ReportLinesFts MATCH ? AND r.username = COALESCE(?, r.username)
+        ORDER BY score, l.id
+        LIMIT ? OFFSET ?
+    """, (query, username, page_size, page * page_size)).fetchall()
@@ -0,0 +1,89 @@
+"""
+This module takes online snapshots of the database with the SQLite backup API.
+The copy advances a few pages per step and sleeps between steps, so the live application keeps
+reading and writing while the snapshot is taken. Every snapshot records the chain block number
+read once the copy is complete, so the copy can be reconciled with the chain state of that block.
+"""
+
+import datetime
+import os
+import sqlite3
+from config import config
+from database.connection import open_connection
+from database.migrations import get_schema_version
+
+
+def create_snapshot(dest_path, block_source=None, pages=256, sleep=0.01, progress=None, db_path=None):
+    """
+    Copies the database to a new file while it stays in use, and stores the snapshot metadata in it.
+
+    Args:
+        dest_path (str): The snapshot file. It must not exist yet.
+        block_source (callable, optional): Returns the current chain block number. It is called when the
+            copy is complete, as the backup restarts whenever the database changes while it runs.
+        pages (int): Number of pages copied per step.
+        sleep (float): Seconds to wait between steps, leaving the database to other connections.
+        progress (callable, optional): Called as progress(status, remaining, total) after every step.
+        db_path (str, optional): Database to copy; defaults to the configured db_path.
+
+    Returns:
+        dict: The snapshot metadata (path, created_at, block_number, schema_version, pages).
+
+    Raises:
+        FileExistsError: If the snapshot file already exists.
+    """
+    if os.path.exists(dest_path):
+        raise FileExistsError(f"Snapshot file {dest_path} already exists.")
+    os.makedirs(os.path.dirname(os.path.abspath(dest_path)), exist_ok=True)
+
+    source = open_connection(db_path)
+    dest = sqlite3.connect(dest_path)
+    try:
+        source.backup(dest, pages=pages, progress=progress, sleep=sleep)
+        block_number = block_source() if block_source is not None else None
+        dest.execute("PRAGMA journal_mode = DELETE")
+        info = {
+            'path': dest_path,
+            'created_at': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'block_number': block_number,
+            'schema_version': get_schema_version(dest),
+            'pages': dest.execute("PRAGMA page_count").fetchone()[0],
+        }
+        dest.execute('''CREATE TABLE IF NOT EXISTS SnapshotInfo(
+                        created_at TEXT NOT NULL,
+                        block_number INTEGER,
+                        source_path TEXT NOT NULL,
+                        schema_version INTEGER NOT NULL
+                        );''')
+        dest.execute("DELETE FROM SnapshotInfo")
+        dest.execute("INSERT INTO SnapshotInfo (created_at, block_number, source_path, schema_version) VALUES (?, ?, ?, ?)",
+                     (info['created_at'], block_number, os.path.abspath(db_path or config.config["db_path"]),
+                      info['schema_version']))
+        dest.commit()
+    except Exception:
+        dest.close()
+        os.remove(dest_path)
+        raise
+    finally:
+        source.close()
+    dest.close()
+    return info
+
+
+def read_snapshot_info(path):
+    """
+    Returns the metadata stored in a snapshot.
+
+    Returns:
+        dict: created_at, block_number, source_path and schema_version, or None if the file is not a snapshot.
+    """
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        row = conn.execute("SELECT created_at, block_number, source_path, schema_version FROM SnapshotInfo").fetchone()
+    except sqlite3.OperationalError:
+        row = None
+    finally:
+        conn.close()
+    if row is None:
+        return None
+    return dict(zip(('created_at', 'block_number', 'source_path', 'schema_version'), row))
@@ -2,14 +2,20 @@
 This module acts as the entry point for the application. 
 It initializes a new session and command line interface,
 and displays the menu to the user.
+When a command is given on the command line, the command is run instead of the menu.
 """
 
-from cli.cli import CommandLineInterface
-from session.session import Session
+import sys
 
 if __name__ == "__main__":
-    
+
+    if len(sys.argv) > 1:
+        from cli.commands import commands
+        commands()
+
+    from cli.cli import CommandLineInterface
+    from session.session import Session
+
     new_session = Session()
     cli = CommandLineInterface(new_session)  
-    while True:
-        cli.print_menu()
\ No newline at end of file
+    cli.run()
\ No newline at end of file
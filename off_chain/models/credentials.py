@@ -5,6 +5,7 @@ class Credentials(Model):
     This class represents the Credentials model that stores user authentication and authorization information,
     extending the functionality provided by the Model class.
     """
+    __slots__ = ('id', 'username', 'hash_password', 'role', 'public_key', 'private_key')
  
     def __init__(self, id, username, hash_password, role, public_key, private_key):
         """
@@ -45,23 +46,25 @@ class Credentials(Model):
         Saves a new or updates an existing Credentials record in the database.
         Implements SQL queries to insert or update credentials based on the presence of an ID.
         """
+        cur = self.conn.cursor()
         if self.id is None:
             # Insert new credentials record
-            self.cur.execute('''INSERT INTO Credentials (username, hash_password, role, public_key, private_key)
+            cur.execute('''INSERT INTO Credentials (username, hash_password, role, public_key, private_key)
                                 VALUES (?, ?, ?, ?, ?)''', (self.username, self.hash_password, self.role, self.public_key, self.private_key))
                                 #I punti interrogativi come placeholder servono per la prevenzione di attacchi SQL Injection
         else:
             # Update existing credentials record
-            self.cur.execute('''UPDATE Credentials SET username=?, hash_password=?, role=?, public_key=?, private_key=? WHERE id=?''',
+            cur.execute('''UPDATE Credentials SET username=?, hash_password=?, role=?, public_key=?, private_key=? WHERE id=?''',
                              (self.username, self.hash_password, self.role, self.public_key, self.private_key, self.id))
         self.conn.commit()
-        self.id = self.cur.lastrowid # Update the ID with the last row inserted ID if new record
+        if self.id is None:
+            self.id = cur.lastrowid # Update the ID with the last row inserted ID if new record
  
     def delete(self):
         """
         Deletes a Credentials record from the database based on its ID.
         """
         if self.id is not None:
-            self.cur.execute('DELETE FROM Credentials WHERE id=?', (self.id,))
+            self.conn.execute('DELETE FROM Credentials WHERE id=?', (self.id,))
             self.conn.commit()
  
\ No newline at end of file
@@ -1,16 +1,19 @@
 """This module defines the base Model class used to interact with the database."""
  
-import sqlite3
-from config import config
+from database.connection import get_connection
  
 class Model:
-    """Base model to be extended for implementing other models."""
-    db_path = "SFS.db"
+    """
+    Base model to be extended for implementing other models.
+    Models are lightweight value objects: they hold no connection of their own and
+    borrow the shared per-thread connection only when they are saved or deleted.
+    """
+    __slots__ = ()
  
-    def __init__(self):
-        """Constructor that initializes the database connection."""
-        self.conn = sqlite3.connect(config.config["db_path"])
-        self.cur = self.conn.cursor()
+    @property
+    def conn(self):
+        """Returns the shared connection of the current thread."""
+        return get_connection()
  
     def save(self):
         """Virtual method to save the model. Must be implemented by subclasses."""
@@ -19,7 +22,3 @@ class Model:
     def delete(self):
         """Virtual method to delete the model. Must be implemented by subclasses."""
         raise NotImplementedError("Subclasses must implement this method")
-   
-    def __del__(self):
-        """Destructor that closes the database connection."""
-        self.conn.close()
\ No newline at end of file
@@ -8,9 +8,9 @@ class Report(Model):
     and the CO2 emissions associated with those operations.
     It extends the functionality provided by the Model class.
     """
+    __slots__ = ('id_report', 'creation_date', 'operation_date', 'username', 'user_role', 'operations', 'co2')
     
     def __init__(self, id_report, creation_date, operation_date, username, user_role, operations, co2):
-        super().__init__()
         self.id_report = id_report
         self.creation_date = creation_date
         self.operation_date = operation_date
@@ -30,10 +30,11 @@ class Report(Model):
 
     def delete(self):
         """
-        Deletes a report record from the database based on its id.
+        Deletes a report record and its line items from the database based on its id.
         """
         if self.id_report is not None:
-            self.cur.execute('DELETE FROM Reports WHERE id_report=?', (self.id_report,))
+            self.conn.execute('DELETE FROM ReportLines WHERE id_report=?', (self.id_report,))
+            self.conn.execute('DELETE FROM Reports WHERE id_report=?', (self.id_report,))
             self.conn.commit()
 
     def save(self):
@@ -41,17 +42,18 @@ class Report(Model):
         Saves a new or updates an existing Report record in the database.
         If id_report is None, inserts a new record. Otherwise, updates the existing one.
         """
+        cur = self.conn.cursor()
         if self.id_report is None:
             today_date = datetime.date.today()
-            self.cur.execute('''INSERT INTO Reports (creation_date, operation_date, username, user_role, operations, co2)
+            cur.execute('''INSERT INTO Reports (creation_date, operation_date, username, role, operations, co2)
                                 VALUES (?, ?, ?, ?, ?, ?)''',
                              (today_date, self.operation_date, self.username, self.user_role, self.operations, self.co2))
             self.conn.commit()
-            self.id_report = self.cur.lastrowid
+            self.id_report = cur.lastrowid
         else:
-            self.cur.execute('''UPDATE Reports 
-                                SET creation_date=?, operation_date=?, username=?, user_role=?, operations=?
-                                WHERE id_report=?''',S
+            cur.execute('''UPDATE Reports 
+                                SET creation_date=?, operation_date=?, username=?, role=?, operations=?, co2=?
+                                WHERE id_report=?''',
                              (self.creation_date, self.operation_date,
-                              self.username, self.user_role, self.operations, self.id_report))
+                              self.username, self.user_role, self.operations, self.co2, self.id_report))
             self.conn.commit()
@@ -0,0 +1,55 @@
+from models.model_base import Model
+
+class ReportLine(Model):
+    """
+    This class represents a single operation or green action stored as a line item of a report,
+    with its action type, description, CO2 amount, green flag and on-chain timestamp.
+    It extends the functionality provided by the Model class.
+    """
+    __slots__ = ('id', 'id_report', 'action_type', 'description', 'co2', 'is_green', 'timestamp')
+
+    def __init__(self, id, id_report, action_type, description, co2, is_green, timestamp):
+        self.id = id
+        self.id_report = id_report
+        self.action_type = action_type
+        self.description = description
+        self.co2 = co2
+        self.is_green = bool(is_green)
+        self.timestamp = timestamp
+
+    # Getters for ReportLine attributes
+    def get_id(self): return self.id
+    def get_id_report(self): return self.id_report
+    def get_action_type(self): return self.action_type
+    def get_description(self): return self.description
+    def get_co2(self): return self.co2
+    def get_is_green(self): return self.is_green
+    def get_timestamp(self): return self.timestamp
+
+    def delete(self):
+        """
+        Deletes a report line from the database based on its id.
+        """
+        if self.id is not None:
+            self.conn.execute('DELETE FROM ReportLines WHERE id=?', (self.id,))
+            self.conn.commit()
+
+    def save(self):
+        """
+        Saves a new or updates an existing report line in the database.
+        If id is None, inserts a new record. Otherwise, updates the existing one.
+        """
+        cur = self.conn.cursor()
+        if self.id is None:
+            cur.execute('''INSERT INTO ReportLines (id_report, action_type, description, co2, is_green, timestamp)
+                                VALUES (?, ?, ?, ?, ?, ?)''',
+                             (self.id_report, self.action_type, self.description, self.co2, int(self.is_green), self.timestamp))
+            self.conn.commit()
+            self.id = cur.lastrowid
+        else:
+            cur.execute('''UPDATE ReportLines
+                                SET id_report=?, action_type=?, description=?, co2=?, is_green=?, timestamp=?
+                                WHERE id=?''',
+                             (self.id_report, self.action_type, self.description, self.co2,
+                              int(self.is_green), self.timestamp, self.id))
+            self.conn.commit()
@@ -1,15 +1,16 @@
 from colorama import Fore, Style
+from models.model_base import Model
 
-class User:
+class User(Model):
     """
     This class represents a User model that stores user information such as username, name, lastname,
     user role, birthday, email, phone, and company name. It extends the functionality provided
     by the Model class.
     """
+    __slots__ = ('username', 'name', 'lastname', 'company_name', 'phone', 'email', 'birthday', 'user_role')
     
     def __init__(self, username, name, lastname, user_role, birthday, email, phone, company_name):
 
-        super().__init__()
         self.username = username
         self.name = name
         self.lastname = lastname
@@ -33,7 +34,7 @@ class User:
     # Setters for User attributes
     def set_username(self, username): self.username = username
     def set_name(self, name): self.name = name
-    def set_lastname(self, lastname): self.last_name = lastname
+    def set_lastname(self, lastname): self.lastname = lastname
     def set_company_name(self, company_name): self.company_name = company_name
     def set_phone(self, phone): self.phone = phone
     def set_email(self, email): self.email = email
@@ -47,9 +48,10 @@ class User:
         Implements SQL queries to insert or update details based on the presence of a username.
         """
         try:
+            cur = self.conn.cursor()
             if self.username is None:
                 # Insert new Users record
-                self.cur.execute("""
+                cur.execute("""
                             INSERT INTO Users
                             (username, name, lastname, user_role, birthday, email, phone, company_name)
                             VALUES (?, ?, ?, ?, ?, ?, ?, ?) """,
@@ -58,10 +60,9 @@ class User:
                             ))
             else:
                 # Update existing Users details
-                self.cur.execute("""UPDATE Users SET name=?, lastname=?, birthday=?, phone=? WHERE username=?""",
+                cur.execute("""UPDATE Users SET name=?, lastname=?, birthday=?, phone=? WHERE username=?""",
                                 (self.name, self.lastname, self.birthday, self.phone, self.username))
             self.conn.commit()
-            self.username = self.cur.lastrowid
             print(Fore.GREEN + 'Information saved correctly!\n' + Style.RESET_ALL)
         except:
             print(Fore.RED + 'Internal error!' + Style.RESET_ALL)
@@ -71,7 +72,7 @@ class User:
         Deletes a user record from the database based on its username.
         """
         if self.username is not None:
-            self.cur.execute('DELETE FROM Users WHERE username=?', (self.username))
+            self.conn.execute('DELETE FROM Users WHERE username=?', (self.username,))
             self.conn.commit()
  
  
@@ -0,0 +1,307 @@
+"""
+This module holds the metrics registry of the application: counters and latency histograms of the
+node RPCs (recorded by the instrumented Web3 provider), of the contract functions (ActionController),
+of the SQL statements (the instrumented SQLite connection) and of the password hashing and private key
+encryption calls. User actions (Controller.record_operation, give_credit...) are recorded as well, with
+the number of RPCs each run made, and compared with the budgets of metrics.rpc_budget. Receipt polls
+depend on the block time rather than on the code, so they are counted apart and left out of the budgets.
+The registry is exported as Prometheus text (GET /metrics/prometheus on the API, or a file written at
+exit) and printed as a summary by `python main.py metrics`.
+"""
+
+import bisect
+import contextlib
+import functools
+import os
+import threading
+import time
+from config import config
+
+
+RPC = 'sfs_rpc_request_seconds'
+CONTRACT = 'sfs_contract_call_seconds'
+SQL = 'sfs_sql_statement_seconds'
+CRYPTO = 'sfs_crypto_seconds'
+ACTION = 'sfs_action_seconds'
+
+# Histogram families: name -> (help text, labels).
+HISTOGRAMS = {
+    RPC: ("Latency of the JSON-RPC requests sent to the node, by method.", ('method',)),
+    CONTRACT: ("Latency of the contract functions, from the first RPC to the receipt for transactions.", ('function', 'kind')),
+    SQL: ("Time spent executing SQL statements (fetching the rows is not included).", ('statement',)),
+    CRYPTO: ("Latency of the password hashing and private key encryption calls.", ('operation',)),
+    ACTION: ("Latency of the user actions.", ('action',)),
+}
+
+# Counter families: name -> (help text, label).
+COUNTERS = {
+    'sfs_rpc_errors_total': ("JSON-RPC requests that raised, by method.", 'method'),
+    'sfs_contract_errors_total': ("Contract function calls that raised, by function.", 'function'),
+    'sfs_sql_errors_total': ("SQL statements that raised, by statement.", 'statement'),
+    'sfs_action_rpc_calls_total': ("JSON-RPC requests sent by the user actions, receipt polls excluded, by action.", 'action'),
+    'sfs_action_receipt_polls_total': ("Receipt polls sent while the user actions waited for their transactions, by action.", 'action'),
+}
+
+# Methods polled until the node has an answer: counted per action apart from the other RPCs.
+POLLED_METHODS = frozenset({'eth_getTransactionReceipt'})
+
+# Upper bounds of the histogram buckets, in seconds.
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """
+    Latency histogram with fixed buckets.
+
+    Attributes:
+        buckets (list): Observations per bucket (not cumulative), the last one for values above BUCKETS[-1].
+        count (int): Number of observations.
+        total (float): Sum of the observations, in seconds.
+        max (float): Largest observation, in seconds.
+    """
+    __slots__ = ('buckets', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        """
+        Returns the upper bound of the bucket holding the q-quantile, or the maximum if it is above the last bucket.
+        """
+        rank, seen = q * self.count, 0
+        for bound, observed in zip(BUCKETS, self.buckets):
+            seen += observed
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+def _label_text(names, values):
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ') for value in values)
+    return ','.join(f'{name}="{value}"' for name, value in zip(names, escaped))
+
+
+class MetricsRegistry:
+    """
+    Thread-safe counters and histograms, keyed by family name and label values.
+    """
+
+    def __init__(self, enabled=True):
+        """
+        Args:
+            enabled (bool): When False nothing is recorded and the instrumented layers are not installed.
+        """
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._histograms = {}
+        self._counters = {}
+        self._actions = {}
+
+    def observe(self, name, seconds, *labels):
+        """
+        Records one observation of a histogram family; the labels are given in the order of HISTOGRAMS.
+        """
+        if not self.enabled:
+            return
+        key = (name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, name, label, value=1):
+        """
+        Increments a counter family for one label value.
+        """
+        if not self.enabled:
+            return
+        key = (name, label)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    @contextlib.contextmanager
+    def timer(self, name, *labels, errors=None):
+        """
+        Times the body of a with statement into a histogram family. If the body raises and errors
+        is given, the errors counter is incremented for the first label.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            if errors:
+                self.inc(errors, labels[0])
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - start, *labels)
+
+    def timed(self, name, *labels):
+        """
+        Decorator timing every call of a function into a histogram family.
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.observe(name, time.perf_counter() - start, *labels)
+            return wrapper
+        return decorator
+
+    def record_rpc(self, method, seconds, failed=False):
+        """
+        Records one JSON-RPC request and counts it for every user action running on the calling thread,
+        as a receipt poll if the method is one of POLLED_METHODS.
+        """
+        if not self.enabled:
+            return
+        self.observe(RPC, seconds, method)
+        if failed:
+            self.inc('sfs_rpc_errors_total', method)
+        polled = method in POLLED_METHODS
+        for counts in getattr(self._local, 'actions', ()):
+            counts[polled] += 1
+
+    def action(self, name):
+        """
+        Decorator recording every call of a function as a run of the named user action: its latency and
+        the number of RPCs and of receipt polls sent by the calling thread while it ran (nested actions count them too).
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                stack = getattr(self._local, 'actions', None)
+                if stack is None:
+                    stack = self._local.actions = []
+                counts = [0, 0]
+                stack.append(counts)
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.observe(ACTION, time.perf_counter() - start, name)
+                    stack.pop()
+                    self.inc('sfs_action_rpc_calls_total', name, counts[0])
+                    self.inc('sfs_action_receipt_polls_total', name, counts[1])
+                    with self._lock:
+                        runs = self._actions.setdefault(name, [0, 0, 0, 0])
+                        runs[0] += 1
+                        runs[1] += counts[0]
+                        runs[2] = max(runs[2], counts[0])
+                        runs[3] += counts[1]
+            return wrapper
+        return decorator
+
+    def reset(self):
+        """
+        Forgets every recorded value.
+        """
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._actions.clear()
+
+    def to_prometheus(self):
+        """
+        Returns the registry in the Prometheus text exposition format.
+        """
+        with self._lock:
+            histograms = {key: (list(h.buckets), h.count, h.total) for key, h in self._histograms.items()}
+            counters = dict(self._counters)
+        lines = []
+        for name, (help_text, label_names) in HISTOGRAMS.items():
+            series = sorted((labels, values) for (family, labels), values in histograms.items() if family == name)
+            if not series:
+                continue
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+            for labels, (buckets, count, total) in series:
+                label_text = _label_text(label_names, labels)
+                cumulative = 0
+                for bound, observed in zip(BUCKETS + ('+Inf',), buckets):
+                    cumulative += observed
+                    lines.append(f'{name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+                lines.append(f"{name}_sum{{{label_text}}} {total:.6f}")
+                lines.append(f"{name}_count{{{label_text}}} {count}")
+        for name, (help_text, label_name) in COUNTERS.items():
+            series = sorted((label, value) for (family, label), value in counters.items() if family == name)
+            if not series:
+                continue
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            lines += [f"{name}{{{_label_text((label_name,), (label,))}}} {value}" for label, value in series]
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """
+        Writes the Prometheus text to a file, replacing it atomically (e.g. for the node exporter textfile collector).
+        """
+        temporary = f"{path}.tmp"
+        with open(temporary, 'w') as file:
+            file.write(self.to_prometheus())
+        os.replace(temporary, path)
+
+    def summary(self):
+        """
+        Returns one row per recorded histogram series, slowest total first:
+        [family, labels, count, total ms, mean ms, p95 ms (bucket bound), max ms].
+        """
+        with self._lock:
+            items = list(self._histograms.items())
+        rows = []
+        for (name, labels), histogram in items:
+            rows.append([name.replace('sfs_', '').replace('_seconds', ''), ' '.join(map(str, labels)), histogram.count,
+                         round(histogram.total * 1000, 2), round(histogram.total / histogram.count * 1000, 3),
+                         round(histogram.quantile(0.95) * 1000, 3), round(histogram.max * 1000, 3)])
+        return sorted(rows, key=lambda row: row[3], reverse=True)
+
+    def rpc_budget_report(self, budgets=None):
+        """
+        Compares the RPCs per run of every user action with its budget. Receipt polls are not part of the
+        budget and are shown apart.
+
+        Args:
+            budgets (dict, optional): action -> most RPCs one run may send; defaults to metrics.rpc_budget.
+
+        Returns:
+            tuple: (rows [action, runs, mean RPCs, max RPCs, budget, 'OK'|'OVER'|'-', mean receipt polls],
+                   True if any action is over budget).
+        """
+        if budgets is None:
+            budgets = (config.config.get('metrics') or {}).get('rpc_budget') or {}
+        with self._lock:
+            actions = {name: list(runs) for name, runs in self._actions.items()}
+        rows, over = [], False
+        for name, (runs, total, most, polls) in sorted(actions.items()):
+            budget = budgets.get(name)
+            status = '-' if budget is None else 'OVER' if most > budget else 'OK'
+            over |= status == 'OVER'
+            rows.append([name, runs, round(total / runs, 2), most, '-' if budget is None else budget, status,
+                         round(polls / runs, 2)])
+        return rows, over
+
+
+def _create_registry():
+    settings = config.config.get('metrics') or {}
+    registry = MetricsRegistry(enabled=bool(settings.get('enabled', True)))
+    if registry.enabled and settings.get('prometheus_file'):
+        import atexit
+        atexit.register(registry.write_prometheus, settings['prometheus_file'])
+    return registry
+
+
+metrics = _create_registry()
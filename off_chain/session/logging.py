@@ -1,64 +1,165 @@
 """
 Custom logging module to handle both error and info loggings for the application.
-This module setups file handlers, formatters, and loggers.
+Records are written as JSON Lines (one JSON object per line), with the structured fields of each
+message (function name, sender address, transaction hash, gas, latency...) as separate keys.
+Logging never touches the disk in the caller: the record is put on an in-memory queue by a
+QueueHandler and a background QueueListener thread formats it and writes it to a file that is
+rotated by size or by time, as set in the 'logging' section of configuration.yml.
 """
- 
+
+import atexit
+import copy
+import datetime
+import json
 import logging
+import logging.handlers
 import os
- 
-def setup_logging(log_path, level, formatter):
+import queue
+import threading
+from config import config
+
+
+ERROR_LOG_PATH = '../../except.log'
+ACTION_LOG_PATH = '../../action_logs.txt'
+
+_queue = queue.SimpleQueue()
+_listener = None
+_lock = threading.Lock()
+
+
+class JsonLinesFormatter(logging.Formatter):
     """
-    Setup and return a logger with a file handler if it does not already exist.
-   
-    Args:
-    log_path (str): Path where the log file will be saved.
-    level (int): Logging level, e.g., logging.INFO, logging.ERROR.
-    formatter (str): Format string for log messages.
-   
+    Formats a record as one JSON object: time, level, logger and message, followed by the
+    fields passed with the message and by the traceback, if any.
+    """
+
+    def format(self, record):
+        entry = {
+            'time': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Puts records on the queue with their message merged and their traceback turned into text,
+    leaving the JSON encoding to the listener thread.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _file_handler(log_path, logger_name):
+    """
+    Builds the rotating file handler of a log, writing only the records of the given logger.
+    """
+    settings = config.config.get('logging') or {}
+    full_log_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), log_path)
+    os.makedirs(os.path.dirname(full_log_path), exist_ok=True)
+    backup_count = int(settings.get('backup_count', 5))
+    if settings.get('when'):
+        handler = logging.handlers.TimedRotatingFileHandler(full_log_path, when=settings['when'],
+                                                            backupCount=backup_count, utc=True)
+    else:
+        handler = logging.handlers.RotatingFileHandler(full_log_path, maxBytes=int(settings.get('max_bytes', 10485760)),
+                                                       backupCount=backup_count)
+    handler.setFormatter(JsonLinesFormatter())
+    handler.addFilter(lambda record: record.name == logger_name)
+    return handler
+
+
+def setup_logging():
+    """
+    Starts the background listener and attaches the queue to the error and action loggers,
+    if not already done.
+
     Returns:
-    logging.Logger: Configured logger object.
-    """
-    logger = logging.getLogger(log_path)
- 
-    if not logger.handlers:
-        full_log_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), log_path)
-        log_dir = os.path.dirname(full_log_path)
-       
-        if not os.path.exists(log_dir):
-            os.makedirs(log_dir)
-       
-        handler = logging.FileHandler(full_log_path)
-        handler.setLevel(level)
-        formatter = logging.Formatter(formatter)
-        handler.setFormatter(formatter)
-       
-        logger.setLevel(level)
-        logger.addHandler(handler)
-        logger.propagate = False
-   
-    return logger
- 
-def log_error(error):
+        logging.handlers.QueueListener: The running listener.
+    """
+    global _listener
+    with _lock:
+        if _listener is None:
+            handlers = [_file_handler(ERROR_LOG_PATH, 'sfs.errors'), _file_handler(ACTION_LOG_PATH, 'sfs.actions')]
+            for name, level in (('sfs.errors', logging.ERROR), ('sfs.actions', logging.INFO)):
+                logger = logging.getLogger(name)
+                logger.setLevel(level)
+                logger.addHandler(_QueueHandler(_queue))
+                logger.propagate = False
+            _listener = logging.handlers.QueueListener(_queue, *handlers)
+            _listener.start()
+            atexit.register(shutdown_logging)
+    return _listener
+
+
+def shutdown_logging():
+    """
+    Writes every queued record, stops the listener and closes the log files.
+    Logging again afterwards starts a new listener.
+    """
+    global _listener
+    with _lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        for name in ('sfs.errors', 'sfs.actions'):
+            logging.getLogger(name).handlers.clear()
+        _listener = None
+
+
+def log_error(error, /, **fields):
     """
     Log an error message to the error log file.
-   
+
     Args:
     error (str): Error message to log.
+    **fields: Structured fields written with the message.
     """
-    error_log_path = '../../except.log'
-    error_logger = setup_logging(error_log_path, logging.ERROR,
-                                 '%(asctime)s - %(levelname)s - %(message)s')
-    error_logger.error(error)
- 
-def log_msg(message):
+    if _listener is None:
+        setup_logging()
+    logging.getLogger('sfs.errors').error(error, extra={'fields': fields})
+
+
+def log_msg(message, /, **fields):
     """
     Log a regular message to the action log file.
-   
+
     Args:
     message (str): Message to log.
+    **fields: Structured fields written with the message.
+    """
+    if _listener is None:
+        setup_logging()
+    logging.getLogger('sfs.actions').info(message, extra={'fields': fields})
+
+
+def log_transaction(function_name, from_address, tx_hash, gas, gas_price, latency, status):
+    """
+    Log an executed contract transaction to the action log file.
+
+    Args:
+    function_name (str): The contract function called.
+    from_address (str): The sender of the transaction.
+    tx_hash (str): The hex transaction hash.
+    gas (int): The gas estimate the transaction was sent with.
+    gas_price (int): The gas price, in wei.
+    latency (float): Seconds from the start of the call to the receipt.
+    status (int): The receipt status (1 on success).
     """
-    info_log_path = '../../action_logs.txt'
-    info_logger = setup_logging(info_log_path, logging.INFO,
-                                '%(asctime)s - %(levelname)s - %(message)s')
-    info_logger.info(message)
- 
\ No newline at end of file
+    log_msg(f"Transaction {function_name} executed.", function=function_name, from_address=from_address,
+            tx_hash=tx_hash, gas=int(gas), gas_price=int(gas_price), latency_ms=round(latency * 1000, 2),
+            status=status)
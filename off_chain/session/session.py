@@ -4,6 +4,7 @@ This module contains the Session class which manages user sessions, including lo
 timeouts, and user session data.
 """
 import time
+from session.signer import SessionSigner
 
 class Session:
     """
@@ -20,6 +21,7 @@ class Session:
         self._operation = None
         self.__attempts = 0
         self.__login_error_timestamp = 0
+        self.__signer = None
 
     def get_user(self):
         """
@@ -57,6 +59,29 @@ class Session:
         """ 
         self._report = report
 
+    def unlock_signer(self, private_key: str, idle_ttl: int):
+        """
+        Keeps the user's wallet unlocked for this session, so transactions can be signed without prompting for the key.
+        """
+        self.lock_signer()
+        self.__signer = SessionSigner(private_key, idle_ttl)
+
+    def get_signer(self):
+        """
+        Returns the session signer if the wallet is unlocked and has not been idle for too long, None otherwise.
+        """
+        if self.__signer is not None and not self.__signer.is_active():
+            self.__signer = None
+        return self.__signer
+
+    def lock_signer(self):
+        """
+        Wipes the session signer, if any.
+        """
+        if self.__signer is not None:
+            self.__signer.wipe()
+            self.__signer = None
+
     def get_attempts(self):
         """
         Returns the number of login attempts.
@@ -88,11 +113,26 @@ class Session:
         """
         return max(0, self.__login_error_timestamp - time.time())
 
+    def get_attempt_state(self):
+        """
+        Returns the login attempt state as a tuple (attempts, timestamp the timeout ends at),
+        so it can be kept in a session store between requests.
+        """
+        return self.__attempts, self.__login_error_timestamp
+
+    def set_attempt_state(self, attempts: int, login_error_timestamp: float):
+        """
+        Restores the login attempt state returned by get_attempt_state.
+        """
+        self.__attempts = attempts
+        self.__login_error_timestamp = login_error_timestamp
+
     def reset_session(self):
         """
         Resets the session to its initial state with no user, 
-        no login attempts, and no timeout.
+        no login attempts, no timeout and no unlocked wallet.
         """
+        self.lock_signer()
         self.__user = None
         self.__attempts = 0
         self.__login_error_timestamp = 0
\ No newline at end of file
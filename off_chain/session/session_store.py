@@ -0,0 +1,322 @@
+"""
+This module implements the session stores used when one process serves many users (the API server).
+A store keeps, for every bearer token, whom the session belongs to and when it expires, and, for every
+login name, the failed login attempts and the lockout that Controller.check_attempts relies on, so the
+lockout holds across requests and, with the SQLite store, across processes and restarts.
+Sessions expire after a sliding TTL, are looked up by token in O(1) (a dict, or the primary key of the
+Sessions table) and expired ones are evicted in bulk. The memory store is bounded: when it is full the
+least recently used session is evicted. The private key of an unlocked wallet is never stored.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from config import config
+from database.connection import get_connection
+from database.migrations import run_migrations
+
+
+class SessionRecord:
+    """
+    The stored part of a session.
+
+    Attributes:
+        token (str): The bearer token.
+        username (str): The logged in user.
+        role (str): The role of the user.
+        created_at (float): Login time, in seconds since the epoch.
+        expires_at (float): Time the session expires at unless it is used again, in seconds since the epoch.
+    """
+    __slots__ = ('token', 'username', 'role', 'created_at', 'expires_at')
+
+    def __init__(self, token, username, role, created_at, expires_at):
+        self.token = token
+        self.username = username
+        self.role = role
+        self.created_at = created_at
+        self.expires_at = expires_at
+
+
+class SessionStore:
+    """
+    Interface of the session stores.
+
+    Attributes:
+        ttl (float): Seconds a session lives without being used.
+        on_evict (callable): Called with the token of every session the store drops by itself
+                             (expiry, eviction of the least recently used, delete_user), or None.
+        blocking (bool): True if the calls do disk I/O, so asyncio callers should run them on a worker thread.
+    """
+
+    blocking = False
+
+    def __init__(self, ttl=1800):
+        self.ttl = ttl
+        self.on_evict = None
+
+    def _evicted(self, tokens):
+        if self.on_evict is not None:
+            for token in tokens:
+                self.on_evict(token)
+        return len(tokens)
+
+    def create(self, token, username, role):
+        """
+        Stores a new session and returns its SessionRecord.
+        """
+        now = time.time()
+        record = SessionRecord(token, username, role, now, now + self.ttl)
+        self._put(record)
+        return record
+
+    def _put(self, record):
+        raise NotImplementedError
+
+    def get(self, token):
+        """
+        Returns the SessionRecord of a token and restarts its TTL, or None if the token is unknown or expired.
+        """
+        raise NotImplementedError
+
+    def delete(self, token):
+        """
+        Removes a session (logout). Returns True if it existed.
+        """
+        raise NotImplementedError
+
+    def delete_user(self, username):
+        """
+        Removes every session of a user, e.g. after a password change. Returns the number of sessions removed.
+        """
+        raise NotImplementedError
+
+    def evict_expired(self):
+        """
+        Removes every expired session and every attempt record no longer relevant.
+        Returns the number of sessions removed.
+        """
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def get_attempts(self, login):
+        """
+        Returns the attempt state of a login name: (failed attempts, time the lockout ends at).
+        """
+        raise NotImplementedError
+
+    def set_attempts(self, login, attempts, locked_until):
+        """
+        Stores the attempt state of a login name; a state with no attempts and no lockout is dropped.
+        """
+        raise NotImplementedError
+
+    def load_attempts(self, login, session):
+        """
+        Copies the stored attempt state of a login name into a Session, before a login.
+        """
+        session.set_attempt_state(*self.get_attempts(login))
+
+    def save_attempts(self, login, session):
+        """
+        Stores the attempt state of a Session for a login name, after a login.
+        """
+        self.set_attempts(login, *session.get_attempt_state())
+
+
+class MemorySessionStore(SessionStore):
+    """
+    Sessions and attempt states kept in LRU-ordered dictionaries of bounded size, for a single process.
+    """
+
+    def __init__(self, ttl=1800, max_sessions=10000):
+        """
+        Args:
+            ttl (float): Seconds a session lives without being used.
+            max_sessions (int): Sessions (and, separately, attempt states) kept at most.
+        """
+        super().__init__(ttl)
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._attempts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _put(self, record):
+        with self._lock:
+            self._sessions[record.token] = record
+            evicted = []
+            while len(self._sessions) > self.max_sessions:
+                evicted.append(self._sessions.popitem(last=False)[0])
+        self._evicted(evicted)
+
+    def get(self, token):
+        now = time.time()
+        with self._lock:
+            record = self._sessions.get(token)
+            if record is None:
+                return None
+            if record.expires_at <= now:
+                del self._sessions[token]
+                expired = True
+            else:
+                record.expires_at = now + self.ttl
+                self._sessions.move_to_end(token)
+                expired = False
+        if expired:
+            self._evicted([token])
+            return None
+        return record
+
+    def delete(self, token):
+        with self._lock:
+            return self._sessions.pop(token, None) is not None
+
+    def delete_user(self, username):
+        with self._lock:
+            tokens = [token for token, record in self._sessions.items() if record.username == username]
+            for token in tokens:
+                del self._sessions[token]
+        return self._evicted(tokens)
+
+    def evict_expired(self):
+        now = time.time()
+        with self._lock:
+            tokens = [token for token, record in self._sessions.items() if record.expires_at <= now]
+            for token in tokens:
+                del self._sessions[token]
+            stale = [login for login, (_, locked_until, updated_at) in self._attempts.items()
+                     if locked_until <= now and updated_at + self.ttl <= now]
+            for login in stale:
+                del self._attempts[login]
+        return self._evicted(tokens)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def get_attempts(self, login):
+        with self._lock:
+            attempts, locked_until, _ = self._attempts.get(login, (0, 0, 0))
+        return attempts, locked_until
+
+    def set_attempts(self, login, attempts, locked_until):
+        with self._lock:
+            if attempts == 0 and locked_until <= time.time():
+                self._attempts.pop(login, None)
+                return
+            self._attempts[login] = (attempts, locked_until, time.time())
+            self._attempts.move_to_end(login)
+            while len(self._attempts) > self.max_sessions:
+                self._attempts.popitem(last=False)
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Sessions and attempt states kept in the Sessions and LoginAttempts tables of the application database,
+    shared by every process using it. Tokens are stored as SHA-256 digests, so the database does not hold
+    usable tokens. To keep requests from writing on every call, the expiry of a session is only moved
+    forward once a tenth of the TTL has passed since the last update. Every thread uses its own connection.
+    """
+
+    blocking = True
+
+    def __init__(self, ttl=1800):
+        """
+        Args:
+            ttl (float): Seconds a session lives without being used.
+        """
+        super().__init__(ttl)
+        run_migrations(get_connection())
+
+    @staticmethod
+    def _digest(token):
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def _put(self, record):
+        conn = get_connection()
+        conn.execute("INSERT OR REPLACE INTO Sessions(token_hash, username, role, created_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                     (self._digest(record.token), record.username, record.role, record.created_at, record.expires_at))
+        conn.commit()
+
+    def get(self, token):
+        conn = get_connection()
+        digest = self._digest(token)
+        row = conn.execute("SELECT username, role, created_at, expires_at FROM Sessions WHERE token_hash = ?",
+                           (digest,)).fetchone()
+        if row is None:
+            return None
+        username, role, created_at, expires_at = row
+        now = time.time()
+        if expires_at <= now:
+            conn.execute("DELETE FROM Sessions WHERE token_hash = ?", (digest,))
+            conn.commit()
+            self._evicted([token])
+            return None
+        if now + self.ttl - expires_at >= self.ttl / 10:
+            expires_at = now + self.ttl
+            conn.execute("UPDATE Sessions SET expires_at = ? WHERE token_hash = ?", (expires_at, digest))
+            conn.commit()
+        return SessionRecord(token, username, role, created_at, expires_at)
+
+    def delete(self, token):
+        conn = get_connection()
+        deleted = conn.execute("DELETE FROM Sessions WHERE token_hash = ?", (self._digest(token),)).rowcount
+        conn.commit()
+        return deleted > 0
+
+    def delete_user(self, username):
+        # Only digests are stored, so on_evict is not called for these sessions.
+        conn = get_connection()
+        deleted = conn.execute("DELETE FROM Sessions WHERE username = ?", (username,)).rowcount
+        conn.commit()
+        return deleted
+
+    def evict_expired(self):
+        conn = get_connection()
+        now = time.time()
+        deleted = conn.execute("DELETE FROM Sessions WHERE expires_at <= ?", (now,)).rowcount
+        conn.execute("DELETE FROM LoginAttempts WHERE locked_until <= ? AND updated_at <= ?", (now, now - self.ttl))
+        conn.commit()
+        return deleted
+
+    def __len__(self):
+        return get_connection().execute("SELECT COUNT(*) FROM Sessions WHERE expires_at > ?", (time.time(),)).fetchone()[0]
+
+    def get_attempts(self, login):
+        row = get_connection().execute("SELECT attempts, locked_until FROM LoginAttempts WHERE login = ?",
+                                       (login,)).fetchone()
+        return (row[0], row[1]) if row else (0, 0)
+
+    def set_attempts(self, login, attempts, locked_until):
+        conn = get_connection()
+        if attempts == 0 and locked_until <= time.time():
+            conn.execute("DELETE FROM LoginAttempts WHERE login = ?", (login,))
+        else:
+            conn.execute("INSERT OR REPLACE INTO LoginAttempts(login, attempts, locked_until, updated_at) VALUES (?, ?, ?, ?)",
+                         (login, attempts, locked_until, time.time()))
+        conn.commit()
+
+
+def open_session_store(settings=None):
+    """
+    Builds the session store configured in the 'sessions' section of the configuration.
+
+    Args:
+        settings (dict, optional): The settings; defaults to the 'sessions' section.
+
+    Returns:
+        SessionStore: A MemorySessionStore or a SQLiteSessionStore.
+
+    Raises:
+        ValueError: If the backend is unknown.
+    """
+    if settings is None:
+        settings = config.config.get('sessions') or {}
+    backend = settings.get('backend', 'memory')
+    ttl = float(settings.get('ttl', 1800))
+    if backend == 'memory':
+        return MemorySessionStore(ttl, int(settings.get('max_sessions', 10000)))
+    if backend == 'sqlite':
+        return SQLiteSessionStore(ttl)
+    raise ValueError(f"Unknown session store backend '{backend}'; expected 'memory' or 'sqlite'")
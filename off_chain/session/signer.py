@@ -0,0 +1,77 @@
+"""
+This module contains the SessionSigner class, which keeps a user's wallet unlocked for the
+duration of a session so transactions can be signed without asking for the private key each time.
+"""
+import time
+from eth_account import Account
+
+
+class SessionSigner:
+    """
+    An unlocked wallet bound to a session. The account is decoded once, when the signer is created,
+    and is forgotten as soon as it stays unused for longer than the idle TTL or the signer is wiped.
+    """
+
+    def __init__(self, private_key: str, idle_ttl: int):
+        """
+        Decodes the private key and starts the idle timer.
+
+        Args:
+            private_key (str): The hex encoded private key of the wallet.
+            idle_ttl (int): Seconds the signer stays usable without being used.
+        """
+        self.__account = Account.from_key(private_key)
+        self.__address = self.__account.address
+        self.__idle_ttl = idle_ttl
+        self.__last_used = time.monotonic()
+
+    def get_address(self):
+        """
+        Returns the checksum address of the unlocked wallet.
+        """
+        return self.__address
+
+    def is_active(self):
+        """
+        Returns True if the signer still holds the key and the idle TTL has not expired.
+        An expired signer wipes itself.
+        """
+        if self.__account is not None and time.monotonic() - self.__last_used > self.__idle_ttl:
+            self.wipe()
+        return self.__account is not None
+
+    def touch(self):
+        """
+        Restarts the idle timer, if the signer is still active.
+
+        Returns:
+            bool: True if the signer is active.
+        """
+        if not self.is_active():
+            return False
+        self.__last_used = time.monotonic()
+        return True
+
+    def can_sign_for(self, address: str):
+        """
+        Returns True if the signer is active and belongs to the given address.
+        """
+        return self.is_active() and self.__address.lower() == address.lower()
+
+    def sign_transaction(self, transaction: dict):
+        """
+        Signs a transaction with the unlocked wallet and restarts the idle timer.
+
+        Raises:
+            PermissionError: If the signer has expired or has been wiped.
+        """
+        if not self.is_active():
+            raise PermissionError("The session signer is locked.")
+        self.__last_used = time.monotonic()
+        return self.__account.sign_transaction(transaction)
+
+    def wipe(self):
+        """
+        Drops the decoded key from memory.
+        """
+        self.__account = None
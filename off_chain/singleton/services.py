@@ -0,0 +1,106 @@
+"""
+This module holds the shared service container of the application.
+The database layer, the chain client, the emission factor catalog and the caches are built once,
+on first use, and handed to every component (CommandLineInterface, Utils, Controller, the headless
+runner and the commands), so starting the application opens one database connection, runs the schema migrations once and
+connects to the chain only when an action actually needs it.
+"""
+
+import threading
+import time
+
+
+class ServiceContainer:
+    """
+    Lazily builds and shares the application services.
+
+    Attributes:
+        timings (dict): Seconds spent building each service, by service name.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._chain = None
+        self._emission_factors = None
+        self._caches = {}
+        self.timings = {}
+        self.created_at = time.perf_counter()
+
+    def _timed(self, name, build):
+        start = time.perf_counter()
+        service = build()
+        self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+        return service
+
+    @property
+    def db(self):
+        """
+        Returns the DatabaseOperations of the calling thread. SQLite connections are bound to the
+        thread that opened them, so each thread gets its own instance, built on its first access.
+        """
+        db_ops = getattr(self._local, "db_ops", None)
+        if db_ops is None:
+            from database.database_operation import DatabaseOperations
+            db_ops = self._local.db_ops = self._timed("db", DatabaseOperations)
+        return db_ops
+
+    @property
+    def chain(self):
+        """
+        Returns the chain client (ActionController). The node connection and the contract loading
+        happen on the first access.
+        """
+        if self._chain is None:
+            with self._lock:
+                if self._chain is None:
+                    def connect():
+                        from singleton.action_controller_instance import action_controller_instance
+                        return action_controller_instance
+                    self._chain = self._timed("chain", connect)
+        return self._chain
+
+    @property
+    def emission_factors(self):
+        """
+        Returns the emission factor catalog, loaded on the first access.
+        """
+        if self._emission_factors is None:
+            with self._lock:
+                if self._emission_factors is None:
+                    from analytics.emission_factors import load_catalog
+                    self._emission_factors = self._timed("emission_factors", load_catalog)
+        return self._emission_factors
+
+    def set_chain(self, chain):
+        """
+        Replaces the chain client, e.g. with an already connected ActionController.
+        """
+        self._chain = chain
+
+    def cache(self, name):
+        """
+        Returns the shared cache (a dict) with the given name, creating it if needed.
+        """
+        with self._lock:
+            return self._caches.setdefault(name, {})
+
+    def clear_caches(self):
+        """
+        Empties every shared cache.
+        """
+        with self._lock:
+            for cache in self._caches.values():
+                cache.clear()
+
+    def startup_report(self):
+        """
+        Returns the build time of every service built so far and the time since the container was
+        created, in milliseconds.
+        """
+        report = {name: round(seconds * 1000, 2) for name, seconds in self.timings.items()}
+        report["since_start"] = round((time.perf_counter() - self.created_at) * 1000, 2)
+        return report
+
+
+services = ServiceContainer()